@@ -0,0 +1,249 @@
+"""Benchmark batched against sequential Gmail fetching on a local fake Gmail server.
+
+The fake server implements the Gmail endpoints used for fetching
+(messages.list/get, threads.list/get and the batch endpoint) and adds a fixed
+latency to every HTTP request, standing in for the network round trip. It
+reports wall time, HTTP requests, items fetched and response bytes for the
+sequential path, the batched path with full threads, and the batched
+two-phase path (metadata first, then bodies of the processed messages only).
+With --thread-cache it also runs two passes with the cross-pass thread cache,
+the second of which should skip every thread.
+
+Usage:
+    python benchmarks/gmail_batch_fetch.py
+    python benchmarks/gmail_batch_fetch.py --messages 500 --thread-size 3 --latency-ms 40 --fail-rate 0.05
+    python benchmarks/gmail_batch_fetch.py --thread-cache
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from email.parser import Parser
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httplib2
+import googleapiclient
+from googleapiclient.discovery import build_from_document
+
+import src.tools.gmail.gmail_tools as gmail_tools
+
+USER = "me@example.com"
+
+
+class FakeMailbox:
+    """Messages grouped in threads; the last message of each thread is from an outside sender."""
+
+    def __init__(self, n_messages: int, thread_size: int, body_bytes: int):
+        self.messages = {}
+        self.threads = {}
+        now = datetime.now(timezone.utc)
+        body = base64.urlsafe_b64encode(("Hello, we'd like to hear about your AI training. " * (body_bytes // 50 + 1))[:body_bytes].encode()).decode()
+        for i in range(n_messages):
+            thread_id = f"t{i // thread_size:05d}"
+            position = i % thread_size
+            sender = USER if position % 2 and position < thread_size - 1 else f"client{i // thread_size}@example.org"
+            message = {
+                "id": f"m{i:05d}",
+                "threadId": thread_id,
+                "internalDate": str(int((now - timedelta(minutes=n_messages - i)).timestamp() * 1000)),
+                "labelIds": ["INBOX", "UNREAD"],
+                "payload": {
+                    "mimeType": "text/plain",
+                    "headers": [
+                        {"name": "From", "value": sender},
+                        {"name": "To", "value": USER},
+                        {"name": "Subject", "value": f"Training inquiry {i // thread_size}"},
+                        {"name": "Date", "value": format_datetime(now - timedelta(minutes=n_messages - i))},
+                    ],
+                    "body": {"size": body_bytes, "data": body},
+                },
+            }
+            self.messages[message["id"]] = message
+            self.threads.setdefault(thread_id, {"id": thread_id, "historyId": "1", "messages": []})["messages"].append(message)
+
+
+def _metadata(item: dict, headers: list) -> dict:
+    """A message or thread as returned with format=metadata: headers only, no bodies."""
+    if "messages" in item:
+        return {**item, "messages": [_metadata(message, headers) for message in item["messages"]]}
+    wanted = {name.lower() for name in headers}
+    payload_headers = [h for h in item["payload"]["headers"] if not wanted or h["name"].lower() in wanted]
+    return {**item, "payload": {"mimeType": item["payload"]["mimeType"], "headers": payload_headers}}
+
+
+class FakeGmail:
+    """HTTP server for a FakeMailbox with per-request latency and optional injected failures."""
+
+    def __init__(self, mailbox: FakeMailbox, latency_seconds: float, fail_rate: float, seed: int = 0):
+        self.mailbox = mailbox
+        self.latency_seconds = latency_seconds
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.failed_once = set()
+        self.reset()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def reset(self):
+        self.http_requests = 0
+        self.sub_requests = 0
+        self.response_bytes = 0
+
+    def route(self, method: str, path: str, query: dict):
+        """(status, body) for one API request."""
+        parts = path.strip("/").split("/")
+        # gmail/v1/users/me/<collection>[/<id>]
+        collection, item_id = parts[4], parts[5] if len(parts) > 5 else None
+        if method != "GET":
+            return 405, {"error": {"code": 405, "message": "Method not allowed"}}
+        if item_id is None and collection == "messages":
+            ids = sorted(self.mailbox.messages)
+            page_size = int(query.get("maxResults", ["100"])[0])
+            start = int(query.get("pageToken", ["0"])[0])
+            page = [{"id": i, "threadId": self.mailbox.messages[i]["threadId"]} for i in ids[start:start + page_size]]
+            body = {"messages": page, "resultSizeEstimate": len(ids)}
+            if start + page_size < len(ids):
+                body["nextPageToken"] = str(start + page_size)
+            return 200, body
+        if item_id is None and collection == "threads":
+            threads = [{"id": t["id"], "historyId": t["historyId"]} for t in self.mailbox.threads.values()]
+            return 200, {"threads": threads, "resultSizeEstimate": len(threads)}
+        store = self.mailbox.messages if collection == "messages" else self.mailbox.threads
+        if item_id not in store:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        with self.lock:
+            # Injected failures hit an item once, so retries succeed
+            if self.fail_rate and item_id not in self.failed_once and self.random.random() < self.fail_rate:
+                self.failed_once.add(item_id)
+                return 503, {"error": {"code": 503, "message": "Backend Error"}}
+        item = store[item_id]
+        if query.get("format", ["full"])[0] == "metadata":
+            item = _metadata(item, query.get("metadataHeaders", []))
+        return 200, item
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, content_type: str, body: bytes):
+                with fake.lock:
+                    fake.http_requests += 1
+                    fake.response_bytes += len(body)
+                time.sleep(fake.latency_seconds)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                with fake.lock:
+                    fake.sub_requests += 1
+                status, body = fake.route("GET", parsed.path, parse_qs(parsed.query))
+                self._send(status, "application/json", json.dumps(body).encode())
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                payload = self.rfile.read(length).decode()
+                multipart = Parser().parsestr(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n{payload}")
+                boundary = "batch_fake_gmail"
+                out = []
+                for part in multipart.get_payload():
+                    request_line = part.get_payload().lstrip().split("\n", 1)[0]
+                    method, target, _ = request_line.split(" ", 2)
+                    parsed = urlparse(target)
+                    with fake.lock:
+                        fake.sub_requests += 1
+                    status, body = fake.route(method, parsed.path, parse_qs(parsed.query))
+                    content_id = part["Content-ID"].strip("<>")
+                    out.append(
+                        f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                        f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n"
+                        f"{json.dumps(body)}\r\n"
+                    )
+                out.append(f"--{boundary}--\r\n")
+                self._send(200, f"multipart/mixed; boundary={boundary}", "".join(out).encode())
+
+        return Handler
+
+
+def local_service(url: str):
+    """Gmail service built from the bundled discovery document, pointed at the fake server."""
+    path = os.path.join(os.path.dirname(googleapiclient.__file__), "discovery_cache", "documents", "gmail.v1.json")
+    with open(path) as f:
+        document = json.load(f)
+    document["rootUrl"] = url
+    document["baseUrl"] = url
+    return build_from_document(document, http=httplib2.Http())
+
+
+def run(fake: FakeGmail, batched: bool, metadata_first: bool = True):
+    gmail_tools.GMAIL_BATCH_FETCH = batched
+    gmail_tools.GMAIL_METADATA_FIRST = metadata_first
+    fake.reset()
+    start = time.perf_counter()
+    emails = list(gmail_tools.fetch_group_emails(USER, minutes_since=100000, gmail_token='{"token": "benchmark"}'))
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "emails": len([e for e in emails if not e.get("user_respond")]),
+        "http_requests": fake.http_requests,
+        "sub_requests": fake.sub_requests,
+        "response_mb": fake.response_bytes / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--thread-size", type=int, default=3)
+    parser.add_argument("--body-bytes", type=int, default=4000)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of items that fail once with 503")
+    parser.add_argument("--thread-cache", action="store_true", help="Also run two batched passes with the cross-pass thread cache")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    fake = FakeGmail(FakeMailbox(args.messages, args.thread_size, args.body_bytes), args.latency_ms / 1000, args.fail_rate)
+    service = local_service(fake.url)
+    # Point the fetch at the fake server instead of the real API
+    gmail_tools.build = lambda *a, **kw: service
+
+    print(f"{args.messages} messages in threads of {args.thread_size}, {args.latency_ms:g} ms per HTTP request\n")
+    print(f"{'path':<12}{'seconds':>10}{'emails':>8}{'http':>8}{'items':>8}{'MB':>8}")
+    for name, batched, metadata_first in (("sequential", False, False), ("batched", True, False), ("two-phase", True, True)):
+        fake.failed_once.clear()
+        result = run(fake, batched, metadata_first)
+        print(f"{name:<12}{result['seconds']:>10.2f}{result['emails']:>8}{result['http_requests']:>8}{result['sub_requests']:>8}{result['response_mb']:>8.2f}")
+    if args.thread_cache:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["GMAIL_THREAD_CACHE_PATH"] = os.path.join(tmp, "threads.json")
+            for name in ("cache cold", "cache warm"):
+                result = run(fake, True)
+                print(f"{name:<12}{result['seconds']:>10.2f}{result['emails']:>8}{result['http_requests']:>8}{result['sub_requests']:>8}{result['response_mb']:>8.2f}")
+    fake.server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
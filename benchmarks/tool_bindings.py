@@ -0,0 +1,84 @@
+"""Benchmark per-platform tool bindings against binding every tool.
+
+For each platform this reports the estimated input tokens of the agent system
+prompt plus tool schemas, with all tools bound and with the platform's subset.
+With --live (needs GEMINI_API_KEY) it also calls the model and reports the
+provider-reported input tokens and latency for both bindings.
+
+Usage:
+    python benchmarks/tool_bindings.py
+    python benchmarks/tool_bindings.py --live --runs 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+import src.agent as agent
+from src.preprocessing import estimate_tokens
+from src.tools import get_tools
+
+SAMPLE_MESSAGES = {
+    "email": "Hi, could we set up a call next Tuesday to discuss the AI workshop for our team?",
+    "gmail": "Hi, could we set up a call next Tuesday to discuss the AI workshop for our team?",
+    "instagram": "Hi! What programs do you offer for a 25-person marketing agency and what's the pricing?",
+    "whatsapp": "Hello, is there still space in the next AI training cohort? We'd be 6 people.",
+}
+
+
+def prompt_tokens(tool_names, tools_prompt, platform):
+    """Estimated tokens of the system prompt, the tool schemas and a sample message."""
+    tools = get_tools(tool_names=tool_names, include_gmail=True, include_instagram=True, include_whatsapp=True)
+    schemas = json.dumps([convert_to_openai_tool(tool) for tool in tools])
+    system_prompt = agent._agent_messages([], tools_prompt=tools_prompt)[0]["content"]
+    return estimate_tokens(system_prompt) + estimate_tokens(schemas) + estimate_tokens(SAMPLE_MESSAGES[platform])
+
+
+def live_run(bound_llm, tools_prompt, platform, runs):
+    """Median latency and mean reported input tokens over several model calls."""
+    messages = agent._agent_messages(
+        [{"role": "user", "content": f"Respond to the message:\n**Platform**: {platform}\n\n{SAMPLE_MESSAGES[platform]}"}],
+        tools_prompt=tools_prompt,
+    )
+    latencies, input_tokens = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = bound_llm.invoke(messages)
+        latencies.append(time.perf_counter() - start)
+        input_tokens.append((response.usage_metadata or {}).get("input_tokens", 0))
+    return statistics.median(latencies), statistics.mean(input_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-platform tool bindings")
+    parser.add_argument("--live", action="store_true", help="Call the model and measure real tokens and latency")
+    parser.add_argument("--runs", type=int, default=3, help="Model calls per binding in --live mode")
+    args = parser.parse_args()
+
+    print(f"{'platform':<10} {'tools':>5} {'all tools':>10} {'subset':>8} {'saved':>7}")
+    for platform, names in agent.PLATFORM_TOOL_NAMES.items():
+        full = prompt_tokens(agent.TOOL_NAMES, agent.HITL_TOOLS_PROMPT, platform)
+        subset = prompt_tokens(names, agent.platform_tool_bindings[platform][1], platform)
+        print(f"{platform:<10} {len(names):>5} {full:>10} {subset:>8} {1 - subset / full:>7.1%}")
+
+    if not args.live:
+        return
+
+    print(f"\n{'platform':<10} {'binding':<8} {'input tokens':>12} {'median latency':>15}")
+    for platform in agent.PLATFORM_TOOL_NAMES:
+        bound_llm, tools_prompt = agent.platform_tool_bindings[platform]
+        for label, llm, prompt in [("all", agent.llm_with_tools, agent.HITL_TOOLS_PROMPT), ("subset", bound_llm, tools_prompt)]:
+            latency, tokens = live_run(llm, prompt, platform, args.runs)
+            print(f"{platform:<10} {label:<8} {tokens:>12.0f} {latency:>14.2f}s")
+
+
+if __name__ == "__main__":
+    main()
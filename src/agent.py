@@ -3,20 +3,42 @@ from typing import Literal
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage   
+from langchain_core.messages import HumanMessage, AIMessage
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import interrupt, Command
 from langgraph.store.base import BaseStore
+from langgraph.config import get_stream_writer
 
 import os
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
 
-from src.prompts import triage_system_prompt, triage_user_prompt, agent_system_prompt_hitl, default_background, default_triage_instructions, default_response_preferences, default_cal_preferences
-from src.schemas import State, RouterSchema, StateInput, UserPreferences
+from src.prompts import triage_system_prompt, triage_user_prompt, triage_retrieved_background, triage_user_background, agent_system_prompt_hitl, default_background, default_triage_instructions, default_response_preferences, default_cal_preferences
+from src.schemas import State, RouterSchema, BatchRouterSchema, StateInput, UserPreferences
 from src.utils import parse_message, format_for_display, format_message_markdown, generate_thread_id
-from src.tools import get_tools, get_tools_by_name
-from src.tools.default.prompt_templates import HITL_TOOLS_PROMPT
+from src.tools import get_tools, get_tools_by_name, invoke_tool, ainvoke_tool
+from src.tools.default.prompt_templates import HITL_TOOLS_PROMPT, build_tools_prompt
+from src.triage_rules import default_rule_engine
+from src.triage_cache import TriageCache, prompt_fingerprint
+from src.triage_batch import TriageBatcher
+from src.triage_classifier import LazyTriageClassifier, DEFAULT_MODEL_PATH, LABEL_SOURCE, classifier_content
+from src.metrics import metrics
+from src.preprocessing import preprocess_message_content
+from src.speculation import SpeculationPolicy, record_outcome
+from src.streaming import DraftDeltaEmitter, stream_with_drafts, astream_with_drafts, DRAFT_TOOLS
+from src.compaction import HistoryCompactor
+from src.tool_runner import tool_runner_from_env
+from src.budget import ExecutionBudget, record_run, response_tokens
+from src.pricing import get_default_catalog
+from src.knowledge import KnowledgeBase
+from src.reply_memory import ReplyMemory, reuse_tool_call, format_example
+from src.preferences import PreferenceCache, default_preferences, NAMESPACE as PREFERENCES_NAMESPACE
+from src.feedback import FeedbackSummary
 
 load_dotenv(".env")
 
@@ -31,21 +53,34 @@ def get_user_preferences(store: BaseStore, thread_id: str) -> UserPreferences:
     Returns:
         UserPreferences object (creates new if doesn't exist)
     """
-    namespace = ("user_preferences",)
+    if PREFERENCES_CACHE_ENABLED:
+        return preference_cache.get(store, thread_id)
+
+    # Try to get existing preferences
+    item = store.get(PREFERENCES_NAMESPACE, thread_id)
     
+    if item:
+        return UserPreferences(**item.value)
+    else:
+        # Create new preferences
+        new_prefs = default_preferences(thread_id)
+        store.put(PREFERENCES_NAMESPACE, thread_id, new_prefs.dict())
+        return new_prefs
+
+async def aget_user_preferences(store: BaseStore, thread_id: str) -> UserPreferences:
+    """Async version of `get_user_preferences`."""
+    if PREFERENCES_CACHE_ENABLED:
+        return await preference_cache.aget(store, thread_id)
+
     # Try to get existing preferences
-    item = store.get(namespace, thread_id)
+    item = await store.aget(PREFERENCES_NAMESPACE, thread_id)
     
     if item:
         return UserPreferences(**item.value)
     else:
         # Create new preferences
-        platform, username = thread_id.split("_", 1)
-        new_prefs = UserPreferences(
-            platform=platform,
-            username=username
-        )
-        store.put(namespace, thread_id, new_prefs.dict())
+        new_prefs = default_preferences(thread_id)
+        await store.aput(PREFERENCES_NAMESPACE, thread_id, new_prefs.dict())
         return new_prefs
 
 def update_user_preferences(store: BaseStore, thread_id: str, updates: dict):
@@ -56,8 +91,11 @@ def update_user_preferences(store: BaseStore, thread_id: str, updates: dict):
         thread_id: User's thread ID
         updates: Dictionary of fields to update
     """
-    namespace = ("user_preferences",)
-    
+    if PREFERENCES_CACHE_ENABLED:
+        # Buffered; the message count is merged as a delta when the buffer is flushed
+        preference_cache.update(store, thread_id, updates, increments={"total_messages": 1})
+        return
+
     # Get current preferences
     prefs = get_user_preferences(store, thread_id)
     
@@ -70,29 +108,79 @@ def update_user_preferences(store: BaseStore, thread_id: str, updates: dict):
     prefs.total_messages += 1
     
     # Save back to store
-    store.put(namespace, thread_id, prefs.dict())
+    store.put(PREFERENCES_NAMESPACE, thread_id, prefs.dict())
+
+async def aupdate_user_preferences(store: BaseStore, thread_id: str, updates: dict):
+    """Async version of `update_user_preferences` (async stores can't be used synchronously on their loop)."""
+    if PREFERENCES_CACHE_ENABLED:
+        await preference_cache.aupdate(store, thread_id, updates, increments={"total_messages": 1})
+        return
+
+    prefs = await aget_user_preferences(store, thread_id)
+    for key, value in updates.items():
+        if hasattr(prefs, key):
+            setattr(prefs, key, value)
+    prefs.total_messages += 1
+    await store.aput(PREFERENCES_NAMESPACE, thread_id, prefs.dict())
+
+
+
+def record_feedback(store: BaseStore, thread_id: str | None, edits: list | None = None, ignored: list | None = None):
+    """Count reviewer feedback in the user's bounded feedback summaries.
+    
+    Args:
+        store: LangGraph Store instance
+        thread_id: User's thread ID
+        edits: Edited items (e.g. "write_email:content")
+        ignored: Ignored suggestions (e.g. a tool name)
+    """
+    if not thread_id or not (edits or ignored):
+        return
+    # Summaries of the new items only, merged into the stored ones so concurrent counts add up
+    merges = {
+        "common_edits": FeedbackSummary.from_items(edits or []),
+        "ignored_suggestions": FeedbackSummary.from_items(ignored or []),
+    }
+    if PREFERENCES_CACHE_ENABLED:
+        preference_cache.update(store, thread_id, merges=merges)
+        return
+    prefs = get_user_preferences(store, thread_id)
+    prefs.common_edits.merge(merges["common_edits"])
+    prefs.ignored_suggestions.merge(merges["ignored_suggestions"])
+    store.put(PREFERENCES_NAMESPACE, thread_id, prefs.dict())
 
 
 
 # Enable Instagram and WhatsApp tools
+TOOL_NAMES = [
+    "write_message", 
+    "schedule_meeting", 
+    "check_calendar_availability", 
+    "quote_program",
+    "Question", 
+    "Done",
+    "fetch_instagram_messages",
+    "send_instagram_message",
+    "fetch_whatsapp_messages",
+    "send_whatsapp_message"
+]
 tools = get_tools(
-    tool_names=[
-        "write_message", 
-        "schedule_meeting", 
-        "check_calendar_availability", 
-        "Question", 
-        "Done",
-        "fetch_instagram_messages",
-        "send_instagram_message",
-        "fetch_whatsapp_messages",
-        "send_whatsapp_message"
-    ],
+    tool_names=TOOL_NAMES,
     include_gmail=True,
     include_instagram=True,
     include_whatsapp=True
 )
 tools_by_name = get_tools_by_name(tools)
 
+# Tools each platform's conversations can use; other platforms get all tools
+_SHARED_TOOL_NAMES = ["schedule_meeting", "check_calendar_availability", "quote_program", "Question", "Done"]
+PLATFORM_TOOL_NAMES = {
+    "email": ["write_message"] + _SHARED_TOOL_NAMES,
+    "gmail": ["write_message"] + _SHARED_TOOL_NAMES,
+    "instagram": _SHARED_TOOL_NAMES + ["fetch_instagram_messages", "send_instagram_message"],
+    "whatsapp": _SHARED_TOOL_NAMES + ["fetch_whatsapp_messages", "send_whatsapp_message"],
+}
+
 llm="gemini-2.5-flash"
 
 model = ChatGoogleGenerativeAI(
@@ -103,27 +191,169 @@ model = ChatGoogleGenerativeAI(
 # Initialize the LLM for use with router / structured output
 llm_router = model.with_structured_output(RouterSchema) 
 
+# Batched triage: concurrent runs share one structured-output call (TRIAGE_BATCH_SIZE=1 disables)
+TRIAGE_BATCH_SIZE = int(os.getenv("TRIAGE_BATCH_SIZE", "1"))
+triage_batcher = TriageBatcher(
+    batch_router=model.with_structured_output(BatchRouterSchema),
+    single_router=llm_router,
+    batch_size=max(TRIAGE_BATCH_SIZE, 1),
+    max_wait_seconds=float(os.getenv("TRIAGE_BATCH_MAX_WAIT_MS", "50")) / 1000,
+)
+
+# Rule-based pre-triage (skips the LLM for obvious ignore/notify traffic)
+TRIAGE_RULES_ENABLED = os.getenv("TRIAGE_RULES_ENABLED", "true").lower() == "true"
+
+# Retrieve only the knowledge sections relevant to each message instead of inlining all of it
+KNOWLEDGE_RETRIEVAL_ENABLED = os.getenv("KNOWLEDGE_RETRIEVAL_ENABLED", "false").lower() == "true"
+knowledge_base = KnowledgeBase(
+    {
+        "background": default_background,
+        "response_preferences": default_response_preferences,
+        "cal_preferences": default_cal_preferences,
+    },
+    top_k=int(os.getenv("KNOWLEDGE_TOP_K", "6")),
+    max_tokens=int(os.getenv("KNOWLEDGE_MAX_TOKENS", "800")),
+    fallback_full_text=os.getenv("KNOWLEDGE_FALLBACK_FULL_TEXT", "true").lower() == "true",
+)
+
+# Content-addressed cache of LLM triage decisions (keys change when background/instructions change)
+TRIAGE_CACHE_ENABLED = os.getenv("TRIAGE_CACHE_ENABLED", "true").lower() == "true"
+triage_cache = TriageCache(
+    prompt_version=prompt_fingerprint(
+        triage_system_prompt, default_background, default_triage_instructions,
+        f"retrieval:{KNOWLEDGE_RETRIEVAL_ENABLED}:{knowledge_base.top_k}:{knowledge_base.max_tokens}",
+    ),
+    max_entries=int(os.getenv("TRIAGE_CACHE_MAX_ENTRIES", "2048")),
+    ttl_seconds=float(os.getenv("TRIAGE_CACHE_TTL_SECONDS", "86400")),
+)
+
+# Strip quoted replies, signatures and disclaimers from emails and cap message tokens in prompts
+MESSAGE_PREPROCESSING_ENABLED = os.getenv("MESSAGE_PREPROCESSING_ENABLED", "true").lower() == "true"
+MESSAGE_TOKEN_BUDGET = int(os.getenv("MESSAGE_TOKEN_BUDGET", "1500"))
+
+# Local first-stage classifier; only messages below the confidence threshold escalate to the LLM
+TRIAGE_CLASSIFIER_ENABLED = os.getenv("TRIAGE_CLASSIFIER_ENABLED", "true").lower() == "true"
+TRIAGE_CLASSIFIER_THRESHOLD = float(os.getenv("TRIAGE_CLASSIFIER_THRESHOLD", "0.9"))
+triage_classifier = LazyTriageClassifier(os.getenv("TRIAGE_MODEL_PATH", str(DEFAULT_MODEL_PATH)))
+
 # Initialize the LLM, enforcing tool use (of any available tools) for agent
 llm_with_tools = model.bind_tools(tools, tool_choice="required")
 
-def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_interrupt_handler", "response_agent", "__end__"]]:
-    """Analyze message content to decide if we should respond, notify, or ignore.
+# One bound model and tools prompt per platform, so a prompt only carries the tool schemas it can use
+PLATFORM_TOOLS_ENABLED = os.getenv("PLATFORM_TOOLS_ENABLED", "true").lower() == "true"
+platform_tool_bindings = {
+    platform: (
+        model.bind_tools(
+            get_tools(tool_names=names, include_gmail=True, include_instagram=True, include_whatsapp=True),
+            tool_choice="required",
+        ),
+        build_tools_prompt(names),
+    )
+    for platform, names in PLATFORM_TOOL_NAMES.items()
+}
+
+def _tool_binding(platform: str):
+    """(bound model, tools prompt) for a platform, falling back to all tools."""
+    if PLATFORM_TOOLS_ENABLED and (platform or "").lower() in platform_tool_bindings:
+        return platform_tool_bindings[platform.lower()]
+    return llm_with_tools, HITL_TOOLS_PROMPT
+
+# Speculative drafting: start the first llm_call while triage runs, for platforms that mostly get `respond`
+SPECULATIVE_DRAFTING = os.getenv("SPECULATIVE_DRAFTING", "false").lower() == "true"
+speculation_policy = SpeculationPolicy(
+    min_respond_rate=float(os.getenv("SPECULATIVE_MIN_RESPOND_RATE", "0.8")),
+    min_samples=int(os.getenv("SPECULATIVE_MIN_SAMPLES", "20")),
+    forced_platforms=os.getenv("SPECULATIVE_PLATFORMS", "").split(","),
+)
+speculation_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-draft")
 
-    The triage step prevents the assistant from wasting time on:
-    - Spam and promotions
-    - Generic notifications
-    - Irrelevant social media interactions
+# Stream draft tool-call content to Agent Inbox through the custom stream channel
+STREAM_DRAFTS = os.getenv("STREAM_DRAFTS", "false").lower() == "true"
+
+# Fold older turns of long sender threads into a running summary so prompt size stays flat
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() == "true"
+history_compactor = HistoryCompactor(
+    model,
+    trigger_tokens=int(os.getenv("COMPACTION_TRIGGER_TOKENS", "6000")),
+    keep_tokens=int(os.getenv("COMPACTION_KEEP_TOKENS", "2000")),
+)
+
+# Non-HITL tool calls from one AI message run concurrently, each with its own timeout
+tool_runner = tool_runner_from_env(tools_by_name)
+
+# Program catalog parsed from the background: exact quotes via quote_program, and only relevant rows in prompts
+CATALOG_FILTER_ENABLED = os.getenv("CATALOG_FILTER_ENABLED", "true").lower() == "true"
+catalog = get_default_catalog()
+
+# Approved replies are remembered and reused for similar inquiries (few-shot example, or ready draft if enabled)
+REPLY_MEMORY_ENABLED = os.getenv("REPLY_MEMORY_ENABLED", "true").lower() == "true"
+reply_memory = ReplyMemory(
+    fewshot_threshold=float(os.getenv("REPLY_FEWSHOT_THRESHOLD", "0.6")),
+    draft_threshold=float(os.getenv("REPLY_DRAFT_THRESHOLD", "0.9")),
+    reuse_drafts=os.getenv("REPLY_REUSE_DRAFTS", "false").lower() == "true",
+    refresh_seconds=float(os.getenv("REPLY_MEMORY_REFRESH_SECONDS", "300")),
+)
+
+# User preferences are cached per process and written back in batches (flushed on shutdown)
+PREFERENCES_CACHE_ENABLED = os.getenv("PREFERENCES_CACHE_ENABLED", "true").lower() == "true"
+preference_cache = PreferenceCache(
+    max_entries=int(os.getenv("PREFERENCES_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("PREFERENCES_CACHE_TTL_SECONDS", "300")),
+    flush_interval_seconds=float(os.getenv("PREFERENCES_FLUSH_INTERVAL_SECONDS", "5")),
+    max_pending=int(os.getenv("PREFERENCES_FLUSH_MAX_PENDING", "100")),
+)
+
+# Bounds on one response agent run (iterations, llm_call timeout, run deadline, tokens)
+execution_budget = ExecutionBudget.from_env()
+# Workers for timed sync llm_calls: by default twice the server's runs per worker process
+# (N_JOBS_PER_WORKER), so every run has a worker even while timed-out calls are still finishing
+llm_call_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_CALL_MAX_WORKERS") or 2 * int(os.getenv("N_JOBS_PER_WORKER", "10"))),
+    thread_name_prefix="llm-call",
+)
+
+def _call_with_timeout(call, timeout: float):
+    """Run a sync model call in a worker, giving up `timeout` seconds after it starts.
+
+    Time spent queued for a worker doesn't count, but a call that doesn't get a worker
+    within `timeout` (the pool is full of abandoned calls) is cancelled. An abandoned
+    call that did start finishes in the background.
+
+    Returns:
+        (response, seconds the call ran)
+
+    Raises:
+        FutureTimeoutError: The call didn't start, or ran longer than the timeout
     """
+    started = threading.Event()
+
+    def run():
+        started.set()
+        return call()
+
+    future = llm_call_executor.submit(contextvars.copy_context().run, run)
+    if not started.wait(timeout):
+        if future.cancel():
+            metrics.incr("llm_call_queue_timeouts")
+            raise FutureTimeoutError()
+        # A worker picked it up just now
+        started.wait()
+    start = time.perf_counter()
+    return future.result(timeout=timeout), time.perf_counter() - start
+
+def _triage_context(message_input: dict) -> dict:
+    """Parse the message and build everything the triage step needs (prompts, thread_id, markdown)."""
 
     # Parse the message input (generic for email, instagram, whatsapp)
-    sender, recipient, subject, content, timestamp, platform = parse_message(state["message_input"])
-    
-    # Generate thread_id for this user
-    thread_id = generate_thread_id(platform, sender)
-    
-    # Get user preferences (creates new if doesn't exist)
-    user_prefs = get_user_preferences(store, thread_id)
-    
+    sender, recipient, subject, content, timestamp, platform = parse_message(message_input)
+
+    # Clean the body once; triage, the decision cache and the response agent all use the cleaned text
+    raw_content = content
+    if MESSAGE_PREPROCESSING_ENABLED and content:
+        content, stats = preprocess_message_content(content, platform=platform, max_tokens=MESSAGE_TOKEN_BUDGET)
+        if stats["saved_tokens"] > 0:
+            print(f"Preprocessing saved {stats['saved_tokens']} of {stats['original_tokens']} tokens ({', '.join(stats['applied'])})")
+
     user_prompt = triage_user_prompt.format(
         platform=platform,
         sender=sender, 
@@ -144,18 +374,110 @@ def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_int
     )
 
     # Format system prompt with background and triage instructions
+    background = default_background
+    if KNOWLEDGE_RETRIEVAL_ENABLED:
+        # Keep the system prompt identical across messages (batched triage groups by it)
+        retrieved = knowledge_base.retrieve(f"{subject or ''}\n{content or ''}", sources=["background"])["background"]
+        user_prompt = triage_user_background.format(background=retrieved) + user_prompt
+        background = triage_retrieved_background
     system_prompt = triage_system_prompt.format(
-        background=default_background,
+        background=background,
         triage_instructions=default_triage_instructions
     )
 
-    # Run the router LLM
-    result = llm_router.invoke(
-        [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
-    )
+    return {
+        "sender": sender,
+        "subject": subject,
+        "content": content,
+        "raw_content": raw_content,
+        "platform": platform,
+        "headers": message_input.get("headers"),
+        # Generate thread_id for this user
+        "thread_id": generate_thread_id(platform, sender),
+        "user_prompt": user_prompt,
+        "system_prompt": system_prompt,
+        "message_markdown": message_markdown,
+    }
+
+def _pre_triage(ctx: dict):
+    """Run the cheap triage stages: rules, decision cache, local classifier.
+
+    Returns:
+        (result, source, cache_key, local_guess) where result and source are None
+        if the router LLM must decide
+    """
+    platform, sender, subject, content = ctx["platform"], ctx["sender"], ctx["subject"], ctx["content"]
+
+    # Try the rule engine first, only unresolved messages go to the router LLM
+    result, source = None, None
+    if TRIAGE_RULES_ENABLED:
+        result = default_rule_engine.evaluate(
+            platform=platform,
+            sender=sender,
+            subject=subject,
+            content=content,
+            headers=ctx["headers"],
+        )
+        source = "rules" if result is not None else None
+
+    # Then check for a cached decision on an identical message
+    cache_key = None
+    if result is None and TRIAGE_CACHE_ENABLED:
+        cache_key = triage_cache.make_key(platform, sender, subject, content)
+        result = triage_cache.get(cache_key)
+        source = "cache" if result is not None else None
+
+    # Then ask the local classifier, keeping its guess to measure agreement with the LLM
+    local_guess = None
+    local_model = triage_classifier.get() if result is None and TRIAGE_CLASSIFIER_ENABLED else None
+    if local_model is not None:
+        # The classifier was trained on bodies preprocessed this way, whether or not prompts use them
+        if not MESSAGE_PREPROCESSING_ENABLED:
+            content = classifier_content(platform, ctx["raw_content"])
+        local_guess, confidence = local_model.predict(platform, sender, subject, content)
+        if confidence >= TRIAGE_CLASSIFIER_THRESHOLD:
+            metrics.incr("triage_classifier_decisions", classification=local_guess)
+            result = RouterSchema(
+                reasoning=f"Local triage classifier (v{local_model.version}) is {confidence:.0%} confident.",
+                classification=local_guess,
+            )
+            source = "classifier"
+
+    return result, source, cache_key, local_guess
+
+def _record_llm_triage(result: RouterSchema, cache_key: str | None, local_guess: str | None):
+    """Cache an LLM triage decision and score the local classifier against it."""
+    if cache_key is not None:
+        triage_cache.set(cache_key, result)
+    if local_guess is not None:
+        metrics.incr("triage_classifier_escalations", agrees=local_guess == result.classification)
+
+def _respond_message(ctx: dict) -> dict:
+    """The user message that starts the response agent for a `respond` decision."""
+    return {"role": "user", "content": f"Respond to the message: {ctx['message_markdown']}"}
+
+def _can_speculate(state: State, ctx: dict) -> bool:
+    """Speculate only where it usually pays off, and not when the history is about to be compacted."""
+    if not (SPECULATIVE_DRAFTING and speculation_policy.should_speculate(ctx["platform"])):
+        return False
+    return not (COMPACTION_ENABLED and history_compactor.needs_compaction(state.get("messages", [])))
+
+def _speculative_request(state: State, ctx: dict, store: BaseStore):
+    """Exactly what the first llm_call would send if triage says `respond`."""
+    # The state still holds the previous run's budget here, so look up directly
+    example = None
+    if REPLY_MEMORY_ENABLED:
+        draft, example = reply_memory.lookup(store, ctx["platform"], _inquiry_text(state["message_input"]))
+        example = example or draft
+    return _agent_request(state, state.get("messages", []) + [_respond_message(ctx)], example)
+
+def _triage_command(result: RouterSchema, ctx: dict, source: str, speculative_draft=None) -> Command:
+    """Turn a triage decision into the next node and state update.
+
+    The source (the stage that decided) is saved so only router LLM decisions
+    become training labels for the local classifier. A speculative draft is only kept for `respond`; it is always cleared otherwise.
+    """
+    platform, thread_id = ctx["platform"], ctx["thread_id"]
 
     # Decision
     classification = result.classification
@@ -164,15 +486,16 @@ def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_int
     # Process the classification decision
     if classification == "respond":
         print(f"[RESPOND] Classification: RESPOND - This {platform} message requires a response")
-        # Next node
-        goto = "response_agent"
+        # Next node (the history is compacted before the response agent runs)
+        goto = "compact_history"
         # Update the state
         update = {
             "classification_decision": result.classification,
+            "classification_source": source,
             "thread_id": thread_id,
-            "messages": [{"role": "user",
-                            "content": f"Respond to the message: {message_markdown}"
-                        }],
+            "messages": [_respond_message(ctx)],
+            "speculative_draft": speculative_draft,
+            "run_budget": ExecutionBudget.start(),
         }
     elif classification == "ignore":
         print(f"[IGNORE] Classification: IGNORE - This {platform} message can be safely ignored")
@@ -182,7 +505,9 @@ def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_int
         # Update the state
         update = {
             "classification_decision": classification,
+            "classification_source": source,
             "thread_id": thread_id,
+            "speculative_draft": None,
         }
 
     elif classification == "notify":
@@ -193,14 +518,115 @@ def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_int
         # Update the state
         update = {
             "classification_decision": classification,
+            "classification_source": source,
             "thread_id": thread_id,
+            "speculative_draft": None,
         }
 
     else:
         raise ValueError(f"Invalid classification: {classification}")
     return Command(goto=goto, update=update)
 
-def triage_interrupt_handler(state: State, store: BaseStore) -> Command[Literal["response_agent", "__end__"]]:
+def _interaction_time() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_interrupt_handler", "compact_history", "__end__"]]:
+    """Analyze message content to decide if we should respond, notify, or ignore.
+
+    The triage step prevents the assistant from wasting time on:
+    - Spam and promotions
+    - Generic notifications
+    - Irrelevant social media interactions
+    """
+    ctx = _triage_context(state["message_input"])
+
+    # Get user preferences (creates new if doesn't exist) and count the interaction
+    user_prefs = get_user_preferences(store, ctx["thread_id"])
+    update_user_preferences(store, ctx["thread_id"], {"last_interaction": _interaction_time()})
+
+    result, source, cache_key, local_guess = _pre_triage(ctx)
+
+    speculation = None
+    if result is None:
+        # Draft the response concurrently with the router LLM if this platform usually gets `respond`
+        if _can_speculate(state, ctx):
+            bound_llm, messages = _speculative_request(state, ctx, store)
+            speculation = speculation_executor.submit(bound_llm.invoke, messages)
+
+        # Run the router LLM (batched with other in-flight messages if enabled)
+        if TRIAGE_BATCH_SIZE > 1:
+            result = triage_batcher.classify(ctx["system_prompt"], ctx["user_prompt"])
+        else:
+            result = llm_router.invoke(
+                [
+                    {"role": "system", "content": ctx["system_prompt"]},
+                    {"role": "user", "content": ctx["user_prompt"]},
+                ]
+            )
+        _record_llm_triage(result, cache_key, local_guess)
+        source = LABEL_SOURCE
+
+    speculation_policy.record(ctx["platform"], result.classification)
+
+    speculative_draft = None
+    if speculation is not None:
+        if result.classification == "respond":
+            try:
+                speculative_draft = speculation.result()
+            except Exception as e:
+                print(f"Speculative draft failed, llm_call will draft instead: {e}")
+        else:
+            speculation.cancel()
+        record_outcome(ctx["platform"], used=speculative_draft is not None)
+
+    return _triage_command(result, ctx, source, speculative_draft)
+
+async def atriage_router(state: State, store: BaseStore) -> Command[Literal["triage_interrupt_handler", "compact_history", "__end__"]]:
+    """Async version of `triage_router` for the async graph."""
+    ctx = _triage_context(state["message_input"])
+
+    # Count the interaction (creates the user preferences if they don't exist)
+    await aupdate_user_preferences(store, ctx["thread_id"], {"last_interaction": _interaction_time()})
+
+    # The pre-triage stages may hit Postgres (shared decision cache), keep them off the event loop
+    result, source, cache_key, local_guess = await asyncio.to_thread(_pre_triage, ctx)
+
+    speculation = None
+    if result is None:
+        # Draft the response concurrently with the router LLM if this platform usually gets `respond`
+        if _can_speculate(state, ctx):
+            bound_llm, messages = await asyncio.to_thread(_speculative_request, state, ctx, store)
+            speculation = asyncio.create_task(bound_llm.ainvoke(messages))
+
+        # Run the router LLM (batched with other in-flight messages if enabled)
+        if TRIAGE_BATCH_SIZE > 1:
+            result = await asyncio.wrap_future(triage_batcher.submit(ctx["system_prompt"], ctx["user_prompt"]))
+        else:
+            result = await llm_router.ainvoke(
+                [
+                    {"role": "system", "content": ctx["system_prompt"]},
+                    {"role": "user", "content": ctx["user_prompt"]},
+                ]
+            )
+        await asyncio.to_thread(_record_llm_triage, result, cache_key, local_guess)
+        source = LABEL_SOURCE
+
+    speculation_policy.record(ctx["platform"], result.classification)
+
+    speculative_draft = None
+    if speculation is not None:
+        if result.classification == "respond":
+            try:
+                speculative_draft = await speculation
+            except Exception as e:
+                print(f"Speculative draft failed, llm_call will draft instead: {e}")
+        else:
+            speculation.cancel()
+        record_outcome(ctx["platform"], used=speculative_draft is not None)
+
+    return _triage_command(result, ctx, source, speculative_draft)
+
+def triage_interrupt_handler(state: State, store: BaseStore) -> Command[Literal["compact_history", "__end__"]]:
     """Handles interrupts from the triage step"""
     
     # Parse the message input
@@ -257,10 +683,11 @@ def triage_interrupt_handler(state: State, store: BaseStore) -> Command[Literal[
                         "content": f"User wants to reply to the message. Use this feedback to respond: {user_input}"
                         })
         # Go to response agent
-        goto = "response_agent"
+        goto = "compact_history"
 
     # If user ignores message, go to END
     elif response["type"] == "ignore":
+        record_feedback(store, state.get("thread_id"), ignored=["notification"])
         goto = END
 
     # Catch all other responses
@@ -271,173 +698,462 @@ def triage_interrupt_handler(state: State, store: BaseStore) -> Command[Literal[
     update = {
         "messages": messages,
     }
+    if goto == "compact_history":
+        update["run_budget"] = ExecutionBudget.start()
 
     return Command(goto=goto, update=update)
 
+def _agent_messages(messages: list, conversation_summary: str | None = None, tools_prompt: str = HITL_TOOLS_PROMPT, knowledge: dict | None = None, example: dict | None = None) -> list:
+    """System prompt plus conversation history for the response agent."""
+    knowledge = knowledge or {}
+    system_prompt = agent_system_prompt_hitl.format(
+        tools_prompt=tools_prompt,
+        background=knowledge.get("background", default_background),
+        response_preferences=knowledge.get("response_preferences", default_response_preferences), 
+        cal_preferences=knowledge.get("cal_preferences", default_cal_preferences)
+    )
+
+    # Older turns that were compacted out of the message list
+    if conversation_summary:
+        system_prompt += f"""
+< Earlier Conversation Summary >
+{conversation_summary}
+</ Earlier Conversation Summary >
+"""
+
+    # Reply approved for a similar inquiry
+    if example:
+        system_prompt += format_example(example)
+
+    return [{"role": "system", "content": system_prompt}] + messages
+
+def _agent_knowledge(state: State) -> dict:
+    """Background and preferences for the agent prompt, narrowed to what the message is about.
+
+    Uses knowledge retrieval if enabled, otherwise the catalog filter on the background.
+    """
+    sender, recipient, subject, content, timestamp, platform = parse_message(state["message_input"])
+    query = f"{subject or ''}\n{content or ''}"
+    if KNOWLEDGE_RETRIEVAL_ENABLED:
+        return knowledge_base.retrieve(query)
+    if CATALOG_FILTER_ENABLED:
+        return {"background": catalog.background(query)}
+    return {}
+
+def _agent_request(state: State, messages: list | None = None, example: dict | None = None):
+    """Bound model and prompt messages for the response agent, using the platform's tool subset."""
+    bound_llm, tools_prompt = _tool_binding(state["message_input"].get("platform", "email"))
+    messages = state["messages"] if messages is None else messages
+    return bound_llm, _agent_messages(messages, state.get("conversation_summary"), tools_prompt, _agent_knowledge(state), example)
+
+def _inquiry_text(message_input: dict) -> str:
+    """The cleaned subject and body of the message, as used to match approved replies."""
+    sender, recipient, subject, content, timestamp, platform = parse_message(message_input)
+    if MESSAGE_PREPROCESSING_ENABLED and content:
+        content, _ = preprocess_message_content(content, platform=platform, max_tokens=MESSAGE_TOKEN_BUDGET)
+    return f"{subject or ''}\n{content or ''}".strip()
+
+def _reply_lookup(state: State, store: BaseStore):
+    """(ready draft, few-shot example) from approved replies, only for the first model call of a run."""
+    if not REPLY_MEMORY_ENABLED or (state.get("run_budget") or {}).get("iterations", 0) > 0:
+        return None, None
+    return reply_memory.lookup(store, _platform(state), _inquiry_text(state["message_input"]))
+
+def _reuse_draft(state: State, draft: dict) -> dict:
+    """Offer an approved reply to the reviewer as the draft, without calling the model."""
+    sender = parse_message(state["message_input"])[0]
+    print(f"Reusing an approved reply ({draft['tool']}) for a similar inquiry")
+    response = AIMessage(content="", tool_calls=[reuse_tool_call(draft, sender)])
+    if STREAM_DRAFTS:
+        DraftDeltaEmitter(get_stream_writer()).emit_complete(response)
+    usage = ExecutionBudget.charge(state.get("run_budget"), iterations=1)
+    return {"messages": [response], "run_budget": usage}
+
+def _remember_approved(state: State, store: BaseStore, tool_calls: list, reviewed: list):
+    """Save drafts the reviewer accepted or edited as approved replies."""
+    if not REPLY_MEMORY_ENABLED:
+        return
+    inquiry = None
+    for i, response in reviewed:
+        tool_call = tool_calls[i]
+        # Reused drafts are already in the store
+        if tool_call["name"] not in DRAFT_TOOLS or tool_call["id"].startswith("reuse_"):
+            continue
+        if response["type"] not in ("accept", "edit"):
+            continue
+        inquiry = inquiry or _inquiry_text(state["message_input"])
+        args = response["args"]["args"] if response["type"] == "edit" else tool_call["args"]
+        try:
+            reply_memory.record(store, _platform(state), inquiry, tool_call["name"], args, edited=response["type"] == "edit")
+        except Exception as e:
+            print(f"Could not save approved reply: {str(e)}")
+
+def _record_feedback(state: State, store: BaseStore, tool_calls: list, reviewed: list):
+    """Count which fields the reviewer edits and which actions they ignore."""
+    edits, ignored = [], []
+    for i, response in reviewed:
+        tool_call = tool_calls[i]
+        if response["type"] == "edit":
+            edited_args = response["args"]["args"]
+            edits += [f"{tool_call['name']}:{key}" for key, value in edited_args.items() if tool_call["args"].get(key) != value]
+        elif response["type"] == "ignore":
+            ignored.append(tool_call["name"])
+    try:
+        record_feedback(store, state.get("thread_id"), edits, ignored)
+    except Exception as e:
+        print(f"Could not record reviewer feedback: {str(e)}")
+
+def compact_history(state: State, store: BaseStore):
+    """Fold older turns into the conversation summary once the history gets too long.
+
+    Runs in the parent graph, before the response agent: `RemoveMessage`
+    updates returned from inside the subgraph never reach the parent's messages.
+    """
+    if not COMPACTION_ENABLED:
+        return {}
+    return history_compactor.compact(state["messages"], state.get("conversation_summary", ""))
+
+async def acompact_history(state: State, store: BaseStore):
+    """Async version of `compact_history`."""
+    if not COMPACTION_ENABLED:
+        return {}
+    return await history_compactor.acompact(state["messages"], state.get("conversation_summary", ""))
+
+def _calls_done(message) -> bool:
+    return any(tool_call["name"] == "Done" for tool_call in getattr(message, "tool_calls", None) or [])
+
+def _platform(state: State) -> str:
+    return state["message_input"].get("platform", "email")
+
+def _use_speculative_draft(state: State) -> dict:
+    """Use the draft that was generated while triage was running (its time was spent during triage)."""
+    draft = state["speculative_draft"]
+    if STREAM_DRAFTS:
+        DraftDeltaEmitter(get_stream_writer()).emit_complete(draft)
+    usage = ExecutionBudget.charge(state.get("run_budget"), iterations=1, tokens=response_tokens(draft))
+    return {"messages": [draft], "speculative_draft": None, "run_budget": usage}
+
+def _finish_llm_call(state: State, response, messages: list, seconds: float) -> dict:
+    """Charge the call to the run budget and record the run if the agent is done."""
+    usage = ExecutionBudget.charge(state.get("run_budget"), iterations=1, tokens=response_tokens(response, messages), seconds=seconds)
+    if _calls_done(response):
+        record_run(usage, _platform(state))
+    return {"messages": [response], "run_budget": usage}
+
+def _llm_timed_out(state: State, timeout: float, seconds: float) -> dict:
+    print(f"llm_call timed out after {timeout:g}s")
+    usage = ExecutionBudget.charge(state.get("run_budget"), iterations=1, seconds=seconds)
+    return execution_budget.degrade(usage, "node_timeout", f"timed out after {timeout:g}s waiting for the model", _platform(state))
+
 def llm_call(state: State, store: BaseStore):
     """LLM decides whether to call a tool or not"""
 
+    if state.get("speculative_draft") is not None:
+        return _use_speculative_draft(state)
+
+    # Ask the reviewer instead of calling the model once the run is out of budget
+    exceeded = execution_budget.exceeded(state.get("run_budget"))
+    if exceeded:
+        return execution_budget.degrade(state.get("run_budget"), *exceeded, _platform(state))
+
+    # Reuse a reply approved for a near-identical inquiry, or show a similar one as an example
+    draft, example = _reply_lookup(state, store)
+    if draft is not None:
+        return _reuse_draft(state, draft)
+
+    bound_llm, messages = _agent_request(state, example=example)
+
+    # Stream tool-call deltas so Agent Inbox can render the draft while it is generated
+    if STREAM_DRAFTS:
+        writer = get_stream_writer()
+        call = lambda: stream_with_drafts(bound_llm.stream(messages), writer)
+    else:
+        call = lambda: bound_llm.invoke(messages)
+
+    timeout = execution_budget.remaining_seconds(state.get("run_budget"))
+    if timeout is None:
+        start = time.perf_counter()
+        response = call()
+        seconds = time.perf_counter() - start
+    else:
+        # Run in a worker so the node can give up
+        try:
+            response, seconds = _call_with_timeout(call, timeout)
+        except FutureTimeoutError:
+            # The call waited for a worker or ran for the whole timeout
+            return _llm_timed_out(state, timeout, timeout)
+    if not STREAM_DRAFTS:
+        metrics.observe("agent_llm_latency_seconds", seconds)
+
+    return _finish_llm_call(state, response, messages, seconds)
+
+async def allm_call(state: State, store: BaseStore):
+    """Async version of `llm_call` for the async graph."""
+
+    if state.get("speculative_draft") is not None:
+        return _use_speculative_draft(state)
+
+    # Ask the reviewer instead of calling the model once the run is out of budget
+    exceeded = execution_budget.exceeded(state.get("run_budget"))
+    if exceeded:
+        return execution_budget.degrade(state.get("run_budget"), *exceeded, _platform(state))
+
+    # Reuse a reply approved for a near-identical inquiry, or show a similar one as an example
+    draft, example = await asyncio.to_thread(_reply_lookup, state, store)
+    if draft is not None:
+        return _reuse_draft(state, draft)
+
+    bound_llm, messages = _agent_request(state, example=example)
+
+    # Stream tool-call deltas so Agent Inbox can render the draft while it is generated
+    if STREAM_DRAFTS:
+        call = astream_with_drafts(bound_llm.astream(messages), get_stream_writer())
+    else:
+        call = bound_llm.ainvoke(messages)
+
+    timeout = execution_budget.remaining_seconds(state.get("run_budget"))
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(call, timeout=timeout)
+    except asyncio.TimeoutError:
+        return _llm_timed_out(state, timeout, time.perf_counter() - start)
+    seconds = time.perf_counter() - start
+    if not STREAM_DRAFTS:
+        metrics.observe("agent_llm_latency_seconds", seconds)
+
+    return _finish_llm_call(state, response, messages, seconds)
+
+# Tools that require human review in Agent Inbox before they run
+HITL_TOOLS = [
+    "write_message", 
+    "send_instagram_message", 
+    "send_whatsapp_message", 
+    "schedule_meeting", 
+    "Question"
+]
+
+def _hitl_request(state: State, tool_call: dict) -> dict:
+    """Build the Agent Inbox interrupt request for a HITL tool call."""
+
+    # Get original message from message_input in state
+    sender, recipient, subject, content, timestamp, platform = parse_message(state["message_input"])
+    original_message_markdown = format_message_markdown(sender, recipient, content, subject, timestamp, platform)
+    
+    # Format tool call for display and prepend the original message
+    tool_display = format_for_display(tool_call)
+    description = original_message_markdown + tool_display
+
+    # Configure what actions are allowed in Agent Inbox
+    if tool_call["name"] in ["write_message", "send_instagram_message", "send_whatsapp_message", "schedule_meeting"]:
+        config = {
+            "allow_ignore": True,
+            "allow_respond": True,
+            "allow_edit": True,
+            "allow_accept": True,
+        }
+    elif tool_call["name"] == "Question":
+        config = {
+            "allow_ignore": True,
+            "allow_respond": True,
+            "allow_edit": False,
+            "allow_accept": False,
+        }
+    else:
+        raise ValueError(f"Invalid tool call: {tool_call['name']}")
+
+    # Create the interrupt request
     return {
-        "messages": [
-            llm_with_tools.invoke(
-                [
-                    {"role": "system", "content": agent_system_prompt_hitl.format(
-                        tools_prompt=HITL_TOOLS_PROMPT,
-                        background=default_background,
-                        response_preferences=default_response_preferences, 
-                        cal_preferences=default_cal_preferences
-                    )}
-                ]
-                + state["messages"]
-            )
-        ]
+        "action_request": {
+            "action": tool_call["name"],
+            "args": tool_call["args"]
+        },
+        "config": config,
+        "description": description,
     }
 
-def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_call", "__end__"]]:
-    """Creates an interrupt for human review of tool calls"""
-    
-    # Store messages
-    result = []
+def _apply_hitl_response(state: State, tool_call: dict, response: dict, ai_message=None):
+    """Work out what a reviewer's response means for a HITL tool call.
+
+    Args:
+        ai_message: The AI message to apply edits to, defaults to the last message in the state.
+            Pass the previously edited copy when several tool calls of one message are edited.
+
+    Returns:
+        (messages, tool_args, end): messages to add to the state, the args to run
+        the tool with (None if the tool must not run), and whether to end the workflow
+    """
+
+    # Handle the responses 
+    if response["type"] == "accept":
 
-    # Go to the LLM call node next
-    goto = "llm_call"
+        # Execute the tool with original args
+        return [], tool_call["args"], False
+                    
+    elif response["type"] == "edit":
 
-    # Iterate over the tool calls in the last message
-    for tool_call in state["messages"][-1].tool_calls:
+        # Get edited args from Agent Inbox
+        edited_args = response["args"]["args"]
+
+        # Update the AI message's tool call with edited content (reference to the message in the state)
+        ai_message = ai_message or state["messages"][-1] # Get the most recent message from the state
+        current_id = tool_call["id"] # Store the ID of the tool call being edited
         
-        # Allowed tools for HITL
-        hitl_tools = [
-            "write_message", 
-            "send_instagram_message", 
-            "send_whatsapp_message", 
-            "schedule_meeting", 
-            "Question"
+        # Create a new list of tool calls by filtering out the one being edited and adding the updated version
+        # This avoids modifying the original list directly (immutable approach)
+        updated_tool_calls = [
+            {"type": "tool_call", "name": tool_call["name"], "args": edited_args, "id": current_id} if tc["id"] == current_id else tc
+            for tc in ai_message.tool_calls
         ]
-        
-        # If tool is not in our HITL list, execute it directly without interruption
-        if tool_call["name"] not in hitl_tools:
 
-            # Execute search_memory and other tools without interruption
-            tool = tools_by_name[tool_call["name"]]
-            observation = tool.invoke(tool_call["args"])
-            result.append({"role": "tool", "content": observation, "tool_call_id": tool_call["id"]})
-            continue
-            
-        # Get original message from message_input in state
-        sender, recipient, subject, content, timestamp, platform = parse_message(state["message_input"])
-        original_message_markdown = format_message_markdown(sender, recipient, content, subject, timestamp, platform)
+        # Create a new copy of the message with updated tool calls rather than modifying the original
+        # This ensures state immutability and prevents side effects in other parts of the code
+        # Execute the tool with edited args
+        return [ai_message.model_copy(update={"tool_calls": updated_tool_calls})], edited_args, False
+
+    elif response["type"] == "ignore":
+        # Don't execute the tool, and tell the agent how to proceed, then go to END
+        return [{"role": "tool", "content": f"User ignored this {tool_call['name']} action. Ignore this and end the workflow.", "tool_call_id": tool_call["id"]}], None, True
         
-        # Format tool call for display and prepend the original message
-        tool_display = format_for_display(tool_call)
-        description = original_message_markdown + tool_display
-
-        # Configure what actions are allowed in Agent Inbox
-        if tool_call["name"] in ["write_message", "send_instagram_message", "send_whatsapp_message", "schedule_meeting"]:
-            config = {
-                "allow_ignore": True,
-                "allow_respond": True,
-                "allow_edit": True,
-                "allow_accept": True,
-            }
-        elif tool_call["name"] == "Question":
-            config = {
-                "allow_ignore": True,
-                "allow_respond": True,
-                "allow_edit": False,
-                "allow_accept": False,
-            }
-        else:
-            raise ValueError(f"Invalid tool call: {tool_call['name']}")
-
-        # Create the interrupt request
-        request = {
-            "action_request": {
-                "action": tool_call["name"],
-                "args": tool_call["args"]
-            },
-            "config": config,
-            "description": description,
-        }
+    elif response["type"] == "response":
+        # User provided feedback
+        user_feedback = response["args"]
+        # Don't execute the tool, and add a message with the user feedback to incorporate into the draft
+        return [{"role": "tool", "content": f"User gave feedback to incorporate. Feedback: {user_feedback}", "tool_call_id": tool_call["id"]}], None, False
+
+    # Catch all other responses
+    else:
+        raise ValueError(f"Invalid response: {response}")
+
+# Review all HITL actions of a turn in one interrupt instead of one interrupt per action.
+# Needs a reviewer client that answers every request of the list: Agent Inbox only shows
+# the first one, and the actions it doesn't answer are then asked one per interrupt
+HITL_BATCH_REVIEW = os.getenv("HITL_BATCH_REVIEW", "false").lower() == "true"
 
+def _review_hitl_calls(state: State, tool_calls: list) -> list:
+    """Collect reviewer responses for the HITL tool calls of the last AI message.
+
+    With HITL_BATCH_REVIEW, all pending actions go to the reviewer in one interrupt
+    and come back as a list of responses in the same order, so a multi-action turn
+    needs a single resume. Actions left unanswered (Agent Inbox renders and answers
+    only the first request of a list) and the default mode use one interrupt per action.
+
+    Returns:
+        (index in tool_calls, response) pairs; actions without a response are left out
+    """
+    pending = [i for i, tool_call in enumerate(tool_calls) if tool_call["name"] in HITL_TOOLS]
+    if not pending:
+        return []
+
+    reviewed = []
+    if HITL_BATCH_REVIEW and len(pending) > 1:
+        # Send to the reviewer and wait for all responses
+        responses = interrupt([_hitl_request(state, tool_calls[i]) for i in pending]) or []
+        reviewed = list(zip(pending, responses))
+        if len(responses) < len(pending):
+            print(f"Received {len(responses)} responses for {len(pending)} actions, asking for the rest one at a time")
+        pending = pending[len(responses):]
+
+    for i in pending:
         # Send to Agent Inbox and wait for response
-        responses = interrupt([request])
-        
+        responses = interrupt([_hitl_request(state, tool_calls[i])])
+
         # Safety check: if no response (happens in some environments), skip this tool
-        if not responses:
-            continue
-            
-        response = responses[0]
-
-        # Handle the responses 
-        if response["type"] == "accept":
-
-            # Execute the tool with original args
-            tool = tools_by_name[tool_call["name"]]
-            observation = tool.invoke(tool_call["args"])
-            result.append({"role": "tool", "content": observation, "tool_call_id": tool_call["id"]})
-                        
-        elif response["type"] == "edit":
-
-            # Tool selection 
-            tool = tools_by_name[tool_call["name"]]
-            
-            # Get edited args from Agent Inbox
-            edited_args = response["args"]["args"]
+        if responses:
+            reviewed.append((i, responses[0]))
+    return reviewed
 
-            # Update the AI message's tool call with edited content (reference to the message in the state)
-            ai_message = state["messages"][-1] # Get the most recent message from the state
-            current_id = tool_call["id"] # Store the ID of the tool call being edited
-            
-            # Create a new list of tool calls by filtering out the one being edited and adding the updated version
-            # This avoids modifying the original list directly (immutable approach)
-            updated_tool_calls = [tc for tc in ai_message.tool_calls if tc["id"] != current_id] + [
-                {"type": "tool_call", "name": tool_call["name"], "args": edited_args, "id": current_id}
-            ]
-
-            # Create a new copy of the message with updated tool calls rather than modifying the original
-            # This ensures state immutability and prevents side effects in other parts of the code
-            result.append(ai_message.model_copy(update={"tool_calls": updated_tool_calls}))
-
-            # Execute the tool with edited args for supported tools
-            if tool_call["name"] in hitl_tools:
-                 # Execute the tool with edited args
-                observation = tool.invoke(edited_args)
-                
-                # Add only the tool response message
-                result.append({"role": "tool", "content": observation, "tool_call_id": current_id})
-            
-            # Catch all other tool calls
-            else:
-                raise ValueError(f"Invalid tool call: {tool_call['name']}")
+def _apply_reviews(state: State, tool_calls: list, reviewed: list, slots: list):
+    """Apply reviewer responses, filling per-call message slots.
 
-        elif response["type"] == "ignore":
-            if tool_call["name"] in hitl_tools:
-                # Don't execute the tool, and tell the agent how to proceed
-                result.append({"role": "tool", "content": f"User ignored this {tool_call['name']} action. Ignore this and end the workflow.", "tool_call_id": tool_call["id"]})
-                # Go to END
-                goto = END
-            else:
-                raise ValueError(f"Invalid tool call: {tool_call['name']}")
-            
-        elif response["type"] == "response":
-            # User provided feedback
-            user_feedback = response["args"]
-            if tool_call["name"] in hitl_tools:
-                # Don't execute the tool, and add a message with the user feedback to incorporate into the draft
-                result.append({"role": "tool", "content": f"User gave feedback to incorporate. Feedback: {user_feedback}", "tool_call_id": tool_call["id"]})
+    Returns:
+        (tool calls to run as (index, args) pairs, edited AI message or None, whether to end)
+    """
+    to_run = []
+    edited_message = None
+    end = False
+    for i, response in reviewed:
+        messages, tool_args, ends = _apply_hitl_response(state, tool_calls[i], response, edited_message)
+        for message in messages:
+            # Edits of several tool calls accumulate on one copy of the AI message
+            if isinstance(message, AIMessage):
+                edited_message = message
             else:
-                raise ValueError(f"Invalid tool call: {tool_call['name']}")
+                slots[i].append(message)
+        if tool_args is not None:
+            to_run.append((i, tool_args))
+        end = end or ends
+    return to_run, edited_message, end
+
+def _handler_command(state: State, slots: list, edited_message, end: bool, tool_seconds: float) -> Command:
+    """Next step and state update after tool calls were reviewed and run."""
+    messages = [message for slot in slots for message in slot]
+    if edited_message is not None:
+        # Same id as the original AI message, so add_messages replaces it in place
+        messages.insert(0, edited_message)
+
+    # Tool execution counts towards the run deadline; time waiting for the reviewer does not
+    usage = ExecutionBudget.charge(state.get("run_budget"), seconds=tool_seconds)
+
+    # A run that ran out of budget ends once the reviewer has answered the Question
+    if end or usage.get("exhausted"):
+        record_run(usage, _platform(state))
+        return Command(goto=END, update={"messages": messages, "run_budget": usage})
+    return Command(goto="llm_call", update={"messages": messages, "run_budget": usage})
 
-        # Catch all other responses
-        else:
-            raise ValueError(f"Invalid response: {response}")
-            
-    # Update the state 
-    update = {
-        "messages": result,
-    }
-
-    return Command(goto=goto, update=update)
+def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_call", "__end__"]]:
+    """Creates an interrupt for human review of tool calls"""
+    
+    tool_calls = state["messages"][-1].tool_calls
+
+    # Messages per tool call, so the result keeps tool_call order
+    slots = [[] for _ in tool_calls]
+
+    # Get all reviews before running any tool, since the node re-runs on every resume
+    reviewed = _review_hitl_calls(state, tool_calls)
+    to_run, edited_message, end = _apply_reviews(state, tool_calls, reviewed, slots)
+    _remember_approved(state, store, tool_calls, reviewed)
+    _record_feedback(state, store, tool_calls, reviewed)
+
+    # Tools not in our HITL list are executed directly without review, all at once
+    start = time.perf_counter()
+    direct = [i for i, tool_call in enumerate(tool_calls) if tool_call["name"] not in HITL_TOOLS]
+    for i, message in zip(direct, tool_runner.run([tool_calls[i] for i in direct])):
+        slots[i].append(message)
+    for i, tool_args in to_run:
+        observation = invoke_tool(tools_by_name[tool_calls[i]["name"]], tool_args)
+        # Add only the tool response message
+        slots[i].append({"role": "tool", "content": observation, "tool_call_id": tool_calls[i]["id"]})
+    tool_seconds = time.perf_counter() - start
+
+    # Go to the LLM call node next, unless the reviewer ended the workflow
+    return _handler_command(state, slots, edited_message, end, tool_seconds)
+
+async def ainterrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_call", "__end__"]]:
+    """Async version of `interrupt_handler`: tools run with `ainvoke`."""
+    
+    tool_calls = state["messages"][-1].tool_calls
+
+    # Messages per tool call, so the result keeps tool_call order
+    slots = [[] for _ in tool_calls]
+
+    # Get all reviews before running any tool, since the node re-runs on every resume
+    reviewed = _review_hitl_calls(state, tool_calls)
+    to_run, edited_message, end = _apply_reviews(state, tool_calls, reviewed, slots)
+    await asyncio.to_thread(_remember_approved, state, store, tool_calls, reviewed)
+    await asyncio.to_thread(_record_feedback, state, store, tool_calls, reviewed)
+
+    # Tools not in our HITL list are executed directly without review, all at once
+    start = time.perf_counter()
+    direct = [i for i, tool_call in enumerate(tool_calls) if tool_call["name"] not in HITL_TOOLS]
+    for i, message in zip(direct, await tool_runner.arun([tool_calls[i] for i in direct])):
+        slots[i].append(message)
+    for i, tool_args in to_run:
+        observation = await ainvoke_tool(tools_by_name[tool_calls[i]["name"]], tool_args)
+        slots[i].append({"role": "tool", "content": observation, "tool_call_id": tool_calls[i]["id"]})
+    tool_seconds = time.perf_counter() - start
+
+    # Go to the LLM call node next, unless the reviewer ended the workflow
+    return _handler_command(state, slots, edited_message, end, tool_seconds)
 
 # Conditional edge function
 def should_continue(state: State, store: BaseStore) -> Literal["interrupt_handler", "__end__"]:
@@ -458,35 +1174,66 @@ def should_continue(state: State, store: BaseStore) -> Literal["interrupt_handle
     return "interrupt_handler"
 
 
-# Build workflow
-agent_builder = StateGraph(State)
+def build_response_agent(llm_call_node, interrupt_handler_node):
+    """Build and compile the llm_call <-> interrupt_handler response agent subgraph."""
 
-# Add nodes
-agent_builder.add_node("llm_call", llm_call)
-agent_builder.add_node("interrupt_handler", interrupt_handler)
+    # Build workflow
+    agent_builder = StateGraph(State)
 
-# Add edges
-agent_builder.add_edge(START, "llm_call")
-agent_builder.add_conditional_edges(
-    "llm_call",
-    should_continue,
-    {
-        "interrupt_handler": "interrupt_handler",
-        END: END,
-    },
-)
+    # Add nodes
+    agent_builder.add_node("llm_call", llm_call_node)
+    agent_builder.add_node("interrupt_handler", interrupt_handler_node)
 
-# Compile the agent
-response_agent = agent_builder.compile()
+    # Add edges
+    agent_builder.add_edge(START, "llm_call")
+    agent_builder.add_conditional_edges(
+        "llm_call",
+        should_continue,
+        {
+            "interrupt_handler": "interrupt_handler",
+            END: END,
+        },
+    )
 
-# Build overall workflow
-overall_workflow = (
-    StateGraph(State, input=StateInput)
-    .add_node(triage_router)
-    .add_node(triage_interrupt_handler)
-    .add_node("response_agent", response_agent)
-    .add_edge(START, "triage_router")
-)
+    # Compile the agent
+    return agent_builder.compile()
+
+def build_overall_workflow(triage_router_node, compact_history_node, response_agent_graph) -> StateGraph:
+    """Build the triage -> compact history -> response agent workflow (uncompiled)."""
+    return (
+        StateGraph(State, input=StateInput)
+        .add_node("triage_router", triage_router_node)
+        .add_node(triage_interrupt_handler)
+        .add_node("compact_history", compact_history_node)
+        .add_node("response_agent", response_agent_graph)
+        .add_edge(START, "triage_router")
+        .add_edge("compact_history", "response_agent")
+    )
+
+# Sync workflow (nodes call invoke())
+response_agent = build_response_agent(llm_call, interrupt_handler)
+overall_workflow = build_overall_workflow(triage_router, compact_history, response_agent)
+
+# Async workflow (nodes call ainvoke()), lets one server process interleave many runs
+async_response_agent = build_response_agent(allm_call, ainterrupt_handler)
+async_overall_workflow = build_overall_workflow(atriage_router, acompact_history, async_response_agent)
+
+# Compiled without a checkpointer: the LangGraph server provides its own persistence and store.
+# src/webapp.py flushes buffered preference writes to that store when the server shuts down
+async_graph = async_overall_workflow.compile()
+
+def pool_settings() -> dict:
+    """Postgres connection pool sizing.
+
+    Every worker process opens its own pool, so DB_POOL_MAX_SIZE times the
+    number of workers must stay below the server's max_connections.
+    """
+    return {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "20")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+        "max_idle": float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "600")),
+    }
 
 # Initialize PostgreSQL checkpointer and store if DATABASE_URL is set
 DB_URI = os.getenv("DATABASE_URL")
@@ -494,21 +1241,31 @@ DB_URI = os.getenv("DATABASE_URL")
 if DB_URI:
     try:
         from langgraph.checkpoint.postgres import PostgresSaver
+        from langgraph.store.postgres import PostgresStore
         from psycopg_pool import ConnectionPool
+        from psycopg.rows import dict_row
         
-        # Create connection pool
+        # Create connection pool (the checkpointer and store need autocommit connections returning dict rows)
         connection_pool = ConnectionPool(
             conninfo=DB_URI,
-            max_size=20,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+            **pool_settings(),
         )
         
         # Create checkpointer with connection pool
         checkpointer = PostgresSaver(connection_pool)
         checkpointer.setup()
+
+        # Durable store for user preferences and approved replies, on the same pool
+        postgres_store = PostgresStore(connection_pool)
+        postgres_store.setup()
+
+        # Share cached triage decisions across workers
+        if TRIAGE_CACHE_ENABLED and os.getenv("TRIAGE_CACHE_SHARED", "true").lower() == "true":
+            triage_cache.attach_pool(connection_pool)
         
-        # For now, compile with just checkpointer (Store requires async)
-        graph = overall_workflow.compile(checkpointer=checkpointer)
-        print("✅ PostgreSQL persistence enabled (Checkpointer)")
+        graph = overall_workflow.compile(checkpointer=checkpointer, store=postgres_store)
+        print("✅ PostgreSQL persistence enabled (Checkpointer + Store)")
     except Exception as e:
         print(f"⚠️  PostgreSQL setup failed: {e}")
         print("   Falling back to in-memory storage")
@@ -0,0 +1,127 @@
+"""Execution budget for the response agent loop.
+
+The response agent loops between `llm_call` and `interrupt_handler` until the
+model calls `Done`. The budget bounds one run of that loop: the number of
+`llm_call` iterations, the tokens spent, the agent's own elapsed time (LLM
+calls and tool execution, not time spent waiting for a reviewer) and the
+duration of a single `llm_call`.
+
+Consumption is kept in `state["run_budget"]` so it survives interrupts and
+resumes. When a limit is hit, the agent stops calling the model and asks the
+reviewer a Question instead, then ends the run.
+"""
+
+import os
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.messages import AIMessage
+
+from src.metrics import metrics
+from src.preprocessing import estimate_tokens
+
+
+def response_tokens(response: Any, prompt_messages: Optional[list] = None) -> int:
+    """Tokens used by a model call: provider usage if reported, otherwise an estimate."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("total_tokens"):
+        return usage["total_tokens"]
+    tokens = estimate_tokens(str(getattr(response, "content", "")))
+    tokens += sum(estimate_tokens(str(tool_call["args"])) for tool_call in getattr(response, "tool_calls", None) or [])
+    for message in prompt_messages or []:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        tokens += estimate_tokens(str(content))
+    return tokens
+
+
+class ExecutionBudget:
+    """Limits for one response agent run. A limit of 0 disables it.
+
+    Args:
+        max_iterations: Maximum number of llm_call iterations
+        node_timeout_seconds: Maximum duration of a single llm_call
+        run_deadline_seconds: Maximum agent time (LLM calls plus tool execution) for the run
+        max_tokens: Maximum tokens spent on agent LLM calls in the run
+    """
+
+    def __init__(
+        self,
+        max_iterations: int = 10,
+        node_timeout_seconds: float = 60.0,
+        run_deadline_seconds: float = 180.0,
+        max_tokens: int = 60000,
+    ):
+        self.max_iterations = max_iterations
+        self.node_timeout_seconds = node_timeout_seconds
+        self.run_deadline_seconds = run_deadline_seconds
+        self.max_tokens = max_tokens
+
+    @classmethod
+    def from_env(cls) -> "ExecutionBudget":
+        return cls(
+            max_iterations=int(os.getenv("AGENT_MAX_ITERATIONS", "10")),
+            node_timeout_seconds=float(os.getenv("AGENT_NODE_TIMEOUT_SECONDS", "60")),
+            run_deadline_seconds=float(os.getenv("AGENT_RUN_DEADLINE_SECONDS", "180")),
+            max_tokens=int(os.getenv("AGENT_MAX_TOKENS", "60000")),
+        )
+
+    @staticmethod
+    def start() -> Dict[str, Any]:
+        """Fresh consumption record for a new run."""
+        return {"iterations": 0, "tokens": 0, "elapsed_seconds": 0.0, "exhausted": None}
+
+    @staticmethod
+    def charge(usage: Optional[Dict[str, Any]], iterations: int = 0, tokens: int = 0, seconds: float = 0.0) -> Dict[str, Any]:
+        """New consumption record with the given amounts added."""
+        usage = dict(usage or ExecutionBudget.start())
+        usage["iterations"] += iterations
+        usage["tokens"] += tokens
+        usage["elapsed_seconds"] += seconds
+        return usage
+
+    def exceeded(self, usage: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+        """(limit, reason) if the run is out of budget, otherwise None."""
+        usage = usage or self.start()
+        if self.max_iterations and usage["iterations"] >= self.max_iterations:
+            return "iterations", f"reached the limit of {self.max_iterations} steps"
+        if self.max_tokens and usage["tokens"] >= self.max_tokens:
+            return "tokens", f"used {usage['tokens']} of {self.max_tokens} tokens"
+        if self.run_deadline_seconds and usage["elapsed_seconds"] >= self.run_deadline_seconds:
+            return "deadline", f"ran for {usage['elapsed_seconds']:.0f}s, over the {self.run_deadline_seconds:g}s deadline"
+        return None
+
+    def remaining_seconds(self, usage: Optional[Dict[str, Any]]) -> Optional[float]:
+        """Timeout for the next llm_call: the node timeout, capped by what is left of the deadline."""
+        limits = []
+        if self.node_timeout_seconds:
+            limits.append(self.node_timeout_seconds)
+        if self.run_deadline_seconds:
+            limits.append(max(self.run_deadline_seconds - (usage or self.start())["elapsed_seconds"], 0.0))
+        return min(limits) if limits else None
+
+    def degrade(self, usage: Optional[Dict[str, Any]], limit: str, reason: str, platform: str) -> Dict[str, Any]:
+        """State update that replaces the next model call with a Question for the reviewer.
+
+        The run is marked exhausted so `interrupt_handler` ends it after the review.
+        """
+        metrics.incr("agent_budget_exhausted", platform=platform, limit=limit)
+        usage = dict(usage or self.start())
+        usage["exhausted"] = reason
+        question = AIMessage(
+            content="",
+            tool_calls=[{
+                "name": "Question",
+                "args": {"content": f"I couldn't finish a reply to this message: the agent {reason}. How should I respond?"},
+                "id": f"budget_{uuid.uuid4().hex[:12]}",
+            }],
+        )
+        return {"messages": [question], "run_budget": usage}
+
+
+def record_run(usage: Optional[Dict[str, Any]], platform: str):
+    """Export the budget consumption of a finished run."""
+    if not usage:
+        return
+    metrics.observe("agent_run_iterations", usage["iterations"], platform=platform)
+    metrics.observe("agent_run_tokens", usage["tokens"], platform=platform)
+    metrics.observe("agent_run_seconds", usage["elapsed_seconds"], platform=platform)
@@ -0,0 +1,110 @@
+"""Bounded in-memory cache with per-entry TTL and LRU eviction."""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from src.metrics import metrics
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache where every entry also expires after a TTL.
+
+    Hit/miss/eviction counts are exported to the metrics registry under
+    `cache_*{cache=<name>}`.
+
+    Args:
+        name: Cache name used as the metrics label
+        max_entries: Maximum number of entries before the least recently used is evicted
+        ttl_seconds: Default time-to-live for entries
+    """
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl_seconds: float = 3600):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] <= now:
+                del self._data[key]
+                self._expirations += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self._misses += 1
+            else:
+                self._data.move_to_end(key)
+                self._hits += 1
+
+        if entry is _MISSING:
+            metrics.incr("cache_misses", cache=self.name)
+            return default
+        metrics.incr("cache_hits", cache=self.name)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Insert or replace an entry, evicting the least recently used entries if full."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        evicted = 0
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+            self._evictions += evicted
+        if evicted:
+            metrics.incr("cache_evictions", evicted, cache=self.name)
+
+    def delete(self, key: Hashable):
+        """Remove an entry if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove all entries whose key matches the predicate. Returns the number removed."""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+        if stale:
+            metrics.incr("cache_invalidations", len(stale), cache=self.name)
+        return len(stale)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size, for sizing the cache."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
@@ -0,0 +1,133 @@
+"""Conversation history compaction for long-lived sender threads.
+
+Threads are keyed per sender, so `state["messages"]` keeps growing for repeat
+contacts and every `llm_call` would resend the whole history. Once the history
+passes a token threshold, older turns are folded into a running summary kept in
+`state["conversation_summary"]` and removed from the message list, leaving a
+sliding window of recent turns.
+
+The window always starts at a human message, so an AI message with tool calls
+is never separated from its tool results.
+"""
+
+import json
+from typing import List, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage, RemoveMessage
+
+from src.metrics import metrics
+from src.preprocessing import estimate_tokens
+from src.prompts import conversation_summary_prompt
+from src.utils import extract_message_content
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Estimated tokens for a message, including tool-call arguments."""
+    tokens = estimate_tokens(extract_message_content(message))
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(tool_call["name"]) + estimate_tokens(json.dumps(tool_call["args"], default=str))
+    return tokens
+
+
+def history_tokens(messages: List[BaseMessage]) -> int:
+    """Estimated tokens for a list of messages."""
+    return sum(message_tokens(m) for m in messages)
+
+
+def split_history(messages: List[BaseMessage], keep_tokens: int) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """Split messages into (older, recent) so recent fits in keep_tokens and starts a turn.
+
+    The most recent turn is always kept, even if it alone exceeds keep_tokens.
+    Returns ([], messages) when there is nothing to compact.
+    """
+    human_indices = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if len(human_indices) < 2:
+        return [], messages
+
+    # Walk turn boundaries backwards, growing the window while it fits
+    boundary = human_indices[-1]
+    for index in reversed(human_indices[:-1]):
+        if history_tokens(messages[index:]) > keep_tokens:
+            break
+        boundary = index
+
+    return messages[:boundary], messages[boundary:]
+
+
+def format_transcript(messages: List[BaseMessage]) -> str:
+    """Render messages as a plain transcript for the summarizer."""
+    lines = []
+    for message in messages:
+        content = extract_message_content(message).strip()
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {content}")
+        elif isinstance(message, AIMessage):
+            for tool_call in message.tool_calls or []:
+                lines.append(f"Assistant called {tool_call['name']}: {json.dumps(tool_call['args'], default=str)}")
+            if content:
+                lines.append(f"Assistant: {content}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Tool result: {content}")
+        else:
+            lines.append(f"{message.type}: {content}")
+    return "\n".join(lines)
+
+
+class HistoryCompactor:
+    """Decides when to compact and produces the state update.
+
+    Args:
+        model: Chat model used to update the summary
+        trigger_tokens: Compact once the history exceeds this many tokens
+        keep_tokens: Token budget for the window of recent turns kept verbatim
+        summary_max_words: Length limit given to the summarizer
+    """
+
+    def __init__(self, model, trigger_tokens: int = 6000, keep_tokens: int = 2000, summary_max_words: int = 250):
+        self.model = model
+        self.trigger_tokens = trigger_tokens
+        self.keep_tokens = keep_tokens
+        self.summary_max_words = summary_max_words
+
+    def needs_compaction(self, messages: List[BaseMessage]) -> bool:
+        return history_tokens(messages) > self.trigger_tokens
+
+    def _plan(self, messages: List[BaseMessage]):
+        if not self.needs_compaction(messages):
+            return None
+        older, _recent = split_history(messages, self.keep_tokens)
+        return older or None
+
+    def _summary_request(self, summary: str, older: List[BaseMessage]) -> list:
+        return [{
+            "role": "user",
+            "content": conversation_summary_prompt.format(
+                max_words=self.summary_max_words,
+                summary=summary or "(none yet)",
+                transcript=format_transcript(older),
+            ),
+        }]
+
+    def _update(self, older: List[BaseMessage], new_summary: str) -> dict:
+        metrics.incr("history_compactions")
+        metrics.observe("history_compacted_tokens", history_tokens(older))
+        return {
+            "messages": [RemoveMessage(id=m.id) for m in older],
+            "conversation_summary": new_summary.strip(),
+        }
+
+    def compact(self, messages: List[BaseMessage], summary: str) -> dict:
+        """State update that folds older turns into the summary ({} if not needed)."""
+        older = self._plan(messages)
+        if older is None:
+            return {}
+        response = self.model.invoke(self._summary_request(summary, older))
+        return self._update(older, extract_message_content(response))
+
+    async def acompact(self, messages: List[BaseMessage], summary: str) -> dict:
+        """Async version of `compact`."""
+        older = self._plan(messages)
+        if older is None:
+            return {}
+        response = await self.model.ainvoke(self._summary_request(summary, older))
+        return self._update(older, extract_message_content(response))
@@ -0,0 +1,125 @@
+"""Bounded summary of a user's HITL feedback.
+
+`UserPreferences.common_edits` and `ignored_suggestions` used to be lists that
+grew with every review. `FeedbackSummary` keeps their size fixed no matter how
+long a customer has been around:
+
+- `top`: up to TOP_K most frequent items with their estimated counts
+- `sketch`: a count-min sketch (SKETCH_DEPTH x SKETCH_WIDTH counters, conservative
+  update) estimating the count of any item, including ones not currently in `top`
+- `recent`: the last RECENT_SIZE items, oldest first
+- `total`: number of items ever added
+
+A new item enters `top` once its sketch estimate exceeds the smallest tracked
+count, which it then replaces (heavy hitters over the sketch, so a burst of
+one-off items does not churn the top list).
+
+Summaries are mergeable: `merge` sums the sketches element-wise and recomputes
+`top` from both summaries' estimates, so concurrent workers can each record a
+delta summary and add it to the stored one instead of overwriting it.
+"""
+
+import re
+import hashlib
+from typing import Any, Iterable, List, Tuple
+
+from pydantic import BaseModel
+
+TOP_K = 8
+RECENT_SIZE = 5
+SKETCH_DEPTH = 4
+SKETCH_WIDTH = 64
+MAX_ITEM_CHARS = 120
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_item(item: str) -> str:
+    return _WS_RE.sub(" ", str(item)).strip()[:MAX_ITEM_CHARS]
+
+
+def _buckets(item: str) -> List[int]:
+    """One counter index per sketch row (stable across processes, unlike hash())."""
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=4 * SKETCH_DEPTH).digest()
+    return [
+        row * SKETCH_WIDTH + int.from_bytes(digest[4 * row:4 * row + 4], "little") % SKETCH_WIDTH
+        for row in range(SKETCH_DEPTH)
+    ]
+
+
+class FeedbackSummary(BaseModel):
+    """Fixed-size frequency summary of feedback items (see module docstring)."""
+
+    top: dict[str, int] = {}
+    sketch: list[int] = []  # Flattened rows, empty until the first item is added
+    recent: list[str] = []
+    total: int = 0
+
+    @classmethod
+    def from_items(cls, items: Iterable[str]) -> "FeedbackSummary":
+        """Summary of a plain list of items (used to migrate old list records)."""
+        summary = cls()
+        for item in items:
+            summary.add(item)
+        return summary
+
+    @classmethod
+    def coerce(cls, value: Any) -> Any:
+        """Accept the old list format in addition to a serialized summary."""
+        if isinstance(value, (list, tuple)):
+            return cls.from_items(value)
+        return value
+
+    def add(self, item: str):
+        item = normalize_item(item)
+        if not item:
+            return
+        self.total += 1
+        self.recent = (self.recent + [item])[-RECENT_SIZE:]
+
+        if len(self.sketch) != SKETCH_DEPTH * SKETCH_WIDTH:
+            self.sketch = [0] * (SKETCH_DEPTH * SKETCH_WIDTH)
+        # Conservative update: only raise the counters that hold the current minimum
+        buckets = _buckets(item)
+        estimate = min(self.sketch[index] for index in buckets) + 1
+        for index in buckets:
+            self.sketch[index] = max(self.sketch[index], estimate)
+
+        if item in self.top:
+            self.top[item] += 1
+        elif len(self.top) < TOP_K:
+            self.top[item] = estimate
+        else:
+            smallest = min(self.top, key=self.top.get)
+            if estimate > self.top[smallest]:
+                del self.top[smallest]
+                self.top[item] = estimate
+
+    def merge(self, other: "FeedbackSummary"):
+        """Add another summary's items to this one (e.g. a buffered delta into the stored summary)."""
+        if not other.total:
+            return
+        candidates = set(self.top) | set(other.top)
+        estimates = {item: self.count(item) + other.count(item) for item in candidates}
+        if not self.sketch:
+            self.sketch = list(other.sketch)
+        elif other.sketch:
+            self.sketch = [a + b for a, b in zip(self.sketch, other.sketch)]
+        self.top = dict(sorted(estimates.items(), key=lambda entry: entry[1], reverse=True)[:TOP_K])
+        self.recent = (self.recent + other.recent)[-RECENT_SIZE:]
+        self.total += other.total
+
+    def count(self, item: str) -> int:
+        """Estimated number of times an item was added (never an underestimate)."""
+        item = normalize_item(item)
+        if item in self.top:
+            return self.top[item]
+        if not self.sketch:
+            return 0
+        return min(self.sketch[index] for index in _buckets(item))
+
+    def most_common(self, n: int = TOP_K) -> List[Tuple[str, int]]:
+        return sorted(self.top.items(), key=lambda entry: entry[1], reverse=True)[:n]
+
+    def __len__(self) -> int:
+        return self.total
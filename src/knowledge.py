@@ -0,0 +1,195 @@
+"""Retrieval over the business knowledge used in prompts.
+
+`default_background`, `default_response_preferences` and
+`default_cal_preferences` are split into sections (paragraphs, list items
+under a heading) and indexed with BM25 at startup. For each message only the
+top-k relevant sections go into the prompt, under a token cap, so prompt size
+stays flat as the knowledge grows.
+
+The first section of each source (the framing paragraph) is always included.
+When nothing in the message matches, the full text is used (configurable).
+"""
+
+import re
+import math
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from src.metrics import metrics
+from src.preprocessing import estimate_tokens
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "for", "from", "have", "hi", "hello",
+    "i", "if", "in", "is", "it", "its", "me", "my", "of", "on", "or", "our", "so", "that", "the", "their",
+    "them", "they", "this", "to", "us", "was", "we", "what", "when", "which", "with", "would", "you", "your",
+}
+# A line like "Our Training Programs:" or "When scheduling discovery calls:" starts a group of sections
+_HEADING_RE = re.compile(r"^[^\n]{1,80}:\s*$")
+_NUMBERED_RE = re.compile(r"^\d+\.\s")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords, with a crude plural fold."""
+    tokens = []
+    for word in _WORD_RE.findall((text or "").lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+@dataclass
+class Section:
+    source: str
+    position: int
+    heading: Optional[str]
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def split_sections(source: str, text: str) -> List[Section]:
+    """Split a knowledge text into sections.
+
+    Blocks are separated by blank lines. A block that starts with a heading
+    line (ending in ":") sets the heading for the blocks that follow, and a
+    numbered list item starts its own section.
+    """
+    sections: List[Section] = []
+    heading = None
+    for block in re.split(r"\n\s*\n", text.strip()):
+        lines = [line.rstrip() for line in block.strip().splitlines() if line.strip()]
+        if not lines:
+            continue
+        if _HEADING_RE.match(lines[0]) and not _NUMBERED_RE.match(lines[0]):
+            heading = lines[0].strip()
+            lines = lines[1:]
+            if not lines:
+                continue
+        # Numbered items inside one block become separate sections
+        chunks: List[List[str]] = []
+        for line in lines:
+            if _NUMBERED_RE.match(line.strip()) or not chunks:
+                chunks.append([line])
+            else:
+                chunks[-1].append(line)
+        for chunk in chunks:
+            sections.append(Section(source=source, position=len(sections), heading=heading, text="\n".join(chunk)))
+    return sections
+
+
+class BM25Index:
+    """Okapi BM25 over a list of sections (heading words count towards each section)."""
+
+    def __init__(self, sections: List[Section], k1: float = 1.5, b: float = 0.75):
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+        self._tf = [Counter(tokenize(f"{s.heading or ''}\n{s.text}")) for s in sections]
+        self._lengths = [sum(tf.values()) for tf in self._tf]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        df = Counter(term for tf in self._tf for term in tf)
+        n = len(sections)
+        self._idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def scores(self, query: str) -> List[float]:
+        terms = set(tokenize(query))
+        scores = []
+        for tf, length in zip(self._tf, self._lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+
+class KnowledgeBase:
+    """Sectioned, BM25-indexed knowledge sources with top-k retrieval.
+
+    Args:
+        sources: Source name -> full text (e.g. {"background": default_background})
+        top_k: Maximum number of retrieved sections (pinned sections not counted)
+        max_tokens: Token cap for everything retrieved across sources
+        fallback_full_text: Use the full text when no section matches the query
+    """
+
+    def __init__(self, sources: Dict[str, str], top_k: int = 6, max_tokens: int = 800, fallback_full_text: bool = True):
+        self.sources = dict(sources)
+        self.top_k = top_k
+        self.max_tokens = max_tokens
+        self.fallback_full_text = fallback_full_text
+        self.sections: List[Section] = []
+        for name, text in self.sources.items():
+            self.sections.extend(split_sections(name, text))
+        self.index = BM25Index(self.sections)
+
+    def _pinned(self) -> List[Section]:
+        seen, pinned = set(), []
+        for section in self.sections:
+            if section.source not in seen:
+                seen.add(section.source)
+                pinned.append(section)
+        return pinned
+
+    def retrieve(self, query: str, sources: Optional[List[str]] = None) -> Dict[str, str]:
+        """Text per source, made of the pinned and top-k relevant sections in original order.
+
+        Args:
+            query: Text to match (usually the message subject and body)
+            sources: Only search and return these sources (default: all)
+        """
+        names = [name for name in self.sources if sources is None or name in sources]
+        scores = self.index.scores(query)
+        ranked = sorted(
+            (i for i, score in enumerate(scores) if score > 0 and self.sections[i].source in names),
+            key=lambda i: scores[i],
+            reverse=True,
+        )
+        if not ranked and self.fallback_full_text:
+            metrics.incr("knowledge_retrievals", outcome="full_text")
+            return {name: self.sources[name] for name in names}
+
+        selected = [section for section in self._pinned() if section.source in names]
+        budget = self.max_tokens - sum(s.tokens for s in selected)
+        added = 0
+        for i in ranked:
+            section = self.sections[i]
+            if added >= self.top_k:
+                break
+            if section in selected or section.tokens > budget:
+                continue
+            selected.append(section)
+            budget -= section.tokens
+            added += 1
+
+        retrieved = {name: self._render([s for s in selected if s.source == name]) for name in names}
+        metrics.incr("knowledge_retrievals", outcome="retrieved")
+        metrics.observe("knowledge_retrieved_tokens", sum(estimate_tokens(text) for text in retrieved.values()))
+        return retrieved
+
+    @staticmethod
+    def _render(sections: List[Section]) -> str:
+        """Sections in original order, each heading written once."""
+        parts, heading = [], None
+        for section in sorted(sections, key=lambda s: s.position):
+            text = section.text
+            if section.heading and section.heading != heading:
+                text = f"{section.heading}\n{text}"
+            heading = section.heading
+            parts.append(text)
+        return "\n" + "\n\n".join(parts) + "\n"
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sections": len(self.sections),
+            "full_text_tokens": sum(estimate_tokens(text) for text in self.sources.values()),
+        }
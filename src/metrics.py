@@ -0,0 +1,72 @@
+"""In-process metrics registry.
+
+Counters and timing summaries used by the triage pipeline, caches and the
+agent loop. Everything is kept in memory per process; call `metrics.snapshot()`
+to export the current values (e.g. from a debug endpoint or a log line).
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, Any
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    """Build a Prometheus-style series key, e.g. `triage_rule_hits{rule=noreply}`."""
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters and summaries (count/sum/min/max)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1, **labels):
+        """Increment a counter."""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record an observation (latency, token count, ...) in a summary."""
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = {"count": 1, "sum": value, "min": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["sum"] += value
+                summary["min"] = min(summary["min"], value)
+                summary["max"] = max(summary["max"], value)
+
+    def get(self, name: str, **labels) -> float:
+        """Return the current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def snapshot(self, prefix: str = "") -> Dict[str, Any]:
+        """Return a copy of all counters and summaries, optionally filtered by name prefix."""
+        with self._lock:
+            counters = {k: v for k, v in self._counters.items() if k.startswith(prefix)}
+            summaries = {
+                k: {**v, "avg": v["sum"] / v["count"]}
+                for k, v in self._summaries.items()
+                if k.startswith(prefix)
+            }
+        return {"counters": counters, "summaries": summaries}
+
+    def reset(self):
+        """Clear all recorded values."""
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
@@ -0,0 +1,322 @@
+"""Read-through cache and write-behind buffer for `UserPreferences`.
+
+Every triage reads the sender's preferences and records the interaction, which
+used to cost a `store.get` plus a `store.put` per message on the critical path.
+`PreferenceCache` keeps recently used preferences in a bounded TTL cache and
+buffers writes:
+
+- field updates are last-writer-wins and only the latest value is written
+- counter fields (`total_messages`) are kept as deltas and added to the value
+  read back from the store at flush time, so increments from other workers
+  made since this process loaded the preferences are not overwritten
+- feedback summaries (`common_edits`, `ignored_suggestions`) are buffered as
+  delta summaries and merged into the stored ones at flush time, for the same
+  reason
+- pending writes for all threads are flushed together with one batched read
+  and one batched `store.batch` put, after `flush_interval_seconds`, once
+  `max_pending` threads are dirty, or at interpreter shutdown (sync stores)
+
+Async stores (e.g. `AsyncPostgresStore`) only run on their event loop: use
+`aget`/`aupdate`/`aflush` from async nodes. Their flushes always run on that
+loop; a flush started from another thread (the timer) is scheduled there, and
+buffered writes must be flushed with `aflush` before the loop closes
+(`aflush_all` flushes every cache; the server's lifespan in src/webapp.py
+awaits it on shutdown).
+"""
+
+import atexit
+import asyncio
+import logging
+import weakref
+import threading
+from collections import Counter
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from langgraph.store.base import BaseStore, GetOp, PutOp
+from langgraph.store.base.batch import AsyncBatchedBaseStore
+
+from src.cache import TTLCache
+from src.metrics import metrics
+from src.feedback import FeedbackSummary
+from src.schemas import UserPreferences
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = ("user_preferences",)
+# Fields merged as increments rather than overwritten
+COUNTER_FIELDS = ("total_messages",)
+
+# Every live cache, for `aflush_all`
+_caches: "weakref.WeakSet[PreferenceCache]" = weakref.WeakSet()
+
+
+def default_preferences(thread_id: str) -> UserPreferences:
+    """Preferences for a sender seen for the first time (thread_id is platform_username)."""
+    platform, username = thread_id.split("_", 1)
+    return UserPreferences(platform=platform, username=username)
+
+
+def _store_loop(store: BaseStore) -> Optional[asyncio.AbstractEventLoop]:
+    """Event loop an async store is bound to (None for stores usable from any thread)."""
+    return store._loop if isinstance(store, AsyncBatchedBaseStore) else None
+
+
+def _merged(value: Any, delta: FeedbackSummary) -> FeedbackSummary:
+    """Copy of a stored feedback summary (or legacy list) with a delta summary merged in."""
+    summary = FeedbackSummary.model_validate(FeedbackSummary.coerce(value if value is not None else [])).model_copy(deep=True)
+    summary.merge(delta)
+    return summary
+
+
+def _apply_change(values: Dict[str, Any], change: Dict[str, Any]) -> Dict[str, Any]:
+    """Preference values with a buffered change applied on top."""
+    values = {**values, **change["set"]}
+    for field, delta in change["incr"].items():
+        values[field] = values.get(field, 0) + delta
+    for field, delta in change["merge"].items():
+        values[field] = _merged(values.get(field), delta).dict()
+    return values
+
+
+class PreferenceCache:
+    """Per-process cache of user preferences with batched write-behind.
+
+    Args:
+        max_entries: Maximum number of cached preferences
+        ttl_seconds: How long cached preferences are trusted before re-reading the store
+        flush_interval_seconds: Maximum time a write stays buffered
+        max_pending: Number of dirty threads that triggers an immediate flush
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300, flush_interval_seconds: float = 5.0, max_pending: int = 100):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self._cache = TTLCache("user_preferences", max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        # id(store) -> (store, {thread_id: {"set": {...}, "incr": Counter, "merge": {field: FeedbackSummary}}})
+        self._pending: Dict[int, Tuple[BaseStore, Dict[str, Dict[str, Any]]]] = {}
+        self._timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+        _caches.add(self)
+
+    @staticmethod
+    def _key(store: BaseStore, thread_id: str) -> Hashable:
+        return (id(store), thread_id)
+
+    def _with_pending(self, store: BaseStore, thread_id: str, prefs: UserPreferences) -> UserPreferences:
+        """Apply buffered writes on top of preferences read from the store."""
+        with self._lock:
+            change = self._pending.get(id(store), (None, {}))[1].get(thread_id)
+            if change is None:
+                return prefs
+            values = _apply_change(prefs.dict(), change)
+        return UserPreferences(**values)
+
+    def _loaded(self, store: BaseStore, thread_id: str, item) -> UserPreferences:
+        if item:
+            prefs = self._with_pending(store, thread_id, UserPreferences(**item.value))
+        else:
+            # Created lazily: an empty change marks the thread dirty, and the flush writes the
+            # defaults only if no other worker has created the preferences in the meantime
+            prefs = self._with_pending(store, thread_id, default_preferences(thread_id))
+            self._buffer(store, thread_id, {}, {}, {})
+        self._cache.set(self._key(store, thread_id), prefs)
+        return prefs
+
+    def _apply(
+        self,
+        store: BaseStore,
+        thread_id: str,
+        prefs: UserPreferences,
+        updates: Optional[Dict[str, Any]],
+        increments: Optional[Dict[str, int]],
+        merges: Optional[Dict[str, FeedbackSummary]],
+    ) -> bool:
+        """Apply a change to the cached copy and buffer it. Returns whether to flush now."""
+        values = prefs.dict()
+        sets = {key: value for key, value in (updates or {}).items() if key in values and key not in COUNTER_FIELDS}
+        # Counters passed as updates are still merged as deltas, never overwritten
+        deltas = {key: delta for key, delta in (increments or {}).items() if key in COUNTER_FIELDS}
+        summaries = {key: delta for key, delta in (merges or {}).items() if key in values and delta.total}
+        values = _apply_change(values, {"set": sets, "incr": deltas, "merge": summaries})
+        prefs = UserPreferences(**values)
+        self._cache.set(self._key(store, thread_id), prefs)
+        # Buffer the validated, serialized values (e.g. a FeedbackSummary as a dict)
+        serialized = prefs.dict()
+        return self._buffer(store, thread_id, {key: serialized[key] for key in sets}, deltas, summaries)
+
+    def get(self, store: BaseStore, thread_id: str) -> UserPreferences:
+        """Cached preferences, read from the store on a miss (created if they don't exist)."""
+        prefs = self._cache.get(self._key(store, thread_id))
+        if prefs is not None:
+            return prefs.model_copy(deep=True)
+        return self._loaded(store, thread_id, store.get(NAMESPACE, thread_id)).model_copy(deep=True)
+
+    async def aget(self, store: BaseStore, thread_id: str) -> UserPreferences:
+        """Async version of `get`."""
+        prefs = self._cache.get(self._key(store, thread_id))
+        if prefs is not None:
+            return prefs.model_copy(deep=True)
+        return self._loaded(store, thread_id, await store.aget(NAMESPACE, thread_id)).model_copy(deep=True)
+
+    def update(
+        self,
+        store: BaseStore,
+        thread_id: str,
+        updates: Optional[Dict[str, Any]] = None,
+        increments: Optional[Dict[str, int]] = None,
+        merges: Optional[Dict[str, FeedbackSummary]] = None,
+    ):
+        """Buffer a change to a thread's preferences and apply it to the cached copy.
+
+        Args:
+            store: LangGraph store the preferences live in (not an async store on its event loop, see `aupdate`)
+            thread_id: User's thread ID
+            updates: Fields to overwrite (unknown fields are ignored)
+            increments: Counter fields to increase, merged as deltas at flush time
+            merges: Feedback summaries of new items, merged into the stored summaries at flush time
+        """
+        if self._apply(store, thread_id, self.get(store, thread_id), updates, increments, merges):
+            self.flush()
+
+    async def aupdate(
+        self,
+        store: BaseStore,
+        thread_id: str,
+        updates: Optional[Dict[str, Any]] = None,
+        increments: Optional[Dict[str, int]] = None,
+        merges: Optional[Dict[str, FeedbackSummary]] = None,
+    ):
+        """Async version of `update`, for async nodes."""
+        if self._apply(store, thread_id, await self.aget(store, thread_id), updates, increments, merges):
+            await self.aflush()
+
+    @staticmethod
+    def _combine(change: Dict[str, Any], sets: Dict[str, Any], deltas: Dict[str, int], summaries: Dict[str, FeedbackSummary]):
+        """Add a newer change to a buffered one."""
+        change["set"].update(sets)
+        change["incr"].update(deltas)
+        for field, delta in summaries.items():
+            if field in change["merge"]:
+                change["merge"][field].merge(delta)
+            else:
+                change["merge"][field] = delta.model_copy(deep=True)
+
+    def _buffer(self, store: BaseStore, thread_id: str, sets: Dict[str, Any], deltas: Dict[str, int], summaries: Dict[str, FeedbackSummary]) -> bool:
+        """Buffer a change. Returns whether enough threads are dirty to flush now."""
+        with self._lock:
+            pending = self._pending.setdefault(id(store), (store, {}))[1]
+            change = pending.setdefault(thread_id, {"set": {}, "incr": Counter(), "merge": {}})
+            self._combine(change, sets, deltas, summaries)
+            dirty = sum(len(threads) for _, threads in self._pending.values())
+            flush_now = dirty >= self.max_pending
+            if not flush_now and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        metrics.incr("preference_writes_buffered")
+        return flush_now
+
+    def _take(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> Dict[int, Tuple[BaseStore, Dict[str, Dict[str, Any]]]]:
+        """Pop the pending changes; with a loop, only those of sync stores and of async stores on that loop."""
+        with self._lock:
+            if loop is None:
+                pending, self._pending = self._pending, {}
+            else:
+                pending = {
+                    key: entry for key, entry in self._pending.items()
+                    if _store_loop(entry[0]) in (None, loop)
+                }
+                for key in pending:
+                    del self._pending[key]
+            if self._timer is not None and not self._pending:
+                self._timer.cancel()
+                self._timer = None
+        return pending
+
+    def _restore(self, store: BaseStore, changes: Dict[str, Dict[str, Any]]):
+        """Put back changes whose flush failed, under any changes made since."""
+        with self._lock:
+            pending = self._pending.setdefault(id(store), (store, {}))[1]
+            for thread_id, change in changes.items():
+                newer = pending.get(thread_id)
+                if newer is not None:
+                    self._combine(change, newer["set"], newer["incr"], newer["merge"])
+                pending[thread_id] = change
+
+    def _merge(self, store: BaseStore, thread_ids: list, items: list, changes: Dict[str, Dict[str, Any]]) -> list:
+        """Put ops with the buffered changes applied on top of the current stored values."""
+        ops = []
+        for thread_id, item in zip(thread_ids, items):
+            values = _apply_change(dict(item.value) if item else default_preferences(thread_id).dict(), changes[thread_id])
+            ops.append(PutOp(NAMESPACE, thread_id, values))
+            # Refresh the cached copy with increments made by other workers
+            self._cache.set(self._key(store, thread_id), self._with_pending(store, thread_id, UserPreferences(**values)))
+        return ops
+
+    def _flushed(self, thread_ids: list):
+        metrics.incr("preference_flushes")
+        metrics.observe("preference_flush_size", len(thread_ids))
+
+    def _flush_failed(self, store: BaseStore, changes: Dict[str, Dict[str, Any]], error: Exception):
+        logger.warning(f"Flushing {len(changes)} preference updates failed, will retry: {str(error)}")
+        self._restore(store, changes)
+        metrics.incr("preference_flush_failures")
+
+    def flush(self):
+        """Write all buffered changes: one batched read and one batched put per store.
+
+        Changes for async stores are flushed on their event loop: scheduled there
+        if it is running (this call doesn't wait for them), otherwise (e.g. at
+        shutdown) they are dropped with a warning.
+        """
+        for store, changes in self._take().values():
+            loop = _store_loop(store)
+            if loop is not None:
+                if loop.is_running():
+                    asyncio.run_coroutine_threadsafe(self._aflush_store(store, changes), loop)
+                else:
+                    logger.warning(f"Dropping {len(changes)} preference updates: the event loop of their async store is not running (await aflush() before closing it)")
+                    metrics.incr("preference_writes_dropped", len(changes))
+                continue
+            thread_ids = list(changes)
+            try:
+                items = store.batch([GetOp(NAMESPACE, thread_id) for thread_id in thread_ids])
+                store.batch(self._merge(store, thread_ids, items, changes))
+            except Exception as e:
+                self._flush_failed(store, changes, e)
+                continue
+            self._flushed(thread_ids)
+
+    async def _aflush_store(self, store: BaseStore, changes: Dict[str, Dict[str, Any]]):
+        thread_ids = list(changes)
+        try:
+            items = await store.abatch([GetOp(NAMESPACE, thread_id) for thread_id in thread_ids])
+            await store.abatch(self._merge(store, thread_ids, items, changes))
+        except Exception as e:
+            self._flush_failed(store, changes, e)
+            return
+        self._flushed(thread_ids)
+
+    async def aflush(self):
+        """Async version of `flush`, for the stores usable from the running loop.
+
+        Await it on shutdown of an async server, before the loop closes.
+        """
+        for store, changes in self._take(asyncio.get_running_loop()).values():
+            await self._aflush_store(store, changes)
+
+    def invalidate(self, thread_id: str):
+        """Drop a thread's cached preferences (e.g. after they were edited outside this process)."""
+        self._cache.invalidate(lambda key: key[1] == thread_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = sum(len(threads) for _, threads in self._pending.values())
+        return {**self._cache.stats(), "pending_writes": pending}
+
+
+async def aflush_all():
+    """`aflush` every preference cache of this process (await on shutdown, before the event loop closes)."""
+    for cache in list(_caches):
+        await cache.aflush()
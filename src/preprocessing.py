@@ -0,0 +1,214 @@
+"""Message preprocessing before content goes into LLM prompts.
+
+Email bodies arrive with the whole quoted reply chain, signatures and legal
+footers, which are often many times longer than the new content. This module
+strips them and enforces a token budget with head/tail truncation.
+"""
+
+import re
+import math
+import logging
+from typing import Optional, Tuple, Dict, Any, List
+
+import html2text
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lines that start the quoted history of a reply; everything from here on is dropped
+_REPLY_HEADER_RES = [
+    re.compile(r"^\s*On\b.{0,300}\bwrote:\s*$", re.IGNORECASE),
+    re.compile(r"^\s*Le\b.{0,300}\ba écrit\s*:\s*$", re.IGNORECASE),
+    re.compile(r"^\s*Am\b.{0,300}\bschrieb\b.{0,100}:\s*$", re.IGNORECASE),
+    re.compile(r"^\s*-{2,}\s*Original Message\s*-{2,}\s*$", re.IGNORECASE),
+]
+# Outlook-style header block: "From: ..." followed shortly by "Sent:"/"Date:"
+_OUTLOOK_FROM_RE = re.compile(r"^\s*\*?From:\*?\s+\S", re.IGNORECASE)
+_OUTLOOK_SENT_RE = re.compile(r"^\s*\*?(Sent|Date):\*?\s+\S", re.IGNORECASE)
+_QUOTE_LINE_RE = re.compile(r"^\s*>")
+
+# Signature markers (only the standard "-- " delimiter; a bare "--" line is often content)
+_SIG_DELIMITER_RE = re.compile(r"^-- $")
+_MOBILE_SIG_RE = re.compile(
+    r"^\s*(sent from my \w+|sent from (outlook|mail) for \w+|get outlook for \w+|sent from yahoo mail.*)\s*$",
+    re.IGNORECASE,
+)
+_SIGN_OFF_RE = re.compile(
+    r"^\s*((best|kind|warm|warmest)?\s*regards|best( wishes)?|thanks( so much)?|thank you|many thanks|cheers|sincerely|all the best)[,!.]?\s*$",
+    re.IGNORECASE,
+)
+# A sign-off only starts a signature if at most this many short, non-sentence lines follow it
+_MAX_SIGNATURE_LINES = 6
+_SENTENCE_RE = re.compile(r"^\s*(\S+\s+){3,}\S*[.!?]\s*$")
+
+# Legal footers and disclaimers. "confidential"/"privileged" also appear in ordinary
+# requests, so they only count next to a legal phrase or in the footer after a sign-off
+_DISCLAIMER_WORD_RE = re.compile(r"confidential|privileged|disclaimer", re.IGNORECASE)
+_DISCLAIMER_PHRASE_RE = re.compile(
+    r"(intended (solely |only )?for the (use of the )?(individual|addressee|named recipient|recipient)"
+    r"|if you (have )?received this (e-?mail|message|communication) in error|virus[- ]free"
+    r"|please consider the environment before printing)",
+    re.IGNORECASE,
+)
+_MIN_DISCLAIMER_CHARS = 120
+
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token estimate (~4 characters per token), good enough for budgeting."""
+    return math.ceil(len(text or "") / _CHARS_PER_TOKEN)
+
+
+def html_to_text(content: str) -> str:
+    """Convert HTML bodies to text; plain text is returned unchanged."""
+    stripped = content.strip()
+    if not (stripped.startswith("<!DOCTYPE") or stripped.startswith("<html") or "<body" in content):
+        return content
+    h = html2text.HTML2Text()
+    h.ignore_links = True
+    h.ignore_images = True
+    h.body_width = 0  # Don't wrap text
+    return h.handle(content)
+
+
+def strip_quoted_replies(text: str) -> str:
+    """Remove the quoted reply chain ("On ... wrote:", Outlook headers, "> " lines)."""
+    lines = text.splitlines()
+    cut = len(lines)
+    for i, line in enumerate(lines):
+        # Reply headers are sometimes wrapped over two lines
+        joined = f"{line} {lines[i + 1]}" if i + 1 < len(lines) else line
+        if any(r.match(line) or r.match(joined) for r in _REPLY_HEADER_RES):
+            cut = i
+            break
+        if _OUTLOOK_FROM_RE.match(line) and any(_OUTLOOK_SENT_RE.match(l) for l in lines[i + 1:i + 4]):
+            cut = i
+            # Drop a preceding Outlook divider line
+            if cut > 0 and re.match(r"^\s*_{5,}\s*$", lines[cut - 1]):
+                cut -= 1
+            break
+
+    kept = [line for line in lines[:cut] if not _QUOTE_LINE_RE.match(line)]
+    # Never return an empty message: if everything was quoted, keep the original
+    if not any(line.strip() for line in kept):
+        return text
+    return "\n".join(kept).rstrip()
+
+
+def _is_signature_line(line: str) -> bool:
+    """Short contact-block line: not a question and not a sentence."""
+    return len(line) < 80 and "?" not in line and not _SENTENCE_RE.match(line)
+
+
+def strip_signature(text: str) -> str:
+    """Remove signatures: the "-- " block, mobile footers, and contact blocks after a sign-off."""
+    lines = [line for line in text.splitlines() if not _MOBILE_SIG_RE.match(line)]
+
+    for i, line in enumerate(lines):
+        if _SIG_DELIMITER_RE.match(line) and any(l.strip() for l in lines[:i]):
+            lines = lines[:i]
+            break
+
+    # After a sign-off near the end, keep the next line (usually the sender's name) and drop a
+    # short contact block; a sign-off followed by sentences ("Thanks!" then the request) is content
+    for i in range(len(lines) - 1, -1, -1):
+        if _SIGN_OFF_RE.match(lines[i]):
+            tail = [l for l in lines[i + 1:] if l.strip()]
+            if len(tail) <= _MAX_SIGNATURE_LINES and all(_is_signature_line(l) for l in tail):
+                lines = lines[:i + 1] + tail[:1]
+            break
+
+    return "\n".join(lines).rstrip()
+
+
+def _is_disclaimer(paragraph: str, after_sign_off: bool) -> bool:
+    """Long paragraph with two legal markers (one a legal phrase), or one marker in the footer."""
+    if len(paragraph) < _MIN_DISCLAIMER_CHARS:
+        return False
+    phrases = {m.group(0).lower() for m in _DISCLAIMER_PHRASE_RE.finditer(paragraph)}
+    words = {m.group(0).lower() for m in _DISCLAIMER_WORD_RE.finditer(paragraph)}
+    if after_sign_off:
+        return bool(phrases or words)
+    return bool(phrases) and len(phrases | words) >= 2
+
+
+def strip_disclaimers(text: str) -> str:
+    """Remove legal/confidentiality paragraphs trailing the body (the first paragraph is always kept)."""
+    paragraphs = re.split(r"\n\s*\n", text)
+    signed = [i for i, p in enumerate(paragraphs) if any(_SIGN_OFF_RE.match(line) for line in p.splitlines())]
+    last_sign_off = signed[-1] if signed else len(paragraphs)
+    cut = len(paragraphs)
+    while cut > 1 and _is_disclaimer(paragraphs[cut - 1], cut - 1 > last_sign_off):
+        cut -= 1
+    if cut == len(paragraphs):
+        return text
+    return "\n\n".join(paragraphs[:cut])
+
+
+def truncate_to_budget(text: str, max_tokens: int, head_ratio: float = 0.75) -> str:
+    """Keep the head and tail of the text within max_tokens, marking what was cut."""
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max_tokens * _CHARS_PER_TOKEN
+    head_chars = int(max_chars * head_ratio)
+    tail_chars = max_chars - head_chars
+    omitted = estimate_tokens(text[head_chars:len(text) - tail_chars])
+    tail = text[-tail_chars:] if tail_chars > 0 else ""
+    return f"{text[:head_chars]}\n\n[... {omitted} tokens omitted ...]\n\n{tail}"
+
+
+def preprocess_message_content(
+    content: Optional[str],
+    platform: str = "gmail",
+    max_tokens: int = 0,
+) -> Tuple[str, Dict[str, Any]]:
+    """Clean a message body for prompting and report the token savings.
+
+    Quoted replies, signatures and disclaimers are only stripped for email;
+    the token budget applies to every platform.
+
+    Args:
+        content: Raw message body
+        platform: Message platform (gmail, email, instagram, whatsapp)
+        max_tokens: Token budget for the cleaned content (0 = unlimited)
+
+    Returns:
+        (cleaned content, stats) where stats has original/final/saved token counts
+        and the list of steps that changed the text
+    """
+    original = content or ""
+    text = original
+    applied: List[str] = []
+
+    steps = []
+    if platform.lower() in ("gmail", "email"):
+        steps = [
+            ("html", html_to_text),
+            ("quoted_replies", strip_quoted_replies),
+            ("disclaimers", strip_disclaimers),
+            ("signature", strip_signature),
+        ]
+    steps.append(("budget", lambda t: truncate_to_budget(t, max_tokens)))
+
+    for name, step in steps:
+        try:
+            result = step(text)
+        except Exception as e:
+            logger.warning(f"Preprocessing step {name} failed: {str(e)}")
+            continue
+        if result != text:
+            applied.append(name)
+            text = result
+
+    original_tokens = estimate_tokens(original)
+    final_tokens = estimate_tokens(text)
+    stats = {
+        "original_tokens": original_tokens,
+        "final_tokens": final_tokens,
+        "saved_tokens": original_tokens - final_tokens,
+        "applied": applied,
+    }
+    metrics.observe("preprocess_saved_tokens", stats["saved_tokens"], platform=platform)
+    return text, stats
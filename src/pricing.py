@@ -0,0 +1,272 @@
+"""Structured program catalog and deterministic quotes.
+
+The training programs and add-ons are written as prose in `default_background`.
+This module parses them once into a table so that:
+- `quote_program` can compute prices exactly (cohort price plus extra seats,
+  additional cohorts, add-ons) instead of the model doing arithmetic in text
+- prompts only include the catalog rows relevant to the message being answered
+"""
+
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+_PROGRAM_RE = re.compile(r"^(\d+)\.\s+(.+?)\s*$")
+_PROGRAM_NUMBER_RE = re.compile(r"^(?:program\s*)?#?\s*(\d+)$")
+_PRICE_RE = re.compile(r"^-\s*Price:\s*(Starting at\s+)?\$([\d,]+)(?:\s+per cohort\s*\(up to (\d+) employees\))?", re.IGNORECASE)
+_EXTRA_RE = re.compile(r"^-\s*Additional employees:\s*\$([\d,]+)\s+per person", re.IGNORECASE)
+_INCLUDES_RE = re.compile(r"^-\s*Includes:\s*(.+)$", re.IGNORECASE)
+_ADDON_RE = re.compile(r"^-\s*(.+?):\s*\$([\d,]+)(?:\s+per\s+(\w+))?", re.IGNORECASE)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Words too common in the catalog to say anything about relevance
+_STOPWORDS = {
+    "ai", "for", "and", "the", "to", "of", "a", "an", "in", "on", "with", "our", "your", "we", "you",
+    "training", "program", "programs", "team", "teams", "employees", "price", "pricing", "cost",
+}
+
+
+def _money(value: str) -> int:
+    return int(value.replace(",", ""))
+
+
+def _words(text: str) -> set:
+    return {w for w in _WORD_RE.findall((text or "").lower()) if w not in _STOPWORDS and len(w) > 2}
+
+
+def _best_match(query: str, items: list, kind: str):
+    """Item whose name shares the most words with the query, None if none does.
+
+    Raises:
+        ValueError: If several items share the best score
+    """
+    query_words = _words(query)
+    scored = [(len(query_words & _words(item.name)), item) for item in items]
+    best = max((score for score, _ in scored), default=0)
+    if best == 0:
+        return None
+    matches = [item for score, item in scored if score == best]
+    if len(matches) > 1:
+        raise ValueError(f"Ambiguous {kind}: {query} matches {' and '.join(item.name for item in matches)}. Use the exact name.")
+    return matches[0]
+
+
+@dataclass
+class Program:
+    number: int
+    name: str
+    price: int
+    cohort_size: Optional[int] = None  # None for custom programs
+    extra_per_person: Optional[int] = None  # None if extra seats are not sold individually
+    includes: str = ""
+    custom_quote: bool = False
+
+    def row(self, detailed: bool = True) -> str:
+        """Catalog row in the same shape as the background prose."""
+        lines = [f"{self.number}. {self.name}"]
+        if self.custom_quote:
+            lines.append(f"   - Price: Starting at ${self.price:,} (custom quote)")
+        else:
+            lines.append(f"   - Price: ${self.price:,} per cohort (up to {self.cohort_size} employees)")
+            if self.extra_per_person is not None:
+                lines.append(f"   - Additional employees: ${self.extra_per_person:,} per person")
+        if detailed and self.includes:
+            lines.append(f"   - Includes: {self.includes}")
+        return "\n".join(lines)
+
+
+@dataclass
+class AddOn:
+    name: str
+    price: int
+    unit: Optional[str] = None  # e.g. "hour"; None for a flat price
+
+    def row(self) -> str:
+        return f"- {self.name}: ${self.price:,}" + (f" per {self.unit}" if self.unit else "")
+
+
+@dataclass
+class QuoteLine:
+    description: str
+    amount: int
+
+
+@dataclass
+class Quote:
+    program: Program
+    team_size: int
+    lines: List[QuoteLine] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+    # Set when the catalog has no price for this team, so there is no total to give
+    custom_quote_reason: Optional[str] = None
+
+    @property
+    def total(self) -> Optional[int]:
+        if self.custom_quote_reason:
+            return None
+        return sum(line.amount for line in self.lines)
+
+    def format(self) -> str:
+        out = [f"Quote for {self.program.name} ({self.team_size} employees):"]
+        if self.custom_quote_reason:
+            out.append(f"Custom quote required: {self.custom_quote_reason}")
+        out += [f"- {line.description}: ${line.amount:,}" for line in self.lines]
+        if not self.custom_quote_reason:
+            prefix = "Starting total" if self.program.custom_quote else "Total"
+            out.append(f"{prefix}: ${self.total:,}")
+        out += [f"Note: {note}" for note in self.notes]
+        return "\n".join(out)
+
+
+class Catalog:
+    """Programs and add-ons parsed from the background text."""
+
+    def __init__(self, intro: str, programs: List[Program], add_ons: List[AddOn]):
+        self.intro = intro
+        self.programs = programs
+        self.add_ons = add_ons
+
+    def find_program(self, query) -> Optional[Program]:
+        """Look up a program by number ("2", "Program 2"), exact name, or the name it shares most words with.
+
+        Raises:
+            ValueError: If the query matches several programs equally well
+        """
+        text = str(query).strip().lower()
+        if match := _PROGRAM_NUMBER_RE.match(text):
+            return next((p for p in self.programs if p.number == int(match.group(1))), None)
+        for program in self.programs:
+            if text == program.name.lower():
+                return program
+        return _best_match(text, self.programs, "program")
+
+    def find_add_on(self, query: str) -> Optional[AddOn]:
+        """Look up an add-on by exact name or the name it shares most words with.
+
+        Raises:
+            ValueError: If the query matches several add-ons equally well
+        """
+        text = str(query).strip().lower()
+        for add_on in self.add_ons:
+            if text == add_on.name.lower():
+                return add_on
+        return _best_match(text, self.add_ons, "add-on")
+
+    def quote(self, program: str, team_size: int, add_ons: Optional[List[str]] = None, coaching_hours: int = 0) -> Quote:
+        """Exact price for a team: cohort price, extra seats, and add-ons.
+
+        A team larger than a cohort of a program without a per-person price has
+        no catalog price; the quote then says a custom quote is required.
+
+        Raises:
+            ValueError: If the program or an add-on is unknown or ambiguous, team_size
+                is not positive, or coaching is requested without coaching_hours
+        """
+        if team_size <= 0:
+            raise ValueError("team_size must be positive")
+        found = self.find_program(program)
+        if found is None:
+            raise ValueError(f"Unknown program: {program}. Known programs: {', '.join(p.name for p in self.programs)}")
+
+        quote = Quote(program=found, team_size=team_size)
+        if found.custom_quote:
+            quote.lines.append(QuoteLine("Custom training (starting price)", found.price))
+            quote.notes.append("Final price depends on scope; offer a discovery call for a custom quote.")
+        elif team_size <= found.cohort_size:
+            quote.lines.append(QuoteLine(f"Cohort (up to {found.cohort_size} employees)", found.price))
+        elif found.extra_per_person is not None:
+            extra = team_size - found.cohort_size
+            quote.lines.append(QuoteLine(f"Cohort (up to {found.cohort_size} employees)", found.price))
+            quote.lines.append(QuoteLine(f"{extra} additional employees x ${found.extra_per_person:,}", extra * found.extra_per_person))
+        else:
+            quote.custom_quote_reason = (
+                f"{found.name} is priced per cohort of up to {found.cohort_size} employees and additional "
+                f"employees are not priced individually. Offer a discovery call to scope training for {team_size} employees."
+            )
+
+        for name in add_ons or []:
+            add_on = self.find_add_on(name)
+            if add_on is None:
+                raise ValueError(f"Unknown add-on: {name}. Known add-ons: {', '.join(a.name for a in self.add_ons)}")
+            if add_on.unit == "hour":
+                if coaching_hours <= 0:
+                    raise ValueError(f"coaching_hours is required for {add_on.name}")
+                hours = coaching_hours
+                quote.lines.append(QuoteLine(f"{add_on.name} ({hours} hours x ${add_on.price:,})", hours * add_on.price))
+            else:
+                quote.lines.append(QuoteLine(add_on.name, add_on.price))
+        return quote
+
+    def relevant_rows(self, text: str) -> str:
+        """Catalog section for a prompt, with details only for the rows that match the message.
+
+        Matching programs are shown in full and the others as a price line only,
+        so the model can still suggest them. Add-ons are only shown when mentioned.
+        """
+        words = _words(text)
+        rows = [p.row(detailed=bool(words & (_words(p.name) | _words(p.includes)))) for p in self.programs]
+        sections = ["Our Training Programs:", "\n\n".join(rows)]
+
+        add_ons = [a for a in self.add_ons if words & _words(a.name)]
+        if add_ons:
+            sections.append("Optional Add-ons:\n" + "\n".join(a.row() for a in add_ons))
+        return "\n\n".join(sections)
+
+    def background(self, text: str) -> str:
+        """Background for a prompt: the intro plus the catalog rows relevant to the text."""
+        return f"\n{self.intro}\n\n{self.relevant_rows(text)}\n"
+
+
+def parse_catalog(background: str) -> Catalog:
+    """Parse the programs and add-ons from the background prose."""
+    intro, _, rest = background.partition("Our Training Programs:")
+    programs_text, _, add_ons_text = rest.partition("Optional Add-ons:")
+
+    programs: List[Program] = []
+    for line in programs_text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = _PROGRAM_RE.match(line)
+        if match:
+            programs.append(Program(number=int(match.group(1)), name=match.group(2), price=0))
+            continue
+        if not programs:
+            continue
+        current = programs[-1]
+        if match := _PRICE_RE.match(line):
+            current.price = _money(match.group(2))
+            current.custom_quote = bool(match.group(1))
+            current.cohort_size = int(match.group(3)) if match.group(3) else None
+        elif match := _EXTRA_RE.match(line):
+            current.extra_per_person = _money(match.group(1))
+        elif match := _INCLUDES_RE.match(line):
+            current.includes = match.group(1).strip()
+
+    add_ons: List[AddOn] = []
+    for line in add_ons_text.splitlines():
+        if match := _ADDON_RE.match(line.strip()):
+            add_ons.append(AddOn(name=match.group(1).strip(), price=_money(match.group(2)), unit=match.group(3)))
+
+    # A program without a cohort size can't be quoted per cohort; treat it as custom
+    for program in programs:
+        if program.cohort_size is None and not program.custom_quote:
+            logger.warning(f"Program {program.name} has no cohort size, treating it as a custom quote")
+            program.custom_quote = True
+
+    return Catalog(intro=intro.strip(), programs=programs, add_ons=add_ons)
+
+
+_default_catalog: Optional[Catalog] = None
+
+
+def get_default_catalog() -> Catalog:
+    """Catalog parsed from `default_background` (parsed once)."""
+    global _default_catalog
+    if _default_catalog is None:
+        from src.prompts import default_background
+        _default_catalog = parse_catalog(default_background)
+    return _default_catalog
@@ -37,6 +37,29 @@ Content:
 {content}
 """
 
+# With knowledge retrieval, the triage system prompt stays the same for every message (so batching and
+# provider prompt caching still apply) and the background retrieved for the message goes in the user prompt
+triage_retrieved_background = "The background relevant to the message is given with the message"
+
+triage_user_background = """
+< Background >
+{background}
+</ Background >
+"""
+
+# Message assistant batch triage user prompt (one structured-output call for many messages)
+triage_batch_user_prompt = """
+Please determine how to handle each of the {count} message threads below.
+Return exactly one decision per message and set message_index to the index of the message it is for.
+
+{messages}
+"""
+
+# Single message inside a batch triage prompt
+triage_batch_message_template = """<message index="{index}">
+{message}
+</message>"""
+
 # Message assistant prompt
 agent_system_prompt = """
 < Role >
@@ -194,7 +217,7 @@ When responding to training program inquiries:
 When responding to pricing questions:
 - Be transparent and specific with all pricing details
 - Mention optional add-ons if relevant to their needs
-- For teams larger than standard cohort sizes, calculate additional per-person costs
+- Use the quote_program tool for any price or total instead of calculating it yourself (it handles additional per-person costs for teams larger than standard cohort sizes)
 - For complex or custom needs, suggest starting at $5,000 with a custom quote
 
 When scheduling discovery calls:
@@ -312,4 +335,27 @@ Remember:
 - PRESERVE all other existing information in the profile
 - Format the profile consistently with the original style
 - Generate the profile as a string
-"""
\ No newline at end of file
+"""
+# Conversation compaction prompt (summarizes older turns of a long-lived sender thread)
+conversation_summary_prompt = """
+< Role >
+You maintain a running summary of the conversation between our business and one contact.
+</ Role >
+
+< Instructions >
+Update the existing summary with the older conversation turns below.
+- Keep facts that matter for future replies: who the contact is, company and team size, programs discussed, prices quoted, meetings scheduled, open questions and commitments we made
+- Keep what the human reviewer approved, edited or rejected
+- Drop greetings, pleasantries and repeated content
+- Write concise bullet points, at most {max_words} words in total
+- Output only the updated summary
+</ Instructions >
+
+< Existing Summary >
+{summary}
+</ Existing Summary >
+
+< Older Conversation Turns >
+{transcript}
+</ Older Conversation Turns >
+"""
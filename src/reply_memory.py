@@ -0,0 +1,227 @@
+"""Reuse of previously approved replies.
+
+When a reviewer accepts or edits a drafted reply in Agent Inbox, the inquiry
+and the approved tool call are saved to the store. New inquiries are compared
+against them with a local similarity index (sparse word/bigram vectors,
+cosine similarity):
+
+- a close match becomes a few-shot example in the agent prompt
+- a near-identical match (same numbers, e.g. team size) can be offered to the
+  reviewer directly as a ready draft, skipping the model call
+
+Replies are kept per platform, since tone and tools differ between platforms.
+"""
+
+import re
+import math
+import time
+import uuid
+import logging
+import weakref
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from langgraph.store.base import BaseStore
+
+from src.knowledge import tokenize
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "approved_replies"
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+# Tool args that address the recipient; they are replaced with the new sender when a draft is reused
+RECIPIENT_FIELDS = ("recipient", "to")
+
+
+def inquiry_numbers(text: str) -> Tuple[str, ...]:
+    """Numbers mentioned in the inquiry (team sizes, dates), which a reused draft must match."""
+    return tuple(sorted(set(_NUMBER_RE.findall(text or ""))))
+
+
+def inquiry_vector(text: str) -> Dict[str, float]:
+    """L2-normalized word and bigram counts of the inquiry, with numbers folded to one token."""
+    words = tokenize(_NUMBER_RE.sub(" num ", (text or "").lower()))
+    counts = Counter(words)
+    counts.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    norm = math.sqrt(sum(v * v for v in counts.values()))
+    return {term: count / norm for term, count in counts.items()} if norm else {}
+
+
+def cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(term, 0.0) for term, weight in a.items())
+
+
+class ApprovedReplyIndex:
+    """Approved replies for one platform, loaded from the store and reloaded after `refresh_seconds`.
+
+    Reloading picks up replies approved on other workers. The store is passed to
+    every call rather than kept, so `ReplyMemory` can key indexes weakly by store.
+
+    Args:
+        platform: Platform the replies were sent on
+        max_entries: Only the most recently approved replies are loaded and kept
+        refresh_seconds: How long the loaded replies are used before reading the store again
+    """
+
+    def __init__(self, platform: str, max_entries: int = 500, refresh_seconds: float = 300):
+        self.platform = platform
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self._entries: List[Dict[str, Any]] = []
+        self._vectors: List[Dict[str, float]] = []
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def namespace(self) -> Tuple[str, str]:
+        return (NAMESPACE, self.platform)
+
+    def _search_all(self, store: BaseStore) -> list:
+        # search() is not ordered by recency, so page through the namespace
+        items, offset = [], 0
+        while True:
+            page = store.search(self.namespace, limit=self.max_entries, offset=offset)
+            items.extend(page)
+            if len(page) < self.max_entries:
+                return items
+            offset += len(page)
+
+    def _load(self, store: BaseStore):
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < self.refresh_seconds:
+            return
+        try:
+            items = self._search_all(store)
+        except Exception as e:
+            logger.warning(f"Could not load approved replies: {str(e)}")
+            if self._loaded_at is None:
+                self._loaded_at = now
+            return
+        entries = sorted((item.value for item in items), key=lambda entry: entry.get("approved_at", 0))[-self.max_entries:]
+        self._entries, self._vectors = [], []
+        for entry in entries:
+            self._append(entry)
+        self._loaded_at = now
+        metrics.incr("approved_reply_loads", platform=self.platform)
+
+    def _append(self, entry: Dict[str, Any]):
+        self._entries.append(entry)
+        self._vectors.append(inquiry_vector(entry["inquiry"]))
+        if len(self._entries) > self.max_entries:
+            self._entries.pop(0)
+            self._vectors.pop(0)
+
+    def add(self, store: BaseStore, inquiry: str, tool_name: str, tool_args: Dict[str, Any], edited: bool):
+        """Save an approved reply to the store and the index."""
+        entry = {
+            "inquiry": inquiry,
+            "numbers": list(inquiry_numbers(inquiry)),
+            "tool": tool_name,
+            "args": tool_args,
+            "edited": edited,
+            "approved_at": time.time(),
+        }
+        with self._lock:
+            self._load(store)
+            store.put(self.namespace, uuid.uuid4().hex, entry)
+            self._append(entry)
+        metrics.incr("approved_replies_saved", platform=self.platform, edited=str(edited).lower())
+
+    def best_match(self, store: BaseStore, inquiry: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """(similarity, entry) of the most similar approved reply, or None if there are none."""
+        vector = inquiry_vector(inquiry)
+        with self._lock:
+            self._load(store)
+            if not vector or not self._entries:
+                return None
+            # Later entries win ties, so the most recent approval is preferred
+            score, index = max((cosine(vector, v), i) for i, v in enumerate(self._vectors))
+            return score, self._entries[index]
+
+
+class ReplyMemory:
+    """Per-platform approved-reply indexes plus the reuse policy.
+
+    Args:
+        fewshot_threshold: Minimum similarity to show a reply as a few-shot example
+        draft_threshold: Minimum similarity to reuse a reply as a ready draft
+        reuse_drafts: Whether ready drafts are offered at all (otherwise only few-shot)
+        max_entries: Approved replies kept per platform
+        refresh_seconds: How often each index is reloaded from the store
+    """
+
+    def __init__(
+        self,
+        fewshot_threshold: float = 0.6,
+        draft_threshold: float = 0.9,
+        reuse_drafts: bool = False,
+        max_entries: int = 500,
+        refresh_seconds: float = 300,
+    ):
+        self.fewshot_threshold = fewshot_threshold
+        self.draft_threshold = draft_threshold
+        self.reuse_drafts = reuse_drafts
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        # Keyed by the store object itself, and dropped with it
+        self._indexes: "weakref.WeakKeyDictionary[BaseStore, Dict[str, ApprovedReplyIndex]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def index(self, store: BaseStore, platform: str) -> ApprovedReplyIndex:
+        platform = (platform or "").lower()
+        with self._lock:
+            indexes = self._indexes.setdefault(store, {})
+            if platform not in indexes:
+                indexes[platform] = ApprovedReplyIndex(platform, self.max_entries, self.refresh_seconds)
+            return indexes[platform]
+
+    def record(self, store: BaseStore, platform: str, inquiry: str, tool_name: str, tool_args: Dict[str, Any], edited: bool):
+        if inquiry:
+            self.index(store, platform).add(store, inquiry, tool_name, tool_args, edited)
+
+    def lookup(self, store: BaseStore, platform: str, inquiry: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Find a reusable reply for an inquiry.
+
+        Returns:
+            (ready_draft, example): the entry to reuse as a draft, and the entry to show
+            as a few-shot example; either may be None
+        """
+        match = self.index(store, platform).best_match(store, inquiry)
+        if match is None or match[0] < self.fewshot_threshold:
+            metrics.incr("approved_reply_lookups", platform=platform, outcome="miss")
+            return None, None
+        score, entry = match
+        if self.reuse_drafts and score >= self.draft_threshold and tuple(entry.get("numbers", ())) == inquiry_numbers(inquiry):
+            metrics.incr("approved_reply_lookups", platform=platform, outcome="draft")
+            return entry, None
+        metrics.incr("approved_reply_lookups", platform=platform, outcome="fewshot")
+        return None, entry
+
+
+def reuse_tool_call(entry: Dict[str, Any], recipient: str) -> Dict[str, Any]:
+    """Tool call that resends an approved reply to a new recipient."""
+    args = dict(entry["args"])
+    for field in RECIPIENT_FIELDS:
+        if field in args:
+            args[field] = recipient
+    return {"name": entry["tool"], "args": args, "id": f"reuse_{uuid.uuid4().hex[:12]}"}
+
+
+def format_example(entry: Dict[str, Any]) -> str:
+    """Prompt section showing a similar inquiry and the reply that was approved for it."""
+    reply = entry["args"].get("content", "")
+    return f"""
+< Similar Approved Reply >
+A similar inquiry was answered before and the reply was approved. Use it as a reference for content and tone, adapting details (names, numbers, dates) to the current message.
+
+Inquiry:
+{entry["inquiry"]}
+
+Approved reply:
+{reply}
+</ Similar Approved Reply >
+"""
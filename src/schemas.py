@@ -1,7 +1,10 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+from typing import Any
 from typing_extensions import TypedDict, Literal
 from langgraph.graph import MessagesState
 
+from src.feedback import FeedbackSummary
+
 class RouterSchema(BaseModel):
     """Analyze the unread message and route it according to its content."""
 
@@ -14,6 +17,20 @@ class RouterSchema(BaseModel):
         "'respond' for messages that need a reply",
     )
 
+class BatchRouterDecision(RouterSchema):
+    """Routing decision for one message of a batch."""
+
+    message_index: int = Field(
+        description="The index of the message this decision is for, as given in the batch."
+    )
+
+class BatchRouterSchema(BaseModel):
+    """Analyze each unread message in the batch and route it according to its content."""
+
+    decisions: list[BatchRouterDecision] = Field(
+        description="Exactly one routing decision per message in the batch."
+    )
+
 class StateInput(TypedDict):
     # This is the input to the state
     message_input: dict
@@ -22,7 +39,11 @@ class State(MessagesState):
     # This state class has the messages key build in
     message_input: dict
     classification_decision: Literal["ignore", "respond", "notify"]
+    classification_source: str  # Triage stage that decided: "rules", "cache", "classifier" or "llm"
     thread_id: str  # Track user conversations
+    speculative_draft: Any | None  # First agent message drafted while triage was running
+    conversation_summary: str  # Summary of older turns compacted out of messages
+    run_budget: dict  # Execution budget consumed by the current response agent run
 
 
 class MessageData(TypedDict):
@@ -54,6 +75,12 @@ class UserPreferences(BaseModel):
     total_messages: int = 0
     last_interaction: str | None = None
     
-    # HITL feedback patterns
-    common_edits: list[str] = []  # Track what user commonly edits
-    ignored_suggestions: list[str] = []  # Track what user ignores
\ No newline at end of file
+    # HITL feedback patterns, bounded so the document stays small for long-lived users
+    common_edits: FeedbackSummary = Field(default_factory=FeedbackSummary)  # Track what user commonly edits
+    ignored_suggestions: FeedbackSummary = Field(default_factory=FeedbackSummary)  # Track what user ignores
+
+    @field_validator("common_edits", "ignored_suggestions", mode="before")
+    @classmethod
+    def _migrate_feedback_lists(cls, value):
+        # Records written before the summaries stored plain lists
+        return FeedbackSummary.coerce(value)
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""Speculative response drafting.
+
+For platforms where almost every message ends up classified as `respond`,
+the first `llm_call` can start while triage is still running. The draft is
+used if triage says `respond` and thrown away for `ignore`/`notify`.
+
+`SpeculationPolicy` decides per platform whether speculating is worth it,
+based on the respond rate observed in this process.
+"""
+
+import threading
+from typing import Dict, Iterable, Optional
+
+from src.metrics import metrics
+
+
+class SpeculationPolicy:
+    """Per-platform enablement driven by observed respond rates.
+
+    Args:
+        min_respond_rate: Speculate once a platform's respond rate reaches this value
+        min_samples: Number of triaged messages needed before the rate is trusted
+        forced_platforms: Platforms that always speculate, regardless of the observed rate
+    """
+
+    def __init__(self, min_respond_rate: float = 0.8, min_samples: int = 20, forced_platforms: Optional[Iterable[str]] = None):
+        self.min_respond_rate = min_respond_rate
+        self.min_samples = min_samples
+        self.forced_platforms = frozenset(p.strip().lower() for p in forced_platforms or () if p.strip())
+        self._lock = threading.Lock()
+        self._totals: Dict[str, int] = {}
+        self._responds: Dict[str, int] = {}
+
+    def record(self, platform: str, classification: str):
+        """Record a triage outcome for a platform."""
+        platform = (platform or "").lower()
+        with self._lock:
+            self._totals[platform] = self._totals.get(platform, 0) + 1
+            if classification == "respond":
+                self._responds[platform] = self._responds.get(platform, 0) + 1
+
+    def respond_rate(self, platform: str) -> Optional[float]:
+        """Observed respond rate, or None if there are not enough samples yet."""
+        platform = (platform or "").lower()
+        with self._lock:
+            total = self._totals.get(platform, 0)
+            if total < self.min_samples:
+                return None
+            return self._responds.get(platform, 0) / total
+
+    def should_speculate(self, platform: str) -> bool:
+        """Whether to start drafting before triage finishes for this platform."""
+        if (platform or "").lower() in self.forced_platforms:
+            return True
+        rate = self.respond_rate(platform)
+        return rate is not None and rate >= self.min_respond_rate
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-platform sample counts and respond rates."""
+        with self._lock:
+            return {
+                platform: {
+                    "samples": total,
+                    "respond_rate": self._responds.get(platform, 0) / total,
+                    "speculating": platform in self.forced_platforms
+                    or (total >= self.min_samples and self._responds.get(platform, 0) / total >= self.min_respond_rate),
+                }
+                for platform, total in self._totals.items()
+            }
+
+
+def record_outcome(platform: str, used: bool):
+    """Count speculative drafts that were used or discarded."""
+    metrics.incr("speculative_drafts", platform=platform, outcome="used" if used else "discarded")
@@ -0,0 +1,126 @@
+"""Streaming of draft tool-call arguments to Agent Inbox.
+
+While the agent model streams its tool call, the `content` argument of draft
+tools (write_message / send_*_message) is decoded from the partial JSON and
+pushed as deltas on LangGraph's custom stream channel, so the inbox UI can
+render the draft before generation finishes.
+
+Events look like:
+    {"event": "draft_delta", "tool": "send_instagram_message", "tool_call_id": "...", "delta": "Hi Sarah, "}
+"""
+
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, AsyncIterable, Optional
+
+from langchain_core.messages import BaseMessage, message_chunk_to_message
+
+from src.metrics import metrics
+
+# Tools whose `content` argument is a message draft
+DRAFT_TOOLS = {"write_message", "write_email", "write_gmail_email", "send_instagram_message", "send_whatsapp_message"}
+DRAFT_FIELD = "content"
+
+
+def partial_json_string_field(args_json: str, field: str) -> Optional[str]:
+    """Decode the (possibly unfinished) value of a string field from partial JSON.
+
+    Returns None until the field's opening quote has arrived. Incomplete escape
+    sequences at the end are held back until the next chunk completes them.
+    """
+    key = f'"{field}"'
+    start = args_json.find(key)
+    if start < 0:
+        return None
+    i = start + len(key)
+    while i < len(args_json) and args_json[i] in " \t\r\n:":
+        i += 1
+    if i >= len(args_json) or args_json[i] != '"':
+        return None
+    i += 1
+
+    raw_end = i
+    while raw_end < len(args_json):
+        char = args_json[raw_end]
+        if char == "\\":
+            # \uXXXX needs 6 chars, other escapes 2
+            length = 6 if raw_end + 1 < len(args_json) and args_json[raw_end + 1] == "u" else 2
+            if raw_end + length > len(args_json):
+                break
+            raw_end += length
+            continue
+        if char == '"':
+            break
+        raw_end += 1
+
+    try:
+        return json.loads(f'"{args_json[i:raw_end]}"')
+    except ValueError:
+        return None
+
+
+class DraftDeltaEmitter:
+    """Tracks partial tool-call arguments across chunks and emits new draft text."""
+
+    def __init__(self, writer: Callable[[Dict[str, Any]], None]):
+        self.writer = writer
+        self._calls: Dict[int, Dict[str, Any]] = {}
+
+    def feed(self, tool_call_chunks: Iterable[Dict[str, Any]]):
+        for chunk in tool_call_chunks:
+            call = self._calls.setdefault(chunk.get("index") or 0, {"name": None, "id": None, "args": "", "sent": 0})
+            call["name"] = chunk.get("name") or call["name"]
+            call["id"] = chunk.get("id") or call["id"]
+            call["args"] += chunk.get("args") or ""
+            if call["name"] in DRAFT_TOOLS:
+                self._emit(call)
+
+    def emit_complete(self, message: BaseMessage):
+        """Emit drafts from an already complete message (e.g. a speculative draft)."""
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            content = tool_call["args"].get(DRAFT_FIELD) if isinstance(tool_call["args"], dict) else None
+            if tool_call["name"] in DRAFT_TOOLS and content:
+                self.writer({"event": "draft_delta", "tool": tool_call["name"], "tool_call_id": tool_call["id"], "delta": content})
+
+    def _emit(self, call: Dict[str, Any]):
+        text = partial_json_string_field(call["args"], DRAFT_FIELD)
+        if text is None or len(text) <= call["sent"]:
+            return
+        self.writer({"event": "draft_delta", "tool": call["name"], "tool_call_id": call["id"], "delta": text[call["sent"]:]})
+        call["sent"] = len(text)
+
+
+def _record_ttft(start: float, first_chunk_at: Optional[float], end: float):
+    if first_chunk_at is not None:
+        metrics.observe("agent_ttft_seconds", first_chunk_at - start)
+    metrics.observe("agent_llm_latency_seconds", end - start)
+
+
+def stream_with_drafts(stream: Iterable, writer: Callable[[Dict[str, Any]], None]) -> BaseMessage:
+    """Consume a model stream, emitting draft deltas, and return the complete message."""
+    emitter = DraftDeltaEmitter(writer)
+    start = time.perf_counter()
+    first_chunk_at = None
+    response = None
+    for chunk in stream:
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter()
+        response = chunk if response is None else response + chunk
+        emitter.feed(getattr(chunk, "tool_call_chunks", None) or [])
+    _record_ttft(start, first_chunk_at, time.perf_counter())
+    return message_chunk_to_message(response)
+
+
+async def astream_with_drafts(stream: AsyncIterable, writer: Callable[[Dict[str, Any]], None]) -> BaseMessage:
+    """Async version of `stream_with_drafts`."""
+    emitter = DraftDeltaEmitter(writer)
+    start = time.perf_counter()
+    first_chunk_at = None
+    response = None
+    async for chunk in stream:
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter()
+        response = chunk if response is None else response + chunk
+        emitter.feed(getattr(chunk, "tool_call_chunks", None) or [])
+    _record_ttft(start, first_chunk_at, time.perf_counter())
+    return message_chunk_to_message(response)
@@ -0,0 +1,126 @@
+"""Concurrent execution of tool calls that don't need human review.
+
+When the model emits several non-HITL tool calls in one message (calendar
+lookups, platform fetches), they are network-bound and independent, so they
+run concurrently: the turn takes as long as the slowest call rather than the
+sum. Calls go through the tool result cache (`src.tools.base.invoke_tool`).
+Each call gets a timeout; a call that fails or times out produces an
+error observation instead of failing the whole turn.
+
+Timeouts are configured with TOOL_TIMEOUT_SECONDS (default for all tools) and
+TOOL_TIMEOUTS, a comma separated list of `tool_name=seconds` overrides.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+from src.metrics import metrics
+from src.tools.base import invoke_tool, ainvoke_tool
+
+logger = logging.getLogger(__name__)
+
+
+def parse_tool_timeouts(spec: Optional[str]) -> Dict[str, float]:
+    """Parse "tool_a=10,tool_b=2.5" into {"tool_a": 10.0, "tool_b": 2.5}."""
+    timeouts = {}
+    for item in (spec or "").split(","):
+        name, _, seconds = item.partition("=")
+        if not name.strip() or not seconds.strip():
+            continue
+        try:
+            timeouts[name.strip()] = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid tool timeout: {item}")
+    return timeouts
+
+
+class ToolRunner:
+    """Runs the non-HITL tool calls of one AI message concurrently.
+
+    Args:
+        tools_by_name: Mapping of tool name to LangChain tool
+        max_workers: Size of the thread pool used by `run`
+        default_timeout: Per-call timeout in seconds
+        timeouts: Per-tool timeout overrides
+    """
+
+    def __init__(
+        self,
+        tools_by_name: Dict[str, Any],
+        max_workers: int = 8,
+        default_timeout: float = 30.0,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        self.tools_by_name = tools_by_name
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-call")
+
+    def timeout_for(self, tool_name: str) -> float:
+        return self.timeouts.get(tool_name, self.default_timeout)
+
+    def _invoke(self, tool_call: dict) -> Any:
+        start = time.perf_counter()
+        observation = invoke_tool(self.tools_by_name[tool_call["name"]], tool_call["args"])
+        metrics.observe("tool_latency_seconds", time.perf_counter() - start, tool=tool_call["name"])
+        return observation
+
+    async def _ainvoke(self, tool_call: dict) -> Any:
+        start = time.perf_counter()
+        observation = await ainvoke_tool(self.tools_by_name[tool_call["name"]], tool_call["args"])
+        metrics.observe("tool_latency_seconds", time.perf_counter() - start, tool=tool_call["name"])
+        return observation
+
+    def _message(self, tool_call: dict, observation: Any, status: str = "ok") -> dict:
+        metrics.incr("tool_calls", tool=tool_call["name"], status=status)
+        return {"role": "tool", "content": observation, "tool_call_id": tool_call["id"]}
+
+    def _failure(self, tool_call: dict, error: BaseException) -> dict:
+        name = tool_call["name"]
+        if isinstance(error, (FutureTimeoutError, asyncio.TimeoutError)):
+            timeout = self.timeout_for(name)
+            logger.warning(f"Tool {name} timed out after {timeout}s")
+            return self._message(tool_call, f"Error: {name} timed out after {timeout:g} seconds", "timeout")
+        logger.warning(f"Tool {name} failed: {str(error)}")
+        return self._message(tool_call, f"Error: {name} failed: {str(error)}", "error")
+
+    def run(self, tool_calls: List[dict]) -> List[dict]:
+        """Run tool calls in the thread pool; tool messages come back in tool_calls order."""
+        start = time.perf_counter()
+        futures = [self._executor.submit(self._invoke, tool_call) for tool_call in tool_calls]
+        results = []
+        for tool_call, future in zip(tool_calls, futures):
+            # All calls were submitted together, so each timeout counts from the common start
+            remaining = max(self.timeout_for(tool_call["name"]) - (time.perf_counter() - start), 0)
+            try:
+                results.append(self._message(tool_call, future.result(timeout=remaining)))
+            except Exception as e:
+                future.cancel()
+                results.append(self._failure(tool_call, e))
+        return results
+
+    async def arun(self, tool_calls: List[dict]) -> List[dict]:
+        """Async version of `run`, using `ainvoke` and asyncio.gather."""
+
+        async def run_one(tool_call: dict) -> dict:
+            try:
+                observation = await asyncio.wait_for(self._ainvoke(tool_call), timeout=self.timeout_for(tool_call["name"]))
+            except Exception as e:
+                return self._failure(tool_call, e)
+            return self._message(tool_call, observation)
+
+        return list(await asyncio.gather(*(run_one(tool_call) for tool_call in tool_calls)))
+
+
+def tool_runner_from_env(tools_by_name: Dict[str, Any]) -> ToolRunner:
+    """Build a ToolRunner configured from TOOL_MAX_WORKERS / TOOL_TIMEOUT_SECONDS / TOOL_TIMEOUTS."""
+    return ToolRunner(
+        tools_by_name,
+        max_workers=int(os.getenv("TOOL_MAX_WORKERS", "8")),
+        default_timeout=float(os.getenv("TOOL_TIMEOUT_SECONDS", "30")),
+        timeouts=parse_tool_timeouts(os.getenv("TOOL_TIMEOUTS")),
+    )
@@ -1,17 +1,23 @@
-from .base import get_tools, get_tools_by_name
+from .base import get_tools, get_tools_by_name, invoke_tool, ainvoke_tool, read_only, writes
 from .default.email_tools import write_email, triage_email, Done
 from .default.calendar_tools import schedule_meeting, check_calendar_availability
+from .default.pricing_tools import quote_program
 from .instagram.tool import fetch_instagram_messages, send_instagram_message
 from .whatsapp.tool import fetch_whatsapp_messages, send_whatsapp_message
 
 __all__ = [
     "get_tools",
     "get_tools_by_name",
+    "invoke_tool",
+    "ainvoke_tool",
+    "read_only",
+    "writes",
     "write_email",
     "triage_email",
     "Done",
     "schedule_meeting",
     "check_calendar_availability",
+    "quote_program",
     "fetch_instagram_messages",
     "send_instagram_message",
     "fetch_whatsapp_messages",
@@ -1,6 +1,136 @@
+import os
+import re
+import json
 from typing import Dict, List, Callable, Any, Optional
 from langchain_core.tools import BaseTool
 
+from src.cache import TTLCache
+
+# Results starting with these are failures and are never cached
+_ERROR_PREFIXES = ("error", "failed")
+
+
+def read_only(resource: str, ttl_seconds: float) -> Callable[[BaseTool], BaseTool]:
+    """Declare a tool as read-only so its results are cached.
+
+    Apply above `@tool`. Results are cached per normalized args for ttl_seconds,
+    and dropped when a tool declared with `writes(resource)` runs.
+
+    Args:
+        resource: What the tool reads (e.g. "calendar", "instagram_inbox")
+        ttl_seconds: How long a result stays valid
+    """
+    def decorator(tool: BaseTool) -> BaseTool:
+        tool.metadata = {**(tool.metadata or {}), "cache": {"resource": resource, "ttl_seconds": ttl_seconds}}
+        return tool
+    return decorator
+
+
+def writes(*resources: str) -> Callable[[BaseTool], BaseTool]:
+    """Declare the resources a tool modifies; running it invalidates cached reads of them."""
+    def decorator(tool: BaseTool) -> BaseTool:
+        tool.metadata = {**(tool.metadata or {}), "invalidates": list(resources)}
+        return tool
+    return decorator
+
+
+def _normalize_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value.strip().lower())
+    if isinstance(value, dict):
+        return {k: _normalize_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(v) for v in value]
+    return value
+
+
+def normalize_tool_args(tool: BaseTool, args: Dict[str, Any]) -> str:
+    """Canonical form of tool args: schema defaults filled in, strings case/space folded, keys sorted."""
+    try:
+        args = tool.args_schema.model_validate(args).model_dump()
+    except Exception:
+        pass
+    return json.dumps(_normalize_value(args), sort_keys=True, default=str)
+
+
+class ToolResultCache:
+    """Caches results of read-only tools across calls within a run and across runs.
+
+    Keys are (resource, tool name, normalized args), so a write to a resource
+    drops every cached read of it.
+
+    Args:
+        max_entries: Maximum number of cached results (LRU eviction)
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self._cache = TTLCache("tool_results", max_entries=max_entries)
+
+    def invoke(self, tool: BaseTool, args: Dict[str, Any]) -> Any:
+        policy = (tool.metadata or {}).get("cache")
+        if not policy:
+            result = tool.invoke(args)
+            self.after_write(tool)
+            return result
+
+        key = (policy["resource"], tool.name, normalize_tool_args(tool, args))
+        result = self._cache.get(key)
+        if result is None:
+            result = tool.invoke(args)
+            self._store(key, result, policy)
+        return result
+
+    async def ainvoke(self, tool: BaseTool, args: Dict[str, Any]) -> Any:
+        policy = (tool.metadata or {}).get("cache")
+        if not policy:
+            result = await tool.ainvoke(args)
+            self.after_write(tool)
+            return result
+
+        key = (policy["resource"], tool.name, normalize_tool_args(tool, args))
+        result = self._cache.get(key)
+        if result is None:
+            result = await tool.ainvoke(args)
+            self._store(key, result, policy)
+        return result
+
+    def _store(self, key, result: Any, policy: Dict[str, Any]):
+        if isinstance(result, str) and result.strip().lower().startswith(_ERROR_PREFIXES):
+            return
+        self._cache.set(key, result, ttl_seconds=policy["ttl_seconds"])
+
+    def after_write(self, tool: BaseTool) -> int:
+        """Drop cached reads of the resources a tool writes to."""
+        removed = 0
+        for resource in (tool.metadata or {}).get("invalidates", []):
+            removed += self._cache.invalidate(lambda key: key[0] == resource)
+        return removed
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+tool_result_cache = ToolResultCache(max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "512")))
+
+
+def invoke_tool(tool: BaseTool, args: Dict[str, Any]) -> Any:
+    """Invoke a tool through the result cache (reads may be served from cache, writes invalidate)."""
+    if not TOOL_CACHE_ENABLED:
+        return tool.invoke(args)
+    return tool_result_cache.invoke(tool, args)
+
+
+async def ainvoke_tool(tool: BaseTool, args: Dict[str, Any]) -> Any:
+    """Async version of `invoke_tool`."""
+    if not TOOL_CACHE_ENABLED:
+        return await tool.ainvoke(args)
+    return await tool_result_cache.ainvoke(tool, args)
+
+
 def get_tools(tool_names: Optional[List[str]] = None, include_gmail: bool = False, include_instagram: bool = False, include_whatsapp: bool = False) -> List[BaseTool]:
     """Get specified tools or all tools if tool_names is None.
     
@@ -22,6 +152,7 @@ def get_tools(tool_names: Optional[List[str]] = None, include_gmail: bool = Fals
     
     from src.tools.default.email_tools import write_email, Done, Question
     from src.tools.default.calendar_tools import schedule_meeting, check_calendar_availability
+    from src.tools.default.pricing_tools import quote_program
     
     # Base tools dictionary
     all_tools = {
@@ -31,6 +162,7 @@ def get_tools(tool_names: Optional[List[str]] = None, include_gmail: bool = Fals
         "Question": Question,
         "schedule_meeting": schedule_meeting,
         "check_calendar_availability": check_calendar_availability,
+        "quote_program": quote_program,
     }
     
     # Add Gmail tools if requested
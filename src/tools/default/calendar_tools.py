@@ -1,6 +1,9 @@
 from datetime import datetime
 from langchain_core.tools import tool
 
+from src.tools.base import read_only, writes
+
+@writes("calendar")
 @tool
 def schedule_meeting(
     attendees: list[str], subject: str, duration_minutes: int, preferred_day: datetime, start_time: int
@@ -10,6 +13,7 @@ def schedule_meeting(
     date_str = preferred_day.strftime("%A, %B %d, %Y")
     return f"Meeting '{subject}' scheduled on {date_str} at {start_time} for {duration_minutes} minutes with {len(attendees)} attendees"
 
+@read_only("calendar", ttl_seconds=300)
 @tool
 def check_calendar_availability(day: str) -> str:
     """Check calendar availability for a given day."""
@@ -0,0 +1,19 @@
+from typing import List, Optional
+from langchain_core.tools import tool
+
+from src.pricing import get_default_catalog
+
+@tool
+def quote_program(program: str, team_size: int, add_ons: Optional[List[str]] = None, coaching_hours: int = 0) -> str:
+    """Calculate the exact price of a training program for a team, including additional employees and add-ons.
+
+    Args:
+        program: Program name or number from the catalog (e.g. "AI for Productivity & Automation" or "2")
+        team_size: Number of employees to train
+        add_ons: Optional add-ons (e.g. "1-on-1 AI Coaching", "Internal AI Playbook", "Post-Training Support")
+        coaching_hours: Hours of 1-on-1 coaching (required if that add-on is included)
+    """
+    try:
+        return get_default_catalog().quote(program, team_size, add_ons, coaching_hours).format()
+    except ValueError as e:
+        return f"Error: {str(e)}"
@@ -9,18 +9,28 @@ STANDARD_TOOLS_PROMPT = """
 5. Done - E-mail has been sent
 """
 
+# One-line descriptions of the HITL workflow tools, in prompt order
+HITL_TOOL_DESCRIPTIONS = {
+    "write_message": "write_message(recipient, content, platform) - Draft a response (platform: email, instagram, whatsapp)",
+    "fetch_instagram_messages": "fetch_instagram_messages(username) - Check Instagram DMs",
+    "send_instagram_message": "send_instagram_message(recipient, content) - Send Instagram DM",
+    "fetch_whatsapp_messages": "fetch_whatsapp_messages(phone_number) - Check WhatsApp messages",
+    "send_whatsapp_message": "send_whatsapp_message(recipient, content) - Send WhatsApp message",
+    "schedule_meeting": "schedule_meeting(attendees, subject, duration_minutes, preferred_day, start_time) - Schedule calendar meetings where preferred_day is a datetime object",
+    "check_calendar_availability": "check_calendar_availability(day) - Check available time slots for a given day",
+    "quote_program": "quote_program(program, team_size, add_ons, coaching_hours) - Calculate the exact price of a program for a team",
+    "Question": "Question(content) - Ask the user any follow-up questions",
+    "Done": "Done - Task completed",
+}
+
+def build_tools_prompt(tool_names=None) -> str:
+    """Numbered tool list for the given tools (all HITL tools if None), in prompt order."""
+    names = [name for name in HITL_TOOL_DESCRIPTIONS if tool_names is None or name in tool_names]
+    lines = [f"{i}. {HITL_TOOL_DESCRIPTIONS[name]}" for i, name in enumerate(names, 1)]
+    return "\n" + "\n".join(lines) + "\n"
+
 # Tool descriptions for HITL workflow
-HITL_TOOLS_PROMPT = """
-1. write_message(recipient, content, platform) - Draft a response (platform: email, instagram, whatsapp)
-2. fetch_instagram_messages(username) - Check Instagram DMs
-3. send_instagram_message(recipient, content) - Send Instagram DM
-4. fetch_whatsapp_messages(phone_number) - Check WhatsApp messages
-5. send_whatsapp_message(recipient, content) - Send WhatsApp message
-6. schedule_meeting(attendees, subject, duration_minutes, preferred_day, start_time) - Schedule calendar meetings where preferred_day is a datetime object
-7. check_calendar_availability(day) - Check available time slots for a given day
-8. Question(content) - Ask the user any follow-up questions
-9. Done - Task completed
-"""
+HITL_TOOLS_PROMPT = build_tools_prompt()
 
 # Tool descriptions for HITL with memory workflow
 # Note: Additional memory specific tools could be added here 
@@ -0,0 +1,128 @@
+"""Batched Gmail reads.
+
+Fetching N listed messages one `messages().get` and one `threads().get` at a
+time costs 2N sequential HTTP round trips. `batch_get` sends the same requests
+through the Gmail batch endpoint instead: up to `batch_size` sub-requests per
+HTTP call (Gmail accepts at most 100). Each sub-request succeeds or fails on
+its own; failures that are worth retrying (rate limits, server errors,
+transport errors) are retried with backoff, and only those items are resent.
+"""
+
+import os
+import time
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 100
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+GMAIL_BATCH_FETCH = os.getenv("GMAIL_BATCH_FETCH", "true").lower() == "true"
+GMAIL_BATCH_SIZE = min(int(os.getenv("GMAIL_BATCH_SIZE", "100")), MAX_BATCH_SIZE)
+GMAIL_BATCH_MAX_RETRIES = int(os.getenv("GMAIL_BATCH_MAX_RETRIES", "3"))
+GMAIL_BATCH_BACKOFF_SECONDS = float(os.getenv("GMAIL_BATCH_BACKOFF_SECONDS", "1"))
+
+
+def _status(error: Exception) -> Optional[int]:
+    resp = getattr(error, "resp", None)
+    status = getattr(resp, "status", None)
+    return int(status) if status is not None else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors and errors without an HTTP status (transport) are retried."""
+    status = _status(error)
+    if status is None:
+        return True
+    if status == 403:
+        # Gmail reports per-user rate limits as 403 with a rateLimitExceeded reason
+        return "rateLimitExceeded" in str(error) or "userRateLimitExceeded" in str(error)
+    return status in RETRYABLE_STATUSES
+
+
+def batch_get(
+    service,
+    make_request: Callable[[str], Any],
+    ids: Iterable[str],
+    kind: str = "messages",
+    batch_size: int = GMAIL_BATCH_SIZE,
+    max_retries: int = GMAIL_BATCH_MAX_RETRIES,
+    backoff_seconds: float = GMAIL_BATCH_BACKOFF_SECONDS,
+) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """Execute one read request per id through the batch endpoint.
+
+    Args:
+        service: Gmail API service (from `googleapiclient.discovery.build`)
+        make_request: Builds the request for an id, e.g.
+            `lambda id: service.users().messages().get(userId="me", id=id)`
+        ids: Ids to fetch (duplicates are fetched once)
+        kind: Label for logs and metrics ("messages", "threads")
+        batch_size: Sub-requests per HTTP call (capped at 100)
+        max_retries: Retry rounds for retryable failures
+        backoff_seconds: Delay before the first retry round, doubled every round
+
+    Returns:
+        (results, errors): response per id, and the final error per id that failed
+    """
+    pending: List[str] = list(dict.fromkeys(ids))
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    results: Dict[str, Any] = {}
+    errors: Dict[str, Exception] = {}
+    http_calls = 0
+
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        if attempt:
+            delay = backoff_seconds * 2 ** (attempt - 1)
+            logger.info(f"Retrying {len(pending)} failed {kind} requests in {delay:.1f}s (attempt {attempt}/{max_retries})")
+            time.sleep(delay)
+        failed: Dict[str, Exception] = {}
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                failed[request_id] = exception
+            else:
+                results[request_id] = response
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            batch = service.new_batch_http_request(callback=callback)
+            for item_id in chunk:
+                batch.add(make_request(item_id), request_id=item_id)
+            try:
+                batch.execute()
+            except Exception as e:
+                # The whole HTTP call failed: every item in it that got no response failed
+                for item_id in chunk:
+                    if item_id not in results and item_id not in failed:
+                        failed[item_id] = e
+            http_calls += 1
+
+        pending = [item_id for item_id, error in failed.items() if is_retryable(error) and attempt < max_retries]
+        for item_id, error in failed.items():
+            if item_id not in pending:
+                errors[item_id] = error
+
+    metrics.incr("gmail_batch_requests", http_calls, kind=kind)
+    metrics.incr("gmail_batch_items", len(results), kind=kind, outcome="ok")
+    if errors:
+        metrics.incr("gmail_batch_items", len(errors), kind=kind, outcome="error")
+        logger.warning(f"{len(errors)} {kind} requests failed: {', '.join(f'{i} ({e})' for i, e in list(errors.items())[:5])}")
+    logger.info(f"Fetched {len(results)} {kind} in {http_calls} batch requests")
+    return results, errors
+
+
+def get_messages(service, ids: Iterable[str], **params) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """`users.messages.get` for many ids (params such as `format` are passed through)."""
+    messages = service.users().messages()
+    return batch_get(service, lambda item_id: messages.get(userId="me", id=item_id, **params), ids, kind="messages")
+
+
+def get_threads(service, ids: Iterable[str], **params) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """`users.threads.get` for many ids (params such as `format` are passed through)."""
+    threads = service.users().threads()
+    return batch_get(service, lambda item_id: threads.get(userId="me", id=item_id, **params), ids, kind="threads")
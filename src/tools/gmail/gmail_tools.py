@@ -15,6 +15,10 @@ from pathlib import Path
 from pydantic import Field, BaseModel
 from langchain_core.tools import tool
 
+from src.tools.base import read_only, writes
+from src.tools.gmail.batch_fetch import GMAIL_BATCH_FETCH, get_messages, get_threads
+from src.tools.gmail.thread_cache import ThreadHistoryCache
+
 # Setup basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -145,6 +149,76 @@ except ImportError:
     GMAIL_API_AVAILABLE = False
     logger = logging.getLogger(__name__)
 
+# Fetch threads with only the headers needed to pick the messages to process, then bodies for those only
+GMAIL_METADATA_FIRST = os.getenv("GMAIL_METADATA_FIRST", "true").lower() == "true"
+METADATA_HEADERS = ["From", "To", "Subject", "Date", "Reply-To"]
+THREAD_METADATA_PARAMS = {
+    "format": "metadata",
+    "metadataHeaders": METADATA_HEADERS,
+    "fields": "id,historyId,messages(id,threadId,internalDate,payload/headers)",
+}
+MESSAGE_FULL_PARAMS = {
+    "format": "full",
+    "fields": "id,threadId,payload(mimeType,headers,body/data,parts)",
+}
+
+def _sorted_thread_messages(thread: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Thread messages in chronological order (by internalDate, or by ID if it is missing)."""
+    messages_in_thread = thread["messages"]
+    if all("internalDate" in msg for msg in messages_in_thread):
+        return sorted(messages_in_thread, key=lambda m: int(m.get("internalDate", 0)))
+    return sorted(messages_in_thread, key=lambda m: m["id"])
+
+def _email_data(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Email fields for the assistant from a full Gmail message."""
+    headers = message["payload"].get("headers", [])
+
+    # Extract email metadata from headers
+    subject = next(header["value"] for header in headers if header["name"] == "Subject")
+    from_email = next((header["value"] for header in headers if header["name"] == "From"), "").strip()
+    to_email = next((header["value"] for header in headers if header["name"] == "To"), "").strip()
+
+    # Use Reply-To header if present
+    if reply_to := next((header["value"] for header in headers if header["name"] == "Reply-To"), "").strip():
+        from_email = reply_to
+
+    # Extract and parse email timestamp
+    send_time = next(header["value"] for header in headers if header["name"] == "Date")
+
+    return {
+        "from_email": from_email,
+        "to_email": to_email,
+        "subject": subject,
+        "page_content": extract_message_part(message["payload"]),
+        "id": message["id"],
+        "thread_id": message["threadId"],
+        "send_time": parse_time(send_time).isoformat(),
+    }
+
+def list_thread_history_ids(service, query: str) -> Dict[str, str]:
+    """historyId of every thread matching a search query (a few small list calls)."""
+    history_ids, page_token = {}, None
+    while True:
+        results = (
+            service.users()
+            .threads()
+            .list(userId="me", q=query, pageToken=page_token, maxResults=500, fields="threads(id,historyId),nextPageToken")
+            .execute()
+        )
+        for thread in results.get("threads", []):
+            history_ids[thread["id"]] = thread.get("historyId")
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return history_ids
+
+def _fetched(results: Dict[str, Any], errors: Dict[str, Exception], item_id: str, request):
+    """Response fetched up front by a batch, or the result of executing the request directly."""
+    if item_id in errors:
+        raise errors[item_id]
+    if item_id in results:
+        return results[item_id]
+    return request().execute()
+
 # Helper function that is used by the tool and can be imported elsewhere
 def fetch_group_emails(
     email_address: str,
@@ -153,6 +227,7 @@ def fetch_group_emails(
     gmail_secret: Optional[str] = None,
     include_read: bool = False,
     skip_filters: bool = False,
+    use_thread_cache: bool = True,
 ) -> Iterator[Dict[str, Any]]:
     """
     Fetch recent emails from Gmail that involve the specified email address.
@@ -168,6 +243,7 @@ def fetch_group_emails(
         gmail_secret: Optional credentials for Gmail API authentication
         include_read: Whether to include already read emails (default: False)
         skip_filters: Skip thread and sender filtering (return all messages, default: False)
+        use_thread_cache: Skip threads unchanged since an earlier pass, if GMAIL_THREAD_CACHE_PATH is set
         
     Yields:
         Dict objects containing processed email information
@@ -276,154 +352,106 @@ def fetch_group_emails(
                 logger.info(f"Total messages found: {len(messages)}")
                 break
 
-        # Process each message
-        count = 0
+        # Group the matches by thread, so each thread is fetched and analyzed once
+        matches_by_thread: Dict[str, List[Dict[str, Any]]] = {}
         for message in messages:
+            matches_by_thread.setdefault(message["threadId"], []).append(message)
+
+        # Skip threads that haven't changed since they were handled in an earlier pass
+        thread_cache = ThreadHistoryCache.from_env() if use_thread_cache else None
+        history_ids: Dict[str, str] = {}
+        if thread_cache is not None and matches_by_thread:
+            history_ids = list_thread_history_ids(service, query)
+            unchanged = [t for t in matches_by_thread if thread_cache.unchanged(t, history_ids.get(t))]
+            for thread_id in unchanged:
+                del matches_by_thread[thread_id]
+            logger.info(f"Skipping {len(unchanged)} threads unchanged since the last pass")
+
+        # Phase one: threads with only the headers needed to decide what to process
+        # (full threads instead if GMAIL_METADATA_FIRST is off)
+        thread_params = THREAD_METADATA_PARAMS if GMAIL_METADATA_FIRST else {}
+        fetched_threads, thread_errors = {}, {}
+        if GMAIL_BATCH_FETCH and matches_by_thread:
+            fetched_threads, thread_errors = get_threads(service, list(matches_by_thread), **thread_params)
+
+        # Messages to process: message id -> (thread id, thread historyId, message as fetched with the thread)
+        to_process: Dict[str, tuple] = {}
+        count = 0
+        for thread_id, thread_matches in matches_by_thread.items():
             try:
-                # Get full message details
-                msg = service.users().messages().get(userId="me", id=message["id"]).execute()
-                thread_id = msg["threadId"]
-                payload = msg["payload"]
-                headers = payload.get("headers", [])
-                
                 # Get thread details to determine conversation context
-                # Directly fetch the complete thread without any format restriction
-                # This matches the exact approach in the test code that successfully gets all messages
-                thread = service.users().threads().get(userId="me", id=thread_id).execute()
-                messages_in_thread = thread["messages"]
-                logger.info(f"Retrieved thread {thread_id} with {len(messages_in_thread)} messages")
-                
-                # Sort messages by internalDate to ensure proper chronological ordering
-                # This ensures we correctly identify the latest message
-                if all("internalDate" in msg for msg in messages_in_thread):
-                    messages_in_thread.sort(key=lambda m: int(m.get("internalDate", 0)))
-                    logger.info(f"Sorted {len(messages_in_thread)} messages by internalDate")
-                else:
-                    # Fallback to ID-based sorting if internalDate is missing
-                    messages_in_thread.sort(key=lambda m: m["id"])
-                    logger.info(f"Sorted {len(messages_in_thread)} messages by ID (internalDate missing)")
-                
-                # Log details about the messages in the thread for debugging
+                thread = _fetched(
+                    fetched_threads, thread_errors, thread_id,
+                    lambda: service.users().threads().get(userId="me", id=thread_id, **thread_params),
+                )
+                messages_in_thread = _sorted_thread_messages(thread)
+                logger.info(f"Retrieved thread {thread_id} with {len(messages_in_thread)} messages ({len(thread_matches)} matched the search)")
                 for idx, msg in enumerate(messages_in_thread):
                     headers = msg["payload"]["headers"]
-                    subject = next((h["value"] for h in headers if h["name"] == "Subject"), "No Subject")
                     from_email = next((h["value"] for h in headers if h["name"] == "From"), "Unknown")
                     date = next((h["value"] for h in headers if h["name"] == "Date"), "Unknown")
-                    logger.info(f"  Message {idx+1}/{len(messages_in_thread)}: ID={msg['id']}, Date={date}, From={from_email}")
-                
-                # Log thread information for debugging
-                logger.info(f"Thread {thread_id} has {len(messages_in_thread)} messages")
-                
+                    logger.debug(f"  Message {idx+1}/{len(messages_in_thread)}: ID={msg['id']}, Date={date}, From={from_email}")
+
                 # Analyze the last message in the thread to determine if we need to process it
                 last_message = messages_in_thread[-1]
-                last_headers = last_message["payload"]["headers"]
-                
-                # Get sender of last message
-                from_header = next(
-                    header["value"] for header in last_headers if header["name"] == "From"
-                )
                 last_from_header = next(
                     header["value"]
                     for header in last_message["payload"].get("headers")
                     if header["name"] == "From"
                 )
-                
-                # If the last message was sent by the user, mark this as a user response
-                # and don't process it further (assistant doesn't need to respond to user's own emails)
+
+                # If the last message was sent by the user, mark the matches as user responses
+                # and don't process them further (assistant doesn't need to respond to user's own emails)
                 if email_address in last_from_header:
-                    yield {
-                        "id": message["id"],
-                        "thread_id": message["threadId"],
-                        "user_respond": True,
-                    }
-                    continue
-                    
-                # Check if this is a message we should process
-                is_from_user = email_address in from_header
-                is_latest_in_thread = message["id"] == last_message["id"]
-                
-                # Modified logic for skip_filters:
-                # 1. When skip_filters is True, process all messages regardless of position in thread
-                # 2. When skip_filters is False, only process if it's not from user AND is latest in thread
-                should_process = skip_filters or (not is_from_user and is_latest_in_thread)
-                
-                if not should_process:
-                    if is_from_user:
-                        logger.debug(f"Skipping message {message['id']}: sent by the user")
-                    elif not is_latest_in_thread:
-                        logger.debug(f"Skipping message {message['id']}: not the latest in thread")
-                
-                # Process the message if it passes our filters (or if filters are skipped)
-                if should_process:
-                    # Log detailed information about this message
-                    logger.info(f"Processing message {message['id']} from thread {thread_id}")
-                    logger.info(f"  Is latest in thread: {is_latest_in_thread}")
-                    logger.info(f"  Skip filters enabled: {skip_filters}")
-                    
-                    # If the user wants to process the latest message in the thread,
-                    # use the last_message from the thread API call instead of the original message
-                    # that matched the search query
-                    if not skip_filters:
-                        # Use original message if skip_filters is False
-                        process_message = message
-                        process_payload = payload
-                        process_headers = headers
-                    else:
-                        # Use the latest message in the thread if skip_filters is True
-                        process_message = last_message
-                        process_payload = last_message["payload"]
-                        process_headers = process_payload.get("headers", [])
-                        logger.info(f"Using latest message in thread: {process_message['id']}")
-                    
-                    # Extract email metadata from headers
-                    subject = next(
-                        header["value"] for header in process_headers if header["name"] == "Subject"
-                    )
-                    from_email = next(
-                        (header["value"] for header in process_headers if header["name"] == "From"),
-                        "",
-                    ).strip()
-                    _to_email = next(
-                        (header["value"] for header in process_headers if header["name"] == "To"),
-                        "",
-                    ).strip()
-                    
-                    # Use Reply-To header if present
-                    if reply_to := next(
-                        (
-                            header["value"]
-                            for header in process_headers
-                            if header["name"] == "Reply-To"
-                        ),
-                        "",
-                    ).strip():
-                        from_email = reply_to
-                        
-                    # Extract and parse email timestamp
-                    send_time = next(
-                        header["value"] for header in process_headers if header["name"] == "Date"
+                    for message in thread_matches:
+                        yield {
+                            "id": message["id"],
+                            "thread_id": message["threadId"],
+                            "user_respond": True,
+                        }
+                else:
+                    # 1. When skip_filters is True, process the latest message in the thread
+                    #    (even if it wasn't found in the search), once per thread
+                    # 2. When skip_filters is False, only process a match that is the latest in the thread
+                    is_latest_matched = any(message["id"] == last_message["id"] for message in thread_matches)
+                    for message in thread_matches:
+                        if message["id"] != last_message["id"] and not skip_filters:
+                            logger.debug(f"Skipping message {message['id']}: not the latest in thread")
+
+                    if skip_filters or is_latest_matched:
+                        to_process[last_message["id"]] = (thread_id, thread.get("historyId"), last_message)
+                        continue
+
+                if thread_cache is not None:
+                    thread_cache.record(thread_id, history_ids.get(thread_id) or thread.get("historyId"))
+
+            except Exception as e:
+                logger.warning(f"Failed to process thread {thread_id}: {str(e)}")
+
+        # Phase two: full bodies, only for the messages that will be processed
+        bodies, body_errors = {}, {}
+        if GMAIL_METADATA_FIRST and GMAIL_BATCH_FETCH and to_process:
+            bodies, body_errors = get_messages(service, list(to_process), **MESSAGE_FULL_PARAMS)
+        for message_id, (thread_id, history_id, message) in to_process.items():
+            try:
+                if GMAIL_METADATA_FIRST:
+                    message = _fetched(
+                        bodies, body_errors, message_id,
+                        lambda: service.users().messages().get(userId="me", id=message_id, **MESSAGE_FULL_PARAMS),
                     )
-                    parsed_time = parse_time(send_time)
-                    
-                    # Extract email body content
-                    body = extract_message_part(process_payload)
-                    
-                    # Yield the processed email data
-                    yield {
-                        "from_email": from_email,
-                        "to_email": _to_email,
-                        "subject": subject,
-                        "page_content": body,
-                        "id": process_message["id"],
-                        "thread_id": process_message["threadId"],
-                        "send_time": parsed_time.isoformat(),
-                    }
-                    count += 1
-                    
+                logger.info(f"Processing message {message_id} from thread {thread_id}")
+                yield _email_data(message)
+                count += 1
+                if thread_cache is not None:
+                    thread_cache.record(thread_id, history_ids.get(thread_id) or history_id)
             except Exception as e:
-                logger.warning(f"Failed to process message {message['id']}: {str(e)}")
+                logger.warning(f"Failed to process message {message_id}: {str(e)}")
+
+        # Only saved when the pass ran to completion (a consumer that stops early leaves it unchanged)
+        if thread_cache is not None:
+            thread_cache.save()
 
-        logger.info(f"Found {count} emails to process out of {len(messages)} total messages.")
+        logger.info(f"Found {count} emails to process out of {len(messages)} total messages in {len(matches_by_thread)} threads.")
     
     except Exception as e:
         logger.error(f"Error accessing Gmail API: {str(e)}")
@@ -452,6 +480,7 @@ class FetchEmailsInput(BaseModel):
         description="Only retrieve emails newer than this many minutes"
     )
 
+@read_only("gmail_inbox", ttl_seconds=60)
 @tool(args_schema=FetchEmailsInput)
 def fetch_emails_tool(email_address: str, minutes_since: int = 30) -> str:
     """
@@ -604,6 +633,7 @@ def send_email(
         logger.error(f"Error sending email: {str(e)}")
         return False
 
+@writes("gmail_inbox")
 @tool(args_schema=SendEmailInput)
 def send_email_tool(
     email_id: str,
@@ -638,6 +668,7 @@ def send_email_tool(
     except Exception as e:
         return f"Failed to send email: {str(e)}"
 
+@writes("gmail_inbox")
 @tool
 def write_gmail_email(to: str, subject: str, content: str) -> str:
     """Write and send an email using Gmail."""
@@ -821,6 +852,7 @@ def get_calendar_events(dates: List[str]) -> str:
             result += "Available slots: 10:00 AM - 2:00 PM, after 3:00 PM\n\n"
         return result
 
+@read_only("calendar", ttl_seconds=300)
 @tool(args_schema=CheckCalendarInput)
 def check_calendar_tool(dates: List[str]) -> str:
     """
@@ -930,6 +962,7 @@ def send_calendar_invite(
         logger.error(f"Error scheduling meeting: {str(e)}")
         return False
 
+@writes("calendar")
 @tool(args_schema=ScheduleMeetingInput)
 def schedule_meeting_tool(
     attendees: List[str],
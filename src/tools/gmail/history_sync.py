@@ -0,0 +1,228 @@
+"""Incremental Gmail sync with the history API.
+
+Querying `after:<now - minutes_since>` on every tick refetches everything in
+the window (windows overlap) and misses mail when a tick is late. Instead, the
+mailbox's `historyId` is saved after each sync, and the next sync asks
+`history.list` only for what changed since then:
+
+- `messageAdded`: new mail
+- `labelAdded`: mail that became actionable again (moved back to the inbox or
+  marked unread); other label changes, including removals, need no processing
+
+Gmail keeps history for a limited time (about a week). When the saved
+`historyId` is too old, `history.list` returns 404 and the sync falls back to
+a full sync of the last `full_sync_minutes`, capped at `max_full_sync_messages`.
+
+History covers the whole mailbox, so incremental changes are filtered the way
+the full-sync query would filter them: drafts, sent mail, spam and trash by
+label, and, when an address is given (the `to:<address> OR from:<address>`
+scope, e.g. a group alias in a shared mailbox), by the From/To/Cc/Bcc headers
+fetched in one batched `format=metadata` read.
+"""
+
+import os
+import json
+import logging
+import tempfile
+from email.utils import getaddresses
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.metrics import metrics
+from src.tools.gmail.batch_fetch import get_messages
+
+logger = logging.getLogger(__name__)
+
+_ROOT = Path(__file__).parent.parent.parent.parent.absolute()
+DEFAULT_STATE_PATH = _ROOT / ".secrets" / "gmail_sync_state.json"
+
+HISTORY_TYPES = ["messageAdded", "labelAdded"]
+# A label change makes a message worth processing only if it (re)enters the inbox or becomes unread
+ACTIONABLE_LABELS = {"INBOX", "UNREAD"}
+SKIPPED_LABELS = {"DRAFT", "SENT", "SPAM", "TRASH"}
+# Headers matched by the `to:`/`from:` search operators
+ADDRESS_HEADERS = ["From", "To", "Cc", "Bcc"]
+
+
+class SyncState:
+    """Last synced historyId per mailbox, persisted as JSON.
+
+    Args:
+        path: JSON file (defaults to GMAIL_SYNC_STATE_PATH, or .secrets/gmail_sync_state.json)
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv("GMAIL_SYNC_STATE_PATH") or DEFAULT_STATE_PATH)
+        self._state: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, "r") as f:
+                    self._state = json.load(f)
+            except Exception as e:
+                logger.warning(f"Could not load sync state from {self.path}, next sync is a full sync: {str(e)}")
+
+    def history_id(self, mailbox: str) -> Optional[str]:
+        return self._state.get(mailbox, {}).get("history_id")
+
+    def save(self, mailbox: str, history_id: str, mode: str):
+        """Record a completed sync (written atomically)."""
+        self._state[mailbox] = {"history_id": str(history_id), "mode": mode, "synced_at": datetime.now().isoformat()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def _status(error: Exception) -> Optional[int]:
+    status = getattr(getattr(error, "resp", None), "status", None)
+    return int(status) if status is not None else None
+
+
+def _actionable(message: Dict[str, Any], include_read: bool) -> bool:
+    labels = set(message.get("labelIds") or [])
+    if labels & SKIPPED_LABELS:
+        return False
+    # Messages added by history carry their labels; without them there is nothing to filter on
+    return include_read or not labels or "UNREAD" in labels
+
+
+def list_history(service, start_history_id: str, include_read: bool = False) -> Tuple[List[Dict[str, str]], str]:
+    """Messages added or made actionable since a historyId.
+
+    Returns:
+        (messages, history_id): [{"id", "threadId"}] in history order, and the
+        mailbox historyId to resume from next time
+
+    Raises:
+        HttpError: 404 if the start historyId has expired
+    """
+    messages: Dict[str, Dict[str, str]] = {}
+    page_token, history_id = None, start_history_id
+    while True:
+        results = (
+            service.users()
+            .history()
+            .list(userId="me", startHistoryId=start_history_id, historyTypes=HISTORY_TYPES, pageToken=page_token, maxResults=500)
+            .execute()
+        )
+        for record in results.get("history", []):
+            for added in record.get("messagesAdded", []):
+                message = added["message"]
+                if _actionable(message, include_read):
+                    messages[message["id"]] = {"id": message["id"], "threadId": message["threadId"]}
+            for labeled in record.get("labelsAdded", []):
+                message = labeled["message"]
+                if ACTIONABLE_LABELS & set(labeled.get("labelIds", [])) and _actionable(message, include_read):
+                    messages[message["id"]] = {"id": message["id"], "threadId": message["threadId"]}
+        history_id = results.get("historyId", history_id)
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return list(messages.values()), history_id
+
+
+def _addressed(message: Dict[str, Any], address: str) -> bool:
+    headers = message.get("payload", {}).get("headers", [])
+    values = [header["value"] for header in headers if header.get("name", "").lower() in {h.lower() for h in ADDRESS_HEADERS}]
+    return any(email.lower() == address for _name, email in getaddresses(values))
+
+
+def filter_by_address(service, messages: List[Dict[str, str]], address: str) -> List[Dict[str, str]]:
+    """Messages sent from or to an address, checked on their headers with one batched metadata read.
+
+    Messages deleted since they were added (404) are dropped.
+
+    Raises:
+        Exception: the first other fetch error, so the sync is retried rather than skipping mail
+    """
+    if not messages:
+        return messages
+    results, errors = get_messages(service, [m["id"] for m in messages], format="metadata", metadataHeaders=ADDRESS_HEADERS)
+    failed = [error for error in errors.values() if _status(error) != 404]
+    if failed:
+        raise failed[0]
+    address = address.lower()
+    kept = [m for m in messages if m["id"] in results and _addressed(results[m["id"]], address)]
+    metrics.incr("gmail_sync_filtered", len(messages) - len(kept))
+    return kept
+
+
+def full_sync(service, query: str, full_sync_minutes: int, max_messages: int) -> Tuple[List[Dict[str, str]], str]:
+    """Messages matching the query in the last `full_sync_minutes`, at most `max_messages`.
+
+    The mailbox historyId is read before listing, so mail arriving during the
+    listing is picked up by the next incremental sync.
+    """
+    history_id = service.users().getProfile(userId="me").execute()["historyId"]
+    after = int((datetime.now() - timedelta(minutes=full_sync_minutes)).timestamp())
+    messages, page_token = [], None
+    while len(messages) < max_messages:
+        results = (
+            service.users()
+            .messages()
+            .list(userId="me", q=f"{query} after:{after}", pageToken=page_token, maxResults=min(500, max_messages - len(messages)))
+            .execute()
+        )
+        messages.extend(results.get("messages", []))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            break
+    if page_token:
+        logger.warning(f"Full sync capped at {max_messages} messages, older mail in the window was not fetched")
+    return messages[:max_messages], history_id
+
+
+def sync_mailbox(
+    service,
+    mailbox: str,
+    state: SyncState,
+    query: str,
+    include_read: bool = False,
+    full_sync_minutes: int = 1440,
+    max_full_sync_messages: int = 500,
+    address: Optional[str] = None,
+) -> Tuple[List[Dict[str, str]], str, str]:
+    """Messages to process since the last sync of a mailbox.
+
+    Uses `history.list` from the saved historyId, or a bounded full sync when
+    there is none or it has expired. The new historyId is returned, not saved:
+    call `state.save` once the messages have been processed, so a failed tick is
+    retried from the same point.
+
+    Args:
+        service: Gmail API service
+        mailbox: Key for the saved state (the email address)
+        state: Saved historyIds
+        query: Search query for a full sync (without the time filter)
+        include_read: Whether read messages are processed
+        full_sync_minutes: Window of a full sync
+        max_full_sync_messages: Cap on the messages of a full sync
+        address: Only keep incremental changes sent from or to this address (the query's scope)
+
+    Returns:
+        (messages, history_id, mode): [{"id", "threadId"}], the historyId to save
+        after processing, and "incremental" or "full"
+    """
+    start = state.history_id(mailbox)
+    if start:
+        try:
+            messages, history_id = list_history(service, start, include_read)
+        except Exception as e:
+            if _status(e) != 404:
+                raise
+            logger.warning(f"historyId {start} has expired, falling back to a full sync of the last {full_sync_minutes} minutes")
+            metrics.incr("gmail_history_expired")
+        else:
+            if address:
+                messages = filter_by_address(service, messages, address)
+            logger.info(f"Incremental sync from historyId {start}: {len(messages)} new messages")
+            metrics.incr("gmail_syncs", mode="incremental")
+            metrics.observe("gmail_sync_messages", len(messages), mode="incremental")
+            return messages, history_id, "incremental"
+
+    messages, history_id = full_sync(service, query, full_sync_minutes, max_full_sync_messages)
+    logger.info(f"Full sync: {len(messages)} messages, next sync starts at historyId {history_id}")
+    metrics.incr("gmail_syncs", mode="full")
+    metrics.observe("gmail_sync_messages", len(messages), mode="full")
+    return messages, history_id, "full"
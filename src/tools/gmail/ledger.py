@@ -0,0 +1,145 @@
+"""Ledger of Gmail messages already ingested.
+
+Overlapping cron windows (and retried incremental syncs) hand the same
+message to `run_ingest.py` more than once, and every duplicate costs a full
+triage plus agent run. The ledger records each message's processing status in
+SQLite (default) or Postgres, keyed by mailbox and message ID.
+
+Most lookups are for new messages, so an in-memory Bloom filter of the
+processed IDs sits in front of the table: a negative answer is certain and
+needs no query; only possible hits are confirmed against the table.
+"""
+
+import os
+import math
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_ROOT = Path(__file__).parent.parent.parent.parent.absolute()
+DEFAULT_LEDGER_PATH = _ROOT / ".secrets" / "processed_messages.sqlite3"
+
+PROCESSED = "processed"
+FAILED = "failed"
+
+TABLE = "gmail_processed_messages"
+_SCHEMA = f"""CREATE TABLE IF NOT EXISTS {TABLE} (
+    mailbox TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    thread_id TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (mailbox, message_id)
+)"""
+_UPSERT = f"""INSERT INTO {TABLE} (mailbox, message_id, thread_id, status, attempts, updated_at)
+    VALUES (%s, %s, %s, %s, 1, %s)
+    ON CONFLICT (mailbox, message_id) DO UPDATE
+    SET status = excluded.status, thread_id = COALESCE(excluded.thread_id, {TABLE}.thread_id),
+        attempts = {TABLE}.attempts + 1, updated_at = excluded.updated_at"""
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest).
+
+    Args:
+        capacity: Expected number of items
+        error_rate: False positive rate at capacity
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class ProcessedLedger:
+    """Processing status of the messages of one mailbox.
+
+    Args:
+        mailbox: Email address the message IDs belong to
+        db_uri: Postgres connection string; if not set, SQLite is used
+        path: SQLite file (defaults to GMAIL_LEDGER_PATH, or .secrets/processed_messages.sqlite3)
+        bloom_capacity: Minimum Bloom filter capacity (grown to fit the existing entries)
+    """
+
+    def __init__(self, mailbox: str, db_uri: Optional[str] = None, path: Optional[str] = None, bloom_capacity: int = 100000):
+        self.mailbox = mailbox
+        if db_uri:
+            import psycopg
+
+            self._conn = psycopg.connect(db_uri, autocommit=True)
+            self._placeholder = "%s"
+            self.backend = "postgres"
+        else:
+            path = Path(path or os.getenv("GMAIL_LEDGER_PATH") or DEFAULT_LEDGER_PATH)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), isolation_level=None)
+            self._placeholder = "?"
+            self.backend = "sqlite"
+        self._execute(_SCHEMA)
+
+        processed = [row[0] for row in self._execute(
+            f"SELECT message_id FROM {TABLE} WHERE mailbox = %s AND status = %s", (mailbox, PROCESSED)
+        ).fetchall()]
+        self._bloom = BloomFilter(capacity=max(bloom_capacity, 2 * len(processed)))
+        for message_id in processed:
+            self._bloom.add(message_id)
+        logger.info(f"Loaded {len(processed)} processed message IDs for {mailbox} from {self.backend}")
+
+    @classmethod
+    def from_env(cls, mailbox: str) -> "ProcessedLedger":
+        """Postgres at DATABASE_URL if GMAIL_LEDGER_BACKEND is "postgres", otherwise SQLite."""
+        use_postgres = os.getenv("GMAIL_LEDGER_BACKEND", "sqlite").lower() == "postgres"
+        return cls(
+            mailbox,
+            db_uri=os.getenv("DATABASE_URL") if use_postgres else None,
+            bloom_capacity=int(os.getenv("GMAIL_LEDGER_BLOOM_CAPACITY", "100000")),
+        )
+
+    def _execute(self, sql: str, params: tuple = ()):
+        return self._conn.execute(sql.replace("%s", self._placeholder), params)
+
+    def is_processed(self, message_id: str) -> bool:
+        """Whether the message was already processed successfully."""
+        if message_id not in self._bloom:
+            metrics.incr("gmail_ledger_lookups", outcome="bloom_negative")
+            return False
+        row = self._execute(
+            f"SELECT status FROM {TABLE} WHERE mailbox = %s AND message_id = %s", (self.mailbox, message_id)
+        ).fetchone()
+        processed = row is not None and row[0] == PROCESSED
+        metrics.incr("gmail_ledger_lookups", outcome="processed" if processed else "false_positive")
+        return processed
+
+    def unprocessed(self, message_ids: Iterable[str]) -> list:
+        return [message_id for message_id in message_ids if not self.is_processed(message_id)]
+
+    def mark(self, message_id: str, status: str, thread_id: Optional[str] = None):
+        """Record the outcome of processing a message (failed messages are retried on the next run)."""
+        self._execute(_UPSERT, (self.mailbox, message_id, thread_id, status, datetime.now().isoformat()))
+        if status == PROCESSED:
+            self._bloom.add(message_id)
+
+    def close(self):
+        self._conn.close()
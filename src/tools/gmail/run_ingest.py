@@ -13,13 +13,22 @@ import hashlib
 import asyncio
 import argparse
 import os
+import sys
 from pathlib import Path
 from datetime import datetime
+
+# Add project root to sys.path for imports to work correctly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
+
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from langgraph_sdk import get_client
 from dotenv import load_dotenv
 
+from src.triage_rules import TRIAGE_HEADERS
+from src.tools.gmail.history_sync import SyncState, sync_mailbox
+from src.tools.gmail.ledger import ProcessedLedger, PROCESSED, FAILED
+
 load_dotenv()
 
 # Setup paths
@@ -122,6 +131,10 @@ def extract_email_data(message):
     to_email = next((h['value'] for h in headers if h['name'] == 'To'), 'Unknown Recipient')
     date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date')
     
+    # Keep the headers used by rule-based pre-triage (newsletters, auto-replies, bulk mail)
+    wanted_headers = {name.lower() for name in TRIAGE_HEADERS}
+    triage_headers = {h['name']: h['value'] for h in headers if h['name'].lower() in wanted_headers}
+    
     # Extract message content
     content = extract_message_part(message['payload'])
     
@@ -133,7 +146,8 @@ def extract_email_data(message):
         "page_content": content,
         "id": message['id'],
         "thread_id": message['threadId'],
-        "send_time": date
+        "send_time": date,
+        "headers": triage_headers,
     }
     
     return email_data
@@ -203,7 +217,8 @@ async def ingest_email_to_langgraph(email_data, graph_name, url="http://127.0.0.
             "content": email_data["page_content"],
             "timestamp": email_data["send_time"],
             "platform": "gmail",
-            "id": email_data["id"]
+            "id": email_data["id"],
+            "headers": email_data.get("headers", {}),
         }},
         multitask_strategy="rollback",
     )
@@ -225,6 +240,8 @@ async def fetch_and_process_emails(args):
     
     # Process emails
     processed_count = 0
+    skipped_count = 0
+    ledger = None
     
     try:
         # Get messages from the specified email address
@@ -233,40 +250,66 @@ async def fetch_and_process_emails(args):
         # Construct Gmail search query
         query = f"to:{email_address} OR from:{email_address}"
         
+        # Incremental mode: only what changed since the last sync (history API)
+        sync_state, history_id = None, None
+        if getattr(args, "incremental", False):
+            sync_state = SyncState(getattr(args, "sync_state", None))
+            base_query = query if args.include_read else f"{query} is:unread"
+            messages, history_id, mode = sync_mailbox(
+                service,
+                email_address,
+                sync_state,
+                base_query,
+                include_read=args.include_read,
+                full_sync_minutes=args.minutes_since if args.minutes_since > 0 else 1440,
+                max_full_sync_messages=getattr(args, "max_full_sync", 500),
+                address=email_address,
+            )
+            print(f"{mode.capitalize()} sync: {len(messages)} new emails")
+            
         # Add time constraint if specified
-        if args.minutes_since > 0:
+        elif args.minutes_since > 0:
             # Calculate timestamp for filtering
             from datetime import timedelta
             after = int((datetime.now() - timedelta(minutes=args.minutes_since)).timestamp())
             query += f" after:{after}"
             
-        # Only include unread emails unless include_read is True
-        if not args.include_read:
-            query += " is:unread"
+        if sync_state is None:
+            # Only include unread emails unless include_read is True
+            if not args.include_read:
+                query += " is:unread"
+                
+            print(f"Gmail search query: {query}")
             
-        print(f"Gmail search query: {query}")
-        
-        # Execute the search
-        results = service.users().messages().list(userId="me", q=query).execute()
-        messages = results.get("messages", [])
+            # Execute the search
+            results = service.users().messages().list(userId="me", q=query).execute()
+            messages = results.get("messages", [])
         
         if not messages:
             print("No emails found matching the criteria")
+            if sync_state is not None:
+                sync_state.save(email_address, history_id, mode)
             return 0
             
         print(f"Found {len(messages)} emails")
         
+        # Ledger of processed message IDs, so overlapping runs don't ingest the same email twice
+        if getattr(args, "ledger", None):
+            ledger = ProcessedLedger(email_address, path=args.ledger)
+        else:
+            ledger = ProcessedLedger.from_env(email_address)
+        
         # Process each email
         for i, message_info in enumerate(messages):
             # Stop early if requested
-            if args.early and i > 0:
-                print(f"Early stop after processing {i} emails")
+            if args.early and processed_count > 0:
+                print(f"Early stop after processing {processed_count} emails")
                 break
                 
             # Check if we should reprocess this email
-            if not args.rerun:
-                # TODO: Add check for already processed emails
-                pass
+            if not args.rerun and ledger.is_processed(message_info["id"]):
+                skipped_count += 1
+                continue
                 
             # Get the full message
             message = service.users().messages().get(userId="me", id=message_info["id"]).execute()
@@ -279,20 +322,34 @@ async def fetch_and_process_emails(args):
             print(f"Subject: {email_data['subject']}")
             
             # Ingest to LangGraph
-            thread_id, run = await ingest_email_to_langgraph(
-                email_data, 
-                args.graph_name,
-                url=args.url
-            )
+            try:
+                thread_id, run = await ingest_email_to_langgraph(
+                    email_data, 
+                    args.graph_name,
+                    url=args.url
+                )
+            except Exception:
+                ledger.mark(message_info["id"], FAILED, thread_id=message_info.get("threadId"))
+                raise
+            ledger.mark(message_info["id"], PROCESSED, thread_id=message_info.get("threadId"))
             
             processed_count += 1
             
         print(f"\nProcessed {processed_count} emails successfully")
+        if skipped_count:
+            print(f"Skipped {skipped_count} already processed emails (use --rerun to process them again)")
+        
+        # Resume from here next time; an early stop leaves the rest for the next sync
+        if sync_state is not None and not args.early:
+            sync_state.save(email_address, history_id, mode)
         return 0
         
     except Exception as e:
         print(f"Error processing emails: {str(e)}")
         return 1
+    finally:
+        if ledger is not None:
+            ledger.close()
 
 def parse_args():
     """Parse command line arguments."""
@@ -342,6 +399,29 @@ def parse_args():
         action="store_true",
         help="Skip filtering of emails"
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch emails added since the last sync (Gmail history API); --minutes-since bounds the full sync used when there is no usable sync state"
+    )
+    parser.add_argument(
+        "--max-full-sync",
+        type=int,
+        default=500,
+        help="Maximum number of emails fetched by a full sync in incremental mode"
+    )
+    parser.add_argument(
+        "--sync-state",
+        type=str,
+        default=None,
+        help="JSON file with the last synced historyId per mailbox (default: GMAIL_SYNC_STATE_PATH or .secrets/gmail_sync_state.json)"
+    )
+    parser.add_argument(
+        "--ledger",
+        type=str,
+        default=None,
+        help="SQLite file recording processed emails (default: GMAIL_LEDGER_PATH or .secrets/processed_messages.sqlite3; GMAIL_LEDGER_BACKEND=postgres uses DATABASE_URL)"
+    )
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+"""Cross-pass cache of the Gmail threads that were already handled.
+
+Every message in a thread changes the thread's `historyId`. If a thread still
+has the `historyId` recorded when it was last handled, nothing happened in it
+since, so the next fetch pass can skip it without downloading it. The cache is
+a small JSON file ({thread_id: historyId}) bounded to the most recently
+recorded threads.
+"""
+
+import os
+import json
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadHistoryCache:
+    """Thread id -> historyId of threads handled in earlier passes, persisted as JSON.
+
+    Args:
+        path: JSON file the cache is loaded from and saved to
+        max_entries: Only this many most recently recorded threads are kept
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._history: Dict[str, str] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, "r") as f:
+                    self._history = {str(k): str(v) for k, v in json.load(f).items()}
+            except Exception as e:
+                logger.warning(f"Could not load thread cache from {self.path}, starting empty: {str(e)}")
+
+    @classmethod
+    def from_env(cls) -> Optional["ThreadHistoryCache"]:
+        """Cache at GMAIL_THREAD_CACHE_PATH, or None if it is not set."""
+        path = os.getenv("GMAIL_THREAD_CACHE_PATH")
+        if not path:
+            return None
+        return cls(path, max_entries=int(os.getenv("GMAIL_THREAD_CACHE_MAX_ENTRIES", "5000")))
+
+    def unchanged(self, thread_id: str, history_id: Optional[str]) -> bool:
+        return history_id is not None and self._history.get(thread_id) == str(history_id)
+
+    def record(self, thread_id: str, history_id: Optional[str]):
+        if history_id is None:
+            return
+        # Re-insert so the dict order is the recording order
+        self._history.pop(thread_id, None)
+        self._history[thread_id] = str(history_id)
+        while len(self._history) > self.max_entries:
+            self._history.pop(next(iter(self._history)))
+
+    def save(self):
+        """Write the cache atomically (a crash mid-write keeps the previous file)."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._history, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save thread cache to {self.path}: {str(e)}")
+
+    def __len__(self) -> int:
+        return len(self._history)
@@ -8,6 +8,8 @@ from typing import List, Optional, Iterator, Dict, Any
 from pydantic import Field, BaseModel
 from langchain_core.tools import tool
 
+from src.tools.base import read_only, writes
+
 # Setup basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -47,6 +49,7 @@ class FetchInstagramInput(BaseModel):
     username: str = Field(description="Instagram username to fetch messages for")
     minutes_since: int = Field(default=30, description="Only retrieve messages newer than this many minutes")
 
+@read_only("instagram_inbox", ttl_seconds=60)
 @tool(args_schema=FetchInstagramInput)
 def fetch_instagram_messages(username: str, minutes_since: int = 30) -> str:
     """
@@ -73,6 +76,7 @@ class SendInstagramInput(BaseModel):
     recipient: str = Field(description="Instagram username of the recipient")
     content: str = Field(description="Message content")
     
+@writes("instagram_inbox")
 @tool(args_schema=SendInstagramInput)
 def send_instagram_message(recipient: str, content: str) -> str:
     """
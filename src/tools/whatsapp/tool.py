@@ -8,6 +8,8 @@ from typing import List, Optional, Iterator, Dict, Any
 from pydantic import Field, BaseModel
 from langchain_core.tools import tool
 
+from src.tools.base import read_only, writes
+
 # Setup basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -47,6 +49,7 @@ class FetchWhatsAppInput(BaseModel):
     phone_number: str = Field(description="WhatsApp phone number to fetch messages for")
     minutes_since: int = Field(default=30, description="Only retrieve messages newer than this many minutes")
 
+@read_only("whatsapp_inbox", ttl_seconds=60)
 @tool(args_schema=FetchWhatsAppInput)
 def fetch_whatsapp_messages(phone_number: str, minutes_since: int = 30) -> str:
     """
@@ -73,6 +76,7 @@ class SendWhatsAppInput(BaseModel):
     recipient: str = Field(description="Phone number of the recipient")
     content: str = Field(description="Message content")
     
+@writes("whatsapp_inbox")
 @tool(args_schema=SendWhatsAppInput)
 def send_whatsapp_message(recipient: str, content: str) -> str:
     """
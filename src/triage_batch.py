@@ -0,0 +1,185 @@
+"""Batched triage: classify many messages in one structured-output call.
+
+During an ingestion burst each graph run would pay for its own `llm_router`
+round trip and repeat the full triage system prompt. `TriageBatcher` collects
+concurrent triage requests that share a system prompt for up to
+`max_wait_seconds` (or until `batch_size` are pending), classifies them with a
+single `BatchRouterSchema` call, and resolves each caller's future with its
+own decision.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from src.metrics import metrics
+from src.prompts import triage_batch_user_prompt, triage_batch_message_template
+from src.schemas import RouterSchema, BatchRouterSchema
+
+logger = logging.getLogger(__name__)
+
+
+class TriageBatcher:
+    """Micro-batcher in front of the router LLM.
+
+    Args:
+        batch_router: Model bound to `BatchRouterSchema` structured output
+        single_router: Model bound to `RouterSchema`, used for single messages and fallbacks
+        batch_size: Maximum number of messages per LLM call
+        max_wait_seconds: How long the first pending message waits for others to join its batch
+        max_workers: Number of batches that can be in flight at once
+    """
+
+    def __init__(
+        self,
+        batch_router,
+        single_router,
+        batch_size: int = 10,
+        max_wait_seconds: float = 0.05,
+        max_workers: int = 4,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.batch_router = batch_router
+        self.single_router = single_router
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        # Pending requests grouped by system prompt (only identical prompts can share a call)
+        self._pending: Dict[str, List[Tuple[str, Future]]] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="triage-batch")
+
+    def submit(self, system_prompt: str, user_prompt: str) -> Future:
+        """Queue a message for triage. The returned future resolves to a RouterSchema."""
+        future: Future = Future()
+        ready = None
+        with self._lock:
+            pending = self._pending.setdefault(system_prompt, [])
+            pending.append((user_prompt, future))
+            if len(pending) >= self.batch_size:
+                ready = self._take(system_prompt)
+            elif len(pending) == 1:
+                timer = threading.Timer(self.max_wait_seconds, self._flush, args=(system_prompt,))
+                timer.daemon = True
+                self._timers[system_prompt] = timer
+                timer.start()
+
+        if ready:
+            self._executor.submit(self._run, system_prompt, ready)
+        return future
+
+    def classify(self, system_prompt: str, user_prompt: str) -> RouterSchema:
+        """Triage one message, blocking until its batch has been classified."""
+        return self.submit(system_prompt, user_prompt).result()
+
+    def classify_batch(self, system_prompt: str, user_prompts: List[str]) -> List[RouterSchema]:
+        """Classify a list of messages directly, in chunks of `batch_size`.
+
+        Returns:
+            One RouterSchema per user prompt, in input order
+        """
+        results: List[RouterSchema] = []
+        for start in range(0, len(user_prompts), self.batch_size):
+            results.extend(self._classify_chunk(system_prompt, user_prompts[start:start + self.batch_size]))
+        return results
+
+    def _take(self, system_prompt: str) -> List[Tuple[str, Future]]:
+        """Pop up to batch_size pending requests. Caller must hold the lock."""
+        timer = self._timers.pop(system_prompt, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.get(system_prompt, [])
+        batch, rest = pending[:self.batch_size], pending[self.batch_size:]
+        if rest:
+            self._pending[system_prompt] = rest
+            timer = threading.Timer(self.max_wait_seconds, self._flush, args=(system_prompt,))
+            timer.daemon = True
+            self._timers[system_prompt] = timer
+            timer.start()
+        else:
+            self._pending.pop(system_prompt, None)
+        return batch
+
+    def _flush(self, system_prompt: str):
+        """Timer callback: the wait window expired, classify whatever is pending."""
+        with self._lock:
+            batch = self._take(system_prompt)
+        if batch:
+            self._executor.submit(self._run, system_prompt, batch)
+
+    def _run(self, system_prompt: str, batch: List[Tuple[str, Future]]):
+        """Classify one batch and fan the decisions out to the waiting futures.
+
+        Each future is resolved on its own: a failed single-call fallback only
+        fails the message it was for.
+        """
+        try:
+            decisions = self._classify_chunk(system_prompt, [user_prompt for user_prompt, _ in batch], return_exceptions=True)
+        except Exception as e:
+            decisions = [e] * len(batch)
+        for (_, future), decision in zip(batch, decisions):
+            if isinstance(decision, Exception):
+                future.set_exception(decision)
+            else:
+                future.set_result(decision)
+
+    def _classify_chunk(self, system_prompt: str, user_prompts: List[str], return_exceptions: bool = False) -> List:
+        """One LLM call for the whole chunk; messages missing from the answer are retried singly.
+
+        Args:
+            return_exceptions: Put the exception of a failed single call in that
+                message's slot instead of raising it
+
+        Returns:
+            One RouterSchema (or exception) per user prompt, in input order
+        """
+        metrics.observe("triage_batch_size", len(user_prompts))
+        if len(user_prompts) == 1:
+            return [self._classify_single(system_prompt, user_prompts[0], return_exceptions)]
+
+        messages = "\n\n".join(
+            triage_batch_message_template.format(index=i, message=user_prompt.strip())
+            for i, user_prompt in enumerate(user_prompts)
+        )
+        start = time.perf_counter()
+        decisions: Dict[int, RouterSchema] = {}
+        try:
+            result: BatchRouterSchema = self.batch_router.invoke(
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": triage_batch_user_prompt.format(count=len(user_prompts), messages=messages)},
+                ]
+            )
+            for decision in result.decisions:
+                if 0 <= decision.message_index < len(user_prompts):
+                    decisions.setdefault(
+                        decision.message_index,
+                        RouterSchema(reasoning=decision.reasoning, classification=decision.classification),
+                    )
+        except Exception as e:
+            logger.warning(f"Batch triage call failed, falling back to single calls: {str(e)}")
+        metrics.observe("triage_batch_latency_seconds", time.perf_counter() - start)
+
+        missing = [i for i in range(len(user_prompts)) if i not in decisions]
+        if missing:
+            metrics.incr("triage_batch_fallbacks", len(missing))
+        for i in missing:
+            decisions[i] = self._classify_single(system_prompt, user_prompts[i], return_exceptions)
+
+        return [decisions[i] for i in range(len(user_prompts))]
+
+    def _classify_single(self, system_prompt: str, user_prompt: str, return_exceptions: bool = False):
+        try:
+            return self.single_router.invoke(
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ]
+            )
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return e
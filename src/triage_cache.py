@@ -0,0 +1,158 @@
+"""Content-addressed cache of triage decisions.
+
+Broadcast promos, template inquiries and retried webhook deliveries produce
+identical (or near-identical) messages. Their triage decision is cached under a
+hash of the normalized platform, sender domain, subject and body, so only the
+first copy pays for an `llm_router` call.
+
+Two tiers:
+- in-process TTL/LRU cache (always on)
+- optional Postgres table shared by all workers (enabled with `attach_pool`)
+
+Keys include a fingerprint of the triage background and instructions, so
+changing `default_background` or `default_triage_instructions` invalidates
+every cached decision.
+"""
+
+import re
+import json
+import hashlib
+import logging
+from typing import Optional, Dict, Any
+
+from src.cache import TTLCache
+from src.metrics import metrics
+from src.schemas import RouterSchema
+from src.triage_rules import extract_sender_domain
+
+logger = logging.getLogger(__name__)
+
+_URL_RE = re.compile(r"https?://\S+")
+_DIGITS_RE = re.compile(r"\d+")
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Normalize text so trivially different copies hash to the same key.
+
+    Lowercases, replaces URLs (tracking links differ per recipient) and digit
+    runs, and collapses whitespace.
+    """
+    if not text:
+        return ""
+    text = _URL_RE.sub("<url>", text.lower())
+    text = _DIGITS_RE.sub("#", text)
+    return _WS_RE.sub(" ", text).strip()
+
+
+def prompt_fingerprint(*parts: str) -> str:
+    """Short fingerprint of the prompt inputs that influence a triage decision."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()[:16]
+
+
+class TriageCache:
+    """Two-tier triage decision cache.
+
+    Args:
+        prompt_version: Fingerprint of the background/instructions (see `prompt_fingerprint`)
+        max_entries: In-process cache size bound
+        ttl_seconds: Per-entry time-to-live (both tiers)
+    """
+
+    TABLE = "triage_decision_cache"
+
+    def __init__(self, prompt_version: str, max_entries: int = 2048, ttl_seconds: float = 86400):
+        self.prompt_version = prompt_version
+        self.ttl_seconds = ttl_seconds
+        self._local = TTLCache("triage_decisions", max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._pool = None
+
+    def make_key(self, platform: str, sender: Optional[str], subject: Optional[str], content: Optional[str]) -> str:
+        """Hash the normalized message fields together with the prompt version."""
+        payload = "\x1f".join([
+            self.prompt_version,
+            (platform or "").lower(),
+            extract_sender_domain(sender),
+            normalize_text(subject),
+            normalize_text(content),
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def attach_pool(self, pool):
+        """Enable the shared Postgres tier using an existing psycopg connection pool.
+
+        Creates the cache table if needed and drops rows written under a
+        different prompt version.
+        """
+        try:
+            with pool.connection() as conn:
+                conn.execute(
+                    f"""CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                        key TEXT PRIMARY KEY,
+                        prompt_version TEXT NOT NULL,
+                        decision JSONB NOT NULL,
+                        expires_at TIMESTAMPTZ NOT NULL
+                    )"""
+                )
+                conn.execute(
+                    f"DELETE FROM {self.TABLE} WHERE prompt_version <> %s OR expires_at < now()",
+                    (self.prompt_version,),
+                )
+            self._pool = pool
+            logger.info("Shared Postgres triage cache enabled")
+        except Exception as e:
+            logger.warning(f"Could not enable Postgres triage cache: {str(e)}")
+
+    def get(self, key: str) -> Optional[RouterSchema]:
+        """Look up a decision in the local tier, then the shared tier."""
+        cached = self._local.get(key)
+        if cached is not None:
+            metrics.incr("triage_cache_hits", tier="local")
+            return RouterSchema(**cached)
+
+        if self._pool is not None:
+            try:
+                with self._pool.connection() as conn:
+                    row = conn.execute(
+                        f"SELECT decision FROM {self.TABLE} WHERE key = %s AND expires_at > now()",
+                        (key,),
+                    ).fetchone()
+            except Exception as e:
+                logger.warning(f"Postgres triage cache lookup failed: {str(e)}")
+                row = None
+            if row is not None:
+                value = row["decision"] if isinstance(row, dict) else row[0]
+                decision = value if isinstance(value, dict) else json.loads(value)
+                # Promote to the local tier
+                self._local.set(key, decision)
+                metrics.incr("triage_cache_hits", tier="postgres")
+                return RouterSchema(**decision)
+
+        metrics.incr("triage_cache_misses")
+        return None
+
+    def set(self, key: str, decision: RouterSchema):
+        """Store a decision in both tiers."""
+        value = decision.model_dump()
+        self._local.set(key, value)
+
+        if self._pool is not None:
+            try:
+                with self._pool.connection() as conn:
+                    conn.execute(
+                        f"""INSERT INTO {self.TABLE} (key, prompt_version, decision, expires_at)
+                        VALUES (%s, %s, %s, now() + make_interval(secs => %s))
+                        ON CONFLICT (key) DO UPDATE
+                        SET decision = EXCLUDED.decision, expires_at = EXCLUDED.expires_at""",
+                        (key, self.prompt_version, json.dumps(value), self.ttl_seconds),
+                    )
+            except Exception as e:
+                logger.warning(f"Postgres triage cache write failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Local-tier stats plus whether the shared tier is active."""
+        return {**self._local.stats(), "shared_tier": self._pool is not None}
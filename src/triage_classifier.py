@@ -0,0 +1,393 @@
+"""Local first-stage triage classifier.
+
+A small multinomial logistic regression over hashed word n-grams, trained
+offline on past `classification_decision` values from our checkpoints. At
+runtime it answers confident cases in-process; everything below the confidence
+threshold escalates to `llm_router`.
+
+Only decisions made by the router LLM (`classification_source == "llm"`) are
+used as labels: decisions from the rules, the decision cache or this
+classifier would teach the model its own output and inflate its agreement.
+Checkpoints without a recorded source predate it and are LLM decisions.
+Message bodies are preprocessed the same way in training and at runtime
+(see `classifier_content`).
+
+Training / evaluation CLI:
+
+    python -m src.triage_classifier train --database-url $DATABASE_URL --out models/triage_classifier.npz
+    python -m src.triage_classifier train --jsonl decisions.jsonl --out models/triage_classifier.npz
+    python -m src.triage_classifier report --jsonl decisions.jsonl --model models/triage_classifier.npz
+
+JSONL rows look like {"message_input": {...}, "classification_decision": "respond", "classification_source": "llm"}.
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import random
+import logging
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from src.utils import parse_message
+from src.triage_rules import extract_sender_domain
+from src.preprocessing import preprocess_message_content
+
+logger = logging.getLogger(__name__)
+
+_ROOT = Path(__file__).parent.parent.absolute()
+DEFAULT_MODEL_PATH = _ROOT / "models" / "triage_classifier.npz"
+
+CLASSES = ("ignore", "notify", "respond")
+
+# Bump when featurization changes; artifacts with another format are refused
+# (2: bodies are preprocessed with classifier_content)
+FEATURE_FORMAT = 2
+DEFAULT_N_FEATURES = 2 ** 18
+
+_TOKEN_RE = re.compile(r"[a-z0-9$']+")
+
+# Only router LLM decisions are training labels
+LABEL_SOURCE = "llm"
+# Token budget of the preprocessed body (the same setting the agent uses for prompts)
+CONTENT_TOKEN_BUDGET = int(os.getenv("MESSAGE_TOKEN_BUDGET", "1500"))
+
+# (message fields, label) training example
+Example = Tuple[Tuple[str, str, str, str], str]
+
+
+def extract_tokens(platform: str, sender: Optional[str], subject: Optional[str], content: Optional[str]) -> List[str]:
+    """Tokens fed to the feature hasher: metadata markers plus word unigrams and bigrams."""
+    tokens = [f"platform={(platform or '').lower()}"]
+    domain = extract_sender_domain(sender)
+    if domain:
+        tokens.append(f"domain={domain}")
+
+    for prefix, text in (("s:", subject), ("", content)):
+        words = _TOKEN_RE.findall((text or "").lower())
+        tokens.extend(prefix + w for w in words)
+        tokens.extend(f"{prefix}{a}_{b}" for a, b in zip(words, words[1:]))
+    return tokens
+
+
+def classifier_content(platform: Optional[str], content: Optional[str]) -> str:
+    """The message body as the classifier sees it, in training and at runtime."""
+    cleaned, _ = preprocess_message_content(content, platform=platform or "", max_tokens=CONTENT_TOKEN_BUDGET)
+    return cleaned
+
+
+def featurize(tokens: List[str], n_features: int):
+    """Hash tokens into a sparse (indices, values) vector with log-scaled, L2-normalized counts."""
+    counts: Dict[int, int] = {}
+    for token in tokens:
+        index = zlib.crc32(token.encode("utf-8")) % n_features
+        counts[index] = counts.get(index, 0) + 1
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    norm = np.linalg.norm(values)
+    if norm > 0:
+        values /= norm
+    return indices, values
+
+
+def _softmax(z):
+    z = z - z.max()
+    e = np.exp(z)
+    return e / e.sum()
+
+
+class TriageClassifier:
+    """Hashed n-gram logistic regression over the three triage classes."""
+
+    def __init__(self, weights, bias, n_features: int, version: str, metadata: Optional[Dict[str, Any]] = None):
+        self.weights = weights
+        self.bias = bias
+        self.n_features = n_features
+        self.version = version
+        self.metadata = metadata or {}
+
+    def predict_proba(self, platform: str, sender: Optional[str], subject: Optional[str], content: Optional[str]):
+        """Class probabilities in CLASSES order."""
+        indices, values = featurize(extract_tokens(platform, sender, subject, content), self.n_features)
+        return _softmax(values @ self.weights[indices] + self.bias)
+
+    def predict(self, platform: str, sender: Optional[str], subject: Optional[str], content: Optional[str]) -> Tuple[str, float]:
+        """Return (classification, confidence)."""
+        probs = self.predict_proba(platform, sender, subject, content)
+        best = int(np.argmax(probs))
+        return CLASSES[best], float(probs[best])
+
+    def save(self, path: Path):
+        """Write the model artifact (weights + versioned metadata) as .npz."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "version": self.version,
+            "feature_format": FEATURE_FORMAT,
+            "n_features": self.n_features,
+            "classes": list(CLASSES),
+            **self.metadata,
+        }
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path: Path) -> "TriageClassifier":
+        """Load a model artifact written by `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("feature_format") != FEATURE_FORMAT or tuple(meta.get("classes", ())) != CLASSES:
+                raise ValueError(f"Incompatible triage model artifact: {path}")
+            return cls(
+                weights=data["weights"],
+                bias=data["bias"],
+                n_features=int(meta["n_features"]),
+                version=meta["version"],
+                metadata=meta,
+            )
+
+
+class LazyTriageClassifier:
+    """Loads the model artifact on first use; a missing artifact disables the stage."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._model: Optional[TriageClassifier] = None
+
+    def get(self) -> Optional[TriageClassifier]:
+        if self._loaded:
+            return self._model
+        with self._lock:
+            if not self._loaded:
+                self._model = self._load()
+                self._loaded = True
+        return self._model
+
+    def _load(self) -> Optional[TriageClassifier]:
+        if not NUMPY_AVAILABLE:
+            logger.info("NumPy not available, local triage classifier disabled")
+            return None
+        if not self.path.exists():
+            logger.info(f"No triage model at {self.path}, local triage classifier disabled")
+            return None
+        try:
+            model = TriageClassifier.load(self.path)
+            logger.info(f"Loaded triage classifier version {model.version} from {self.path}")
+            return model
+        except Exception as e:
+            logger.warning(f"Could not load triage classifier from {self.path}: {str(e)}")
+            return None
+
+
+def train(
+    examples: List[Example],
+    n_features: int = DEFAULT_N_FEATURES,
+    epochs: int = 8,
+    learning_rate: float = 0.5,
+    l2: float = 1e-5,
+    seed: int = 0,
+) -> TriageClassifier:
+    """Fit the classifier with sparse SGD and class-balanced sample weights."""
+    rng = random.Random(seed)
+    label_ids = [CLASSES.index(label) for _, label in examples]
+    features = [featurize(extract_tokens(*fields), n_features) for fields, _ in examples]
+
+    # Balance classes so the rare `notify` class is not drowned out
+    counts = np.bincount(label_ids, minlength=len(CLASSES)).astype(np.float32)
+    class_weight = np.where(counts > 0, len(examples) / (len(CLASSES) * np.maximum(counts, 1)), 0.0)
+
+    weights = np.zeros((n_features, len(CLASSES)), dtype=np.float32)
+    bias = np.zeros(len(CLASSES), dtype=np.float32)
+    order = list(range(len(examples)))
+
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        lr = learning_rate / (1 + epoch)
+        for i in order:
+            indices, values = features[i]
+            probs = _softmax(values @ weights[indices] + bias)
+            grad = probs
+            grad[label_ids[i]] -= 1.0
+            grad *= class_weight[label_ids[i]]
+            weights[indices] *= 1 - lr * l2
+            weights[indices] -= lr * np.outer(values, grad)
+            bias -= lr * grad
+
+    version = datetime.now().strftime("%Y%m%d%H%M%S")
+    return TriageClassifier(
+        weights=weights,
+        bias=bias,
+        n_features=n_features,
+        version=version,
+        metadata={"trained_examples": len(examples), "class_counts": dict(zip(CLASSES, counts.tolist()))},
+    )
+
+
+def evaluate(
+    model: TriageClassifier,
+    examples: List[Example],
+    thresholds: Iterable[float] = (0.6, 0.7, 0.8, 0.9, 0.95),
+    n_bins: int = 10,
+) -> Dict[str, Any]:
+    """Agreement with the LLM labels, calibration (ECE + reliability bins) and coverage per threshold."""
+    predictions = [model.predict(*fields) for fields, _ in examples]
+    labels = [label for _, label in examples]
+    confidences = np.array([conf for _, conf in predictions])
+    correct = np.array([pred == label for (pred, _), label in zip(predictions, labels)])
+
+    confusion = {actual: {pred: 0 for pred in CLASSES} for actual in CLASSES}
+    for (pred, _), label in zip(predictions, labels):
+        confusion[label][pred] += 1
+
+    bins = []
+    ece = 0.0
+    edges = np.linspace(0, 1, n_bins + 1)
+    for low, high in zip(edges[:-1], edges[1:]):
+        mask = (confidences > low) & (confidences <= high)
+        if not mask.any():
+            continue
+        accuracy, confidence = float(correct[mask].mean()), float(confidences[mask].mean())
+        ece += mask.mean() * abs(accuracy - confidence)
+        bins.append({"range": [round(float(low), 2), round(float(high), 2)], "count": int(mask.sum()), "accuracy": accuracy, "confidence": confidence})
+
+    coverage = []
+    for threshold in thresholds:
+        mask = confidences >= threshold
+        coverage.append({
+            "threshold": threshold,
+            "coverage": float(mask.mean()) if len(examples) else 0.0,
+            "agreement": float(correct[mask].mean()) if mask.any() else None,
+        })
+
+    return {
+        "model_version": model.version,
+        "examples": len(examples),
+        "agreement": float(correct.mean()) if len(examples) else None,
+        "expected_calibration_error": float(ece),
+        "confusion": confusion,
+        "reliability": bins,
+        "coverage": coverage,
+    }
+
+
+def _example_from_values(values: Dict[str, Any]) -> Optional[Example]:
+    message_input = values.get("message_input")
+    label = values.get("classification_decision")
+    # Checkpoints written before the source was recorded only hold LLM decisions
+    source = values.get("classification_source") or LABEL_SOURCE
+    if not message_input or label not in CLASSES or source != LABEL_SOURCE:
+        return None
+    sender, _recipient, subject, content, _timestamp, platform = parse_message(message_input)
+    return (platform or "", sender or "", subject or "", classifier_content(platform, content)), label
+
+
+def load_examples_from_jsonl(path: str) -> List[Example]:
+    """Load examples exported as JSONL rows of {"message_input", "classification_decision", "classification_source"}."""
+    examples = []
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip() and (example := _example_from_values(json.loads(line))):
+                examples.append(example)
+    return examples
+
+
+def load_examples_from_checkpoints(db_uri: str) -> List[Example]:
+    """Collect (message, decision) pairs from the Postgres checkpointer.
+
+    Only runs where the router LLM made the decision (or with no recorded source) are used. Each run produces several checkpoints with the same message; only one
+    example per (thread, message) pair is kept.
+    """
+    from psycopg import Connection
+    from langgraph.checkpoint.postgres import PostgresSaver
+
+    examples = []
+    seen = set()
+    with Connection.connect(db_uri, autocommit=True) as conn:
+        saver = PostgresSaver(conn)
+        for checkpoint_tuple in saver.list(None):
+            values = checkpoint_tuple.checkpoint.get("channel_values", {})
+            example = _example_from_values(values)
+            if example is None:
+                continue
+            key = (checkpoint_tuple.config["configurable"].get("thread_id"), example[0])
+            if key in seen:
+                continue
+            seen.add(key)
+            examples.append(example)
+    return examples
+
+
+def _load_cli_examples(args) -> List[Example]:
+    if args.jsonl:
+        return load_examples_from_jsonl(args.jsonl)
+    if args.database_url:
+        return load_examples_from_checkpoints(args.database_url)
+    raise SystemExit("Provide --jsonl or --database-url (or set DATABASE_URL)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Train and evaluate the local triage classifier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("train", "report"):
+        sub = subparsers.add_parser(name)
+        sub.add_argument("--jsonl", type=str, help="JSONL file of message_input/classification_decision rows")
+        sub.add_argument("--database-url", type=str, default=os.getenv("DATABASE_URL"), help="Postgres checkpointer URI")
+        sub.add_argument("--report", type=str, help="Write the evaluation report to this JSON file")
+
+    train_parser = subparsers.choices["train"]
+    train_parser.add_argument("--out", type=str, default=str(DEFAULT_MODEL_PATH), help="Model artifact path")
+    train_parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of examples held out for the report")
+    train_parser.add_argument("--n-features", type=int, default=DEFAULT_N_FEATURES)
+    train_parser.add_argument("--epochs", type=int, default=8)
+    train_parser.add_argument("--seed", type=int, default=0)
+
+    report_parser = subparsers.choices["report"]
+    report_parser.add_argument("--model", type=str, default=str(DEFAULT_MODEL_PATH), help="Model artifact path")
+
+    args = parser.parse_args(argv)
+
+    if not NUMPY_AVAILABLE:
+        print("NumPy is required for the triage classifier")
+        return 1
+
+    examples = _load_cli_examples(args)
+    print(f"Loaded {len(examples)} labelled messages")
+    if not examples:
+        return 1
+
+    if args.command == "train":
+        random.Random(args.seed).shuffle(examples)
+        n_holdout = int(len(examples) * args.holdout)
+        holdout, training = examples[:n_holdout], examples[n_holdout:]
+        model = train(training, n_features=args.n_features, epochs=args.epochs, seed=args.seed)
+        model.save(args.out)
+        print(f"Saved triage classifier version {model.version} to {args.out}")
+        eval_examples = holdout or training
+    else:
+        model = TriageClassifier.load(args.model)
+        eval_examples = examples
+
+    report = evaluate(model, eval_examples)
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
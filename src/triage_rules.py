@@ -0,0 +1,287 @@
+"""Rule-based pre-triage.
+
+Cheap deterministic checks that run before the triage LLM. Obvious noise
+(newsletters, auto-replies, follow/like notifications, no-reply senders) is
+classified here and never reaches Gemini. Anything no rule is confident about
+returns None and falls through to `llm_router`.
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional, Iterable, Any
+
+from src.schemas import RouterSchema
+from src.metrics import metrics
+
+
+class TriageRule:
+    """A single pre-triage rule.
+
+    All conditions that are set must match for the rule to fire:
+    - keywords: regex fragments matched (case-insensitive) against subject + content
+    - sender_patterns: regex fragments matched against the sender string
+    - sender_domains: sender domain (or any parent domain) is in this list
+    - headers: header name -> regex fragment, or None to only require presence
+    - unless: regex fragments that veto the rule when found in subject + content
+
+    Args:
+        name: Rule identifier, used in reasoning and hit counters
+        classification: Decision returned when the rule fires (ignore or notify)
+        description: Human-readable explanation used as the RouterSchema reasoning
+        platforms: Restrict the rule to these platforms (None = all)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        classification: str,
+        description: str,
+        keywords: Optional[List[str]] = None,
+        sender_patterns: Optional[List[str]] = None,
+        sender_domains: Optional[Iterable[str]] = None,
+        headers: Optional[Dict[str, Optional[str]]] = None,
+        unless: Optional[List[str]] = None,
+        platforms: Optional[Iterable[str]] = None,
+    ):
+        if classification not in ("ignore", "notify"):
+            raise ValueError(f"Pre-triage rules can only ignore or notify, got: {classification}")
+        if not (keywords or sender_patterns or sender_domains or headers):
+            raise ValueError(f"Rule {name} has no conditions")
+
+        self.name = name
+        self.classification = classification
+        self.description = description
+        self.platforms = frozenset(p.lower() for p in platforms) if platforms else None
+
+        # Compile each pattern list into a single alternation so a rule costs one regex scan
+        self._keywords = _compile_any(keywords)
+        self._sender_patterns = _compile_any(sender_patterns)
+        self._unless = _compile_any(unless)
+        self._sender_domains = frozenset(d.lower().lstrip("@.") for d in sender_domains or ())
+        self._headers = {
+            header.lower(): (re.compile(pattern, re.IGNORECASE) if pattern else None)
+            for header, pattern in (headers or {}).items()
+        }
+
+    def matches(self, platform: str, sender: str, text: str, headers: Dict[str, str]) -> bool:
+        """Return True if every configured condition matches."""
+        if self.platforms is not None and platform not in self.platforms:
+            return False
+
+        for header, pattern in self._headers.items():
+            value = headers.get(header)
+            if value is None:
+                return False
+            if pattern is not None and not pattern.search(value):
+                return False
+
+        if self._sender_domains and not _domain_in(extract_sender_domain(sender), self._sender_domains):
+            return False
+        if self._sender_patterns is not None and not self._sender_patterns.search(sender):
+            return False
+        if self._keywords is not None and not self._keywords.search(text):
+            return False
+        if self._unless is not None and self._unless.search(text):
+            return False
+
+        return True
+
+
+class TriageRuleEngine:
+    """Ordered set of rules; the first matching rule decides.
+
+    Keeps per-rule hit counters so we can see how much traffic each rule removes.
+    """
+
+    def __init__(self, rules: List[TriageRule]):
+        self.rules = list(rules)
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {rule.name: 0 for rule in self.rules}
+        self._evaluated = 0
+        self._unresolved = 0
+
+    def evaluate(
+        self,
+        platform: str,
+        sender: Optional[str],
+        subject: Optional[str],
+        content: Optional[str],
+        headers: Any = None,
+    ) -> Optional[RouterSchema]:
+        """Classify a message with the rules.
+
+        Returns:
+            RouterSchema if a rule fired, otherwise None (send to the LLM)
+        """
+        platform = (platform or "").lower()
+        sender = sender or ""
+        text = f"{subject or ''}\n{content or ''}"
+        headers = normalize_headers(headers)
+
+        matched = next((rule for rule in self.rules if rule.matches(platform, sender, text, headers)), None)
+
+        with self._lock:
+            self._evaluated += 1
+            if matched is None:
+                self._unresolved += 1
+            else:
+                self._hits[matched.name] += 1
+
+        if matched is None:
+            metrics.incr("triage_rules_unresolved")
+            return None
+
+        metrics.incr("triage_rule_hits", rule=matched.name, classification=matched.classification)
+        return RouterSchema(
+            reasoning=f"Matched pre-triage rule '{matched.name}': {matched.description}",
+            classification=matched.classification,
+        )
+
+    def hit_counts(self) -> Dict[str, int]:
+        """Per-rule hit counters since startup."""
+        with self._lock:
+            return dict(self._hits)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counters plus the share of traffic resolved without the LLM."""
+        with self._lock:
+            resolved = self._evaluated - self._unresolved
+            return {
+                "evaluated": self._evaluated,
+                "resolved": resolved,
+                "unresolved": self._unresolved,
+                "resolved_ratio": resolved / self._evaluated if self._evaluated else 0.0,
+                "hits": dict(self._hits),
+            }
+
+
+def _compile_any(patterns: Optional[List[str]]):
+    """Compile a list of regex fragments into one case-insensitive alternation."""
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+
+
+def _domain_in(domain: str, domains: frozenset) -> bool:
+    """Check a domain and all of its parent domains against a set."""
+    parts = domain.split(".")
+    return any(".".join(parts[i:]) in domains for i in range(len(parts) - 1))
+
+
+def extract_sender_domain(sender: Optional[str]) -> str:
+    """Extract the lowercase domain from 'Name <user@domain>' or 'user@domain'.
+
+    Returns an empty string for senders without an email address (e.g. social handles).
+    """
+    if not sender:
+        return ""
+    match = re.search(r"[\w.+-]+@([\w-]+(?:\.[\w-]+)+)", sender)
+    return match.group(1).lower() if match else ""
+
+
+def normalize_headers(headers: Any) -> Dict[str, str]:
+    """Normalize headers to a lowercase-keyed dict.
+
+    Accepts a plain dict or the Gmail API list format ([{"name": ..., "value": ...}]).
+    """
+    if not headers:
+        return {}
+    if isinstance(headers, dict):
+        return {str(k).lower(): str(v) for k, v in headers.items()}
+    return {str(h["name"]).lower(): str(h.get("value", "")) for h in headers if "name" in h}
+
+
+# Headers that the pre-triage rules look at; ingestion passes these through in message_input["headers"]
+TRIAGE_HEADERS = ["List-Unsubscribe", "List-Id", "Auto-Submitted", "Precedence", "X-Autoreply"]
+
+# Messages that look conversational are never ignored by the keyword rules
+_QUESTION_GUARD = [r"\?"]
+
+default_triage_rules = [
+    TriageRule(
+        name="auto_submitted",
+        classification="ignore",
+        description="Auto-Submitted header marks this as an automated message or auto-reply.",
+        headers={"auto-submitted": r"^\s*auto-"},
+    ),
+    TriageRule(
+        name="autoreply_header",
+        classification="ignore",
+        description="X-Autoreply header marks this as an automatic reply.",
+        headers={"x-autoreply": r"^\s*yes"},
+    ),
+    TriageRule(
+        name="bulk_precedence",
+        classification="ignore",
+        description="Precedence header marks this as bulk or mailing-list mail.",
+        headers={"precedence": r"^\s*(bulk|list|junk)\b"},
+    ),
+    TriageRule(
+        name="list_unsubscribe",
+        classification="ignore",
+        description="List-Unsubscribe header marks this as a newsletter or marketing email.",
+        headers={"list-unsubscribe": None},
+        # Replies in a mailing-list thread are conversations, not newsletters
+        unless=[r"^\s*(re|fwd?)\s*:"],
+    ),
+    TriageRule(
+        name="noreply_sender",
+        classification="ignore",
+        description="Sender is a no-reply / system mailbox.",
+        sender_patterns=[
+            r"\bno-?reply@",
+            r"\bdo-?not-?reply@",
+            r"\bmailer-daemon@",
+            r"\bpostmaster@",
+        ],
+    ),
+    TriageRule(
+        name="marketing_platform_domain",
+        classification="ignore",
+        description="Sent through a bulk email marketing platform.",
+        sender_domains=[
+            "mcsv.net",
+            "mcdlv.net",
+            "rsgsv.net",
+            "list-manage.com",
+            "sendgrid.net",
+            "hubspotemail.net",
+            "klaviyomail.com",
+            "ccsend.com",
+            "mailchimpapp.net",
+            "sparkpostmail.com",
+        ],
+    ),
+    TriageRule(
+        name="social_engagement_notification",
+        classification="ignore",
+        description="Generic social media notification (follow/like/reaction) without a direct message.",
+        keywords=[
+            r"\bstarted following you\b",
+            r"\bfollowed you\b",
+            r"\bnew follower",
+            r"\bliked your (post|photo|comment|reel|story|video)\b",
+            r"\breacted to your\b",
+            r"\bviewed your profile\b",
+        ],
+        unless=_QUESTION_GUARD,
+    ),
+    TriageRule(
+        name="social_mention",
+        classification="notify",
+        description="Social media mention without a question.",
+        keywords=[r"\bmentioned you\b", r"\btagged you\b"],
+        unless=_QUESTION_GUARD,
+    ),
+    # Form tools and CRMs also relay real inquiries from notification@ addresses, so these
+    # are shown to the reviewer rather than ignored (after the ignore rules above had their say)
+    TriageRule(
+        name="notification_sender",
+        classification="notify",
+        description="Sender is a notification mailbox (possibly a form or CRM relaying an inquiry).",
+        sender_patterns=[r"\bnotifications?@"],
+    ),
+]
+
+# Process-wide engine used by the triage router
+default_rule_engine = TriageRuleEngine(default_triage_rules)
@@ -0,0 +1,21 @@
+"""Custom app mounted by the LangGraph server (`http.app` in langgraph.json).
+
+Its lifespan flushes buffered user preference writes when the server shuts
+down. The async graph writes them to the server's store, which only works on
+the server's event loop, so the interpreter-exit flush can't write them.
+"""
+
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+
+from src.preferences import aflush_all
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    yield
+    await aflush_all()
+
+
+app = Starlette(lifespan=lifespan)
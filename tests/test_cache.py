@@ -0,0 +1,32 @@
+import time
+
+from src.cache import TTLCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache("test", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_their_ttl():
+    cache = TTLCache("test", ttl_seconds=60)
+    cache.set("a", 1, ttl_seconds=0.01)
+    cache.set("b", 2)
+    time.sleep(0.02)
+    assert cache.get("a", "missing") == "missing"
+    assert cache.get("b") == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_by_key_predicate():
+    cache = TTLCache("test")
+    cache.set(("gmail", "a"), 1)
+    cache.set(("instagram", "b"), 2)
+    assert cache.invalidate(lambda key: key[0] == "gmail") == 1
+    assert len(cache) == 1
@@ -0,0 +1,19 @@
+from src.feedback import TOP_K, FeedbackSummary
+
+
+def test_merge_sums_counts_and_recomputes_top():
+    first = FeedbackSummary.from_items(["a"] * 3 + [f"one-off-{i}" for i in range(TOP_K)])
+    second = FeedbackSummary.from_items(["b"] * 5 + ["a"])
+    first.merge(second)
+
+    assert first.total == 3 + TOP_K + 6
+    assert first.count("a") >= 4 and first.count("b") >= 5
+    assert [item for item, _ in first.most_common(2)] == ["b", "a"]
+    assert len(first.top) == TOP_K
+    assert first.recent[-1] == "a"
+
+
+def test_merge_into_empty_summary():
+    summary = FeedbackSummary()
+    summary.merge(FeedbackSummary.from_items(["a", "a"]))
+    assert summary.count("a") == 2 and summary.total == 2
@@ -0,0 +1,71 @@
+from src.tools.gmail.history_sync import SyncState, sync_mailbox
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeBatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            self.callback(request_id, request.execute(), None)
+
+
+class FakeGmail:
+    """Gmail service with a history of new messages and their headers."""
+
+    def __init__(self, history, headers):
+        self.history_records = history
+        self.headers = headers
+
+    def users(self):
+        return self
+
+    def history(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, **params):
+        return FakeRequest({"history": self.history_records, "historyId": "200"})
+
+    def get(self, userId, id, **params):
+        headers = [{"name": name, "value": value} for name, value in self.headers[id].items()]
+        return FakeRequest({"id": id, "payload": {"headers": headers}})
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(callback)
+
+
+def _added(message_id):
+    return {"messagesAdded": [{"message": {"id": message_id, "threadId": message_id, "labelIds": ["INBOX", "UNREAD"]}}]}
+
+
+def test_incremental_sync_keeps_only_mail_for_the_address(tmp_path):
+    service = FakeGmail(
+        history=[_added("to-alias"), _added("from-alias"), _added("other"), _added("cc-alias")],
+        headers={
+            "to-alias": {"From": "Sarah <sarah@agency.com>", "To": "Sales <sales@example.com>"},
+            "from-alias": {"From": "sales@example.com", "To": "sarah@agency.com"},
+            "other": {"From": "bob@vendor.com", "To": "support@example.com"},
+            "cc-alias": {"From": "bob@vendor.com", "To": "support@example.com", "Cc": "SALES@example.com"},
+        },
+    )
+    state = SyncState(tmp_path / "state.json")
+    state.save("sales@example.com", "100", "full")
+
+    messages, history_id, mode = sync_mailbox(service, "sales@example.com", state, "", address="sales@example.com")
+    assert mode == "incremental" and history_id == "200"
+    assert [m["id"] for m in messages] == ["to-alias", "from-alias", "cc-alias"]
@@ -0,0 +1,42 @@
+from src.tools.gmail.ledger import FAILED, PROCESSED, BloomFilter, ProcessedLedger
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    added = [f"msg-{i}" for i in range(1000)]
+    for item in added:
+        bloom.add(item)
+    assert all(item in bloom for item in added)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_processed_messages_are_skipped(tmp_path):
+    ledger = ProcessedLedger("me@example.com", path=tmp_path / "ledger.sqlite3")
+    ledger.mark("a", PROCESSED, thread_id="t1")
+    assert ledger.is_processed("a")
+    assert not ledger.is_processed("b")
+    assert ledger.unprocessed(["a", "b", "c"]) == ["b", "c"]
+
+
+def test_failed_messages_are_retried(tmp_path):
+    ledger = ProcessedLedger("me@example.com", path=tmp_path / "ledger.sqlite3")
+    ledger.mark("a", FAILED)
+    assert not ledger.is_processed("a")
+    ledger.mark("a", PROCESSED)
+    assert ledger.is_processed("a")
+    attempts = ledger._execute("SELECT attempts FROM gmail_processed_messages WHERE message_id = 'a'").fetchone()[0]
+    assert attempts == 2
+
+
+def test_ledger_is_reloaded_per_mailbox(tmp_path):
+    path = tmp_path / "ledger.sqlite3"
+    ledger = ProcessedLedger("me@example.com", path=path)
+    ledger.mark("a", PROCESSED)
+    ledger.mark("b", FAILED)
+    ledger.close()
+
+    reopened = ProcessedLedger("me@example.com", path=path)
+    assert reopened.is_processed("a") and not reopened.is_processed("b")
+    other = ProcessedLedger("other@example.com", path=path)
+    assert not other.is_processed("a")
@@ -0,0 +1,93 @@
+import asyncio
+
+from langgraph.store.base.batch import AsyncBatchedBaseStore
+from langgraph.store.memory import InMemoryStore
+
+from src.feedback import FeedbackSummary
+from src.preferences import NAMESPACE, PreferenceCache, aflush_all
+from src.schemas import UserPreferences
+
+
+class LoopBoundStore(AsyncBatchedBaseStore):
+    """In-memory store that, like AsyncPostgresStore, refuses sync calls on its event loop."""
+
+    def __init__(self):
+        super().__init__()
+        self.inner = InMemoryStore()
+
+    async def abatch(self, ops):
+        return self.inner.batch(ops)
+
+
+def test_counters_are_merged_as_deltas():
+    store = InMemoryStore()
+    cache = PreferenceCache(flush_interval_seconds=60)
+    cache.update(store, "gmail_sarah", {"last_interaction": "t1"}, {"total_messages": 1})
+    cache.flush()
+    # Another worker counts a message meanwhile
+    value = store.get(NAMESPACE, "gmail_sarah").value
+    store.put(NAMESPACE, "gmail_sarah", {**value, "total_messages": value["total_messages"] + 1})
+
+    cache.update(store, "gmail_sarah", {"last_interaction": "t2"}, {"total_messages": 1})
+    cache.flush()
+    value = store.get(NAMESPACE, "gmail_sarah").value
+    assert value["total_messages"] == 3 and value["last_interaction"] == "t2"
+
+
+def test_async_store_flushes_on_its_loop():
+    async def run():
+        store = LoopBoundStore()
+        cache = PreferenceCache(flush_interval_seconds=0.05, max_pending=2)
+        await cache.aupdate(store, "gmail_a", {"last_interaction": "t"}, {"total_messages": 1})
+        await cache.aupdate(store, "gmail_b", {"last_interaction": "t"}, {"total_messages": 1})
+        flushed_by_size = {item.key for item in store.inner.search(NAMESPACE)}
+
+        await cache.aupdate(store, "gmail_c", {"last_interaction": "t"}, {"total_messages": 1})
+        await asyncio.sleep(0.3)
+        flushed_by_timer = {item.key for item in store.inner.search(NAMESPACE)}
+        return cache, flushed_by_size, flushed_by_timer
+
+    cache, flushed_by_size, flushed_by_timer = asyncio.run(run())
+    assert flushed_by_size == {"gmail_a", "gmail_b"}
+    assert flushed_by_timer == {"gmail_a", "gmail_b", "gmail_c"}
+    assert cache.stats()["pending_writes"] == 0
+
+
+def test_flush_after_async_loop_closed_does_not_block():
+    async def run():
+        store = LoopBoundStore()
+        cache = PreferenceCache(flush_interval_seconds=60)
+        await cache.aupdate(store, "gmail_a", {"last_interaction": "t"})
+        return cache
+
+    cache = asyncio.run(run())
+    cache.flush()
+    assert cache.stats()["pending_writes"] == 0
+
+
+def test_feedback_from_concurrent_workers_is_merged():
+    store = InMemoryStore()
+    workers = [PreferenceCache(flush_interval_seconds=60) for _ in range(2)]
+    for cache in workers:
+        cache.get(store, "gmail_sarah")
+    workers[0].update(store, "gmail_sarah", merges={"common_edits": FeedbackSummary.from_items(["write_email:content"] * 2)})
+    workers[1].update(store, "gmail_sarah", merges={"common_edits": FeedbackSummary.from_items(["write_email:content", "write_email:subject"])})
+    for cache in workers:
+        cache.flush()
+
+    edits = UserPreferences(**store.get(NAMESPACE, "gmail_sarah").value).common_edits
+    assert edits.total == 4
+    assert edits.count("write_email:content") == 3 and edits.count("write_email:subject") == 1
+
+
+def test_aflush_all_writes_pending_updates_before_the_loop_closes():
+    async def run():
+        store = LoopBoundStore()
+        cache = PreferenceCache(flush_interval_seconds=60)
+        await cache.aupdate(store, "gmail_a", {"last_interaction": "t"}, {"total_messages": 1})
+        await aflush_all()
+        return store, cache
+
+    store, cache = asyncio.run(run())
+    assert store.inner.get(NAMESPACE, "gmail_a").value["total_messages"] == 1
+    assert cache.stats()["pending_writes"] == 0
@@ -0,0 +1,91 @@
+from src.preprocessing import (
+    preprocess_message_content,
+    strip_disclaimers,
+    strip_quoted_replies,
+    strip_signature,
+    truncate_to_budget,
+)
+
+
+def test_sign_off_followed_by_the_request_is_kept():
+    text = (
+        "Thanks!\n\n"
+        "We're a 25-person agency.\n"
+        "We want the productivity program for the whole team.\n"
+        "Please send an invoice to accounts@agency.com.\n"
+        "Sarah"
+    )
+    assert strip_signature(text) == text
+
+
+def test_bare_double_dash_is_not_a_signature_delimiter():
+    text = "Price list:\n--\nitem a\nitem b"
+    assert strip_signature(text) == text
+
+
+def test_standard_delimiter_cuts_the_signature():
+    text = "Can we book the workshop?\n-- \nSarah Chen\nHead of Marketing\n+1 555 0100"
+    assert strip_signature(text) == "Can we book the workshop?"
+
+
+def test_contact_block_after_closing_sign_off_is_dropped():
+    text = (
+        "Can we book the workshop for March?\n\n"
+        "Best regards,\n"
+        "Sarah Chen\n"
+        "Head of Marketing | Acme\n"
+        "+1 555 0100\n"
+        "www.acme.example"
+    )
+    assert strip_signature(text) == "Can we book the workshop for March?\n\nBest regards,\nSarah Chen"
+
+
+def test_mobile_footer_is_dropped():
+    assert strip_signature("See you Monday\nSent from my iPhone") == "See you Monday"
+
+
+def test_quoted_reply_chain_is_dropped():
+    text = "Sounds good, let's do Tuesday.\n\nOn Mon, Jan 6, 2025 at 9:00 AM Bob <bob@example.com> wrote:\n> Does Tuesday work?"
+    assert strip_quoted_replies(text) == "Sounds good, let's do Tuesday."
+
+
+def test_fully_quoted_message_is_kept():
+    text = "> only quoted text"
+    assert strip_quoted_replies(text) == text
+
+
+def test_long_disclaimer_paragraph_is_dropped():
+    disclaimer = "This email is confidential and intended solely for the addressee. " * 3
+    assert strip_disclaimers(f"Hello there\n\n{disclaimer}") == "Hello there"
+
+
+def test_truncation_keeps_head_and_tail():
+    text = "a" * 400 + "b" * 400
+    truncated = truncate_to_budget(text, max_tokens=50)
+    assert truncated.startswith("a" * 150) and truncated.endswith("b" * 50)
+    assert "tokens omitted" in truncated
+
+
+def test_only_email_bodies_are_cleaned():
+    text = "Thanks!\nSarah\nHead of Marketing"
+    cleaned, stats = preprocess_message_content(text, platform="instagram")
+    assert cleaned == text and stats["applied"] == []
+
+    cleaned, stats = preprocess_message_content(text, platform="gmail")
+    assert cleaned == "Thanks!\nSarah" and stats["applied"] == ["signature"]
+
+
+def test_inquiry_mentioning_confidential_is_kept():
+    text = (
+        "Hi,\n\n"
+        "We need a confidential, in-house AI training for our privileged-access team of 30 engineers. "
+        "Could you send pricing for the technical program and available dates in March?\n\n"
+        "Thanks,\nJane"
+    )
+    assert strip_disclaimers(text) == text
+    assert strip_disclaimers(text.rsplit("\n\n", 1)[0]) == text.rsplit("\n\n", 1)[0]
+
+
+def test_footer_after_sign_off_is_dropped():
+    footer = "CONFIDENTIAL: the content of this email is confidential and must not be copied, forwarded or shared with any third parties without the prior consent of the sender."
+    assert strip_disclaimers(f"Can we book March?\n\nBest regards,\nJane\n\n{footer}") == "Can we book March?\n\nBest regards,\nJane"
@@ -0,0 +1,69 @@
+import pytest
+
+from src.pricing import get_default_catalog
+from src.tools.default.pricing_tools import quote_program
+
+
+@pytest.fixture
+def catalog():
+    return get_default_catalog()
+
+
+def test_catalog_is_parsed_from_background(catalog):
+    assert [p.number for p in catalog.programs] == [1, 2, 3, 4]
+    assert catalog.programs[0].price == 1200 and catalog.programs[0].cohort_size == 10
+    assert catalog.programs[3].custom_quote
+    assert [a.unit for a in catalog.add_ons] == ["hour", None, None]
+
+
+def test_program_lookup_by_number_and_exact_name(catalog):
+    assert catalog.find_program("3").name == "AI for Technical & Data Teams"
+    assert catalog.find_program("Program 3").number == 3
+    assert catalog.find_program("ai for technical & data teams").number == 3
+    assert catalog.find_program("data").number == 3
+    assert catalog.find_program("blockchain") is None
+
+
+def test_tied_program_match_is_ambiguous(catalog):
+    # "Technical" is in both "Non-Technical Employees" and "Technical & Data Teams"
+    with pytest.raises(ValueError, match="Ambiguous program"):
+        catalog.find_program("Technical")
+    assert quote_program.invoke({"program": "Technical", "team_size": 8}).startswith("Error: Ambiguous program")
+
+
+def test_cohort_price_and_additional_employees(catalog):
+    assert catalog.quote("1", 10).total == 1200
+    assert catalog.quote("1", 25).total == 1200 + 15 * 100
+    assert catalog.quote("AI for Productivity & Automation", 20).total == 2500 + 5 * 150
+
+
+def test_team_above_cohort_without_per_person_price_needs_custom_quote(catalog):
+    quote = catalog.quote("3", 12)
+    assert quote.total is None
+    text = quote.format()
+    assert "Custom quote required" in text and "$7,600" not in text and "Total" not in text
+
+
+def test_custom_program_gives_starting_price(catalog):
+    assert catalog.quote("4", 50).format().splitlines()[-2] == "Starting total: $5,000"
+
+
+def test_add_ons(catalog):
+    quote = catalog.quote("2", 10, ["Internal AI Playbook", "1-on-1 AI Coaching"], coaching_hours=3)
+    assert quote.total == 2500 + 1500 + 3 * 250
+
+
+def test_coaching_requires_hours(catalog):
+    with pytest.raises(ValueError, match="coaching_hours"):
+        catalog.quote("2", 10, ["1-on-1 AI Coaching"])
+
+
+def test_invalid_requests(catalog):
+    with pytest.raises(ValueError):
+        catalog.quote("2", 0)
+    with pytest.raises(ValueError, match="Unknown add-on"):
+        catalog.quote("2", 10, ["Hot air balloon ride"])
+
+
+def test_tool_quotes_without_add_ons():
+    assert quote_program.invoke({"program": "1", "team_size": 5}).endswith("Total: $1,200")
@@ -0,0 +1,39 @@
+import gc
+
+from langgraph.store.memory import InMemoryStore
+
+from src.reply_memory import ReplyMemory
+
+INQUIRY = "Can you send pricing for the productivity program for a team of 12 people?"
+REPLY = {"recipient": "sarah@agency.com", "content": "Here is the pricing."}
+
+
+def test_replies_approved_on_another_worker_are_picked_up_after_refresh():
+    store = InMemoryStore()
+    worker, other_worker = ReplyMemory(refresh_seconds=0), ReplyMemory(refresh_seconds=0)
+    assert worker.lookup(store, "gmail", INQUIRY) == (None, None)
+
+    other_worker.record(store, "gmail", INQUIRY, "write_email", REPLY, edited=False)
+    _draft, example = worker.lookup(store, "gmail", INQUIRY)
+    assert example["args"] == REPLY
+
+
+def test_most_recent_replies_are_kept():
+    store = InMemoryStore()
+    memory = ReplyMemory(max_entries=2, refresh_seconds=0)
+    for i in range(5):
+        memory.record(store, "gmail", f"{INQUIRY} ({i})", "write_email", {**REPLY, "content": str(i)}, edited=False)
+
+    fresh = ReplyMemory(max_entries=2)
+    index = fresh.index(store, "gmail")
+    index.best_match(store, INQUIRY)
+    assert [entry["args"]["content"] for entry in index._entries] == ["3", "4"]
+
+
+def test_indexes_are_dropped_with_their_store():
+    memory = ReplyMemory()
+    store = InMemoryStore()
+    memory.lookup(store, "gmail", INQUIRY)
+    del store
+    gc.collect()
+    assert len(memory._indexes) == 0
@@ -0,0 +1,34 @@
+import pytest
+
+from src.schemas import BatchRouterSchema, RouterSchema
+from src.triage_batch import TriageBatcher
+
+
+class FakeBatchRouter:
+    """Answers only for the first message, so the others fall back to single calls."""
+
+    def invoke(self, messages):
+        return BatchRouterSchema(decisions=[{"message_index": 0, "reasoning": "batch", "classification": "ignore"}])
+
+
+class FakeSingleRouter:
+    def invoke(self, messages):
+        if "fail" in messages[1]["content"]:
+            raise RuntimeError("single call failed")
+        return RouterSchema(reasoning="single", classification="notify")
+
+
+def test_failed_fallback_only_fails_its_own_message():
+    batcher = TriageBatcher(FakeBatchRouter(), FakeSingleRouter(), batch_size=3, max_wait_seconds=0.01)
+    futures = [batcher.submit("system", prompt) for prompt in ("first", "fail", "third")]
+
+    assert futures[0].result(timeout=5).classification == "ignore"
+    with pytest.raises(RuntimeError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5).classification == "notify"
+
+
+def test_classify_batch_raises_failed_fallback():
+    batcher = TriageBatcher(FakeBatchRouter(), FakeSingleRouter(), batch_size=3)
+    with pytest.raises(RuntimeError):
+        batcher.classify_batch("system", ["first", "fail"])
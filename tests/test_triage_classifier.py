@@ -0,0 +1,33 @@
+from src.triage_classifier import _example_from_values, classifier_content
+
+MESSAGE = {
+    "platform": "gmail",
+    "sender": "Sarah <sarah@agency.com>",
+    "recipient": "me@example.com",
+    "subject": "Training",
+    "content": "Can you send pricing?\n\nOn Mon, Jan 6, 2025 at 9:00 AM Bob <bob@example.com> wrote:\n> old thread",
+}
+
+
+def test_only_llm_decisions_are_labels():
+    for source in ("rules", "cache", "classifier"):
+        values = {"message_input": MESSAGE, "classification_decision": "respond", "classification_source": source}
+        assert _example_from_values(values) is None
+
+    values = {"message_input": MESSAGE, "classification_decision": "respond", "classification_source": "llm"}
+    assert _example_from_values(values)[1] == "respond"
+
+
+def test_checkpoints_without_a_source_are_llm_decisions():
+    for values in (
+        {"message_input": MESSAGE, "classification_decision": "ignore"},
+        {"message_input": MESSAGE, "classification_decision": "ignore", "classification_source": None},
+    ):
+        assert _example_from_values(values)[1] == "ignore"
+
+
+def test_training_content_is_preprocessed_like_runtime():
+    values = {"message_input": MESSAGE, "classification_decision": "respond", "classification_source": "llm"}
+    (platform, sender, subject, content), _ = _example_from_values(values)
+    assert content == classifier_content("gmail", MESSAGE["content"])
+    assert "old thread" not in content
@@ -0,0 +1,24 @@
+from src.triage_rules import default_rule_engine
+
+
+def test_noreply_sender_is_ignored():
+    result = default_rule_engine.evaluate("gmail", "No Reply <no-reply@shop.example>", "Your receipt", "Thanks for your order")
+    assert result.classification == "ignore"
+
+
+def test_notification_sender_is_shown_not_ignored():
+    result = default_rule_engine.evaluate(
+        "gmail", "Typeform <notifications@typeform.com>", "New submission", "Company: Acme. Team size: 40. Interested in training."
+    )
+    assert result.classification == "notify"
+
+
+def test_newsletter_from_notification_sender_is_still_ignored():
+    result = default_rule_engine.evaluate(
+        "gmail", "news <notification@list.example>", "Weekly digest", "Top stories", headers={"List-Unsubscribe": "<mailto:x>"}
+    )
+    assert result.classification == "ignore"
+
+
+def test_question_goes_to_the_llm():
+    assert default_rule_engine.evaluate("gmail", "sarah@agency.com", "Training", "Can you send pricing?") is None